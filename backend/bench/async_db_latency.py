@@ -0,0 +1,155 @@
+"""
+Check-in and generate latency under concurrent load, per database session mode.
+
+Drives the real app in-process (httpx ASGITransport, LLM_PROVIDERS=fake) with
+--concurrency clients. Each client sends --requests requests, mixing
+POST /checkin and POST /generate with distinct texts (cache misses). The
+same load runs with two kinds of session behind get_async_db:
+  blocking  a sync Session called straight from the coroutine. This is what
+            the handlers did before user-009: every query stalls the event loop.
+            It gets an unpooled engine, since a checkout that waits on the
+            loop thread for a connection only the loop can release never returns.
+  async     the aiosqlite AsyncSession the app uses on SQLite
+
+The client shares the server's event loop, so a request that starts while
+the loop is stalled is timed from when the loop gets to it. The bench therefore
+also reports event-loop lag: how late a 10 ms ticker wakes up while the load
+runs. The lag is what every other request on the worker (health checks,
+streams, polls) waits.
+
+    python bench/async_db_latency.py --concurrency 50 --requests 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def _ticker(lags: list[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def _load(app, concurrency: int, requests: int, generate_share: float) -> dict:
+    import httpx
+
+    latencies: dict[str, list[float]] = {"checkin": [], "generate": [], "loop lag": []}
+    errors = 0
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(latencies["loop lag"], stop))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_client(index: int) -> None:
+            nonlocal errors
+            for n in range(requests):
+                if random.random() < generate_share:
+                    kind = "generate"
+                    body = {"text": f"Tema {index}-{n}: la fotosíntesis convierte la luz en energía química. " * 4}
+                else:
+                    kind = "checkin"
+                    body = {"bienestar": random.randint(1, 10), "sueno": random.randint(1, 10),
+                            "concentracion": random.randint(1, 10)}
+                started = time.perf_counter()
+                response = await client.post(f"/{kind}", json=body)
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                latencies[kind].append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(one_client(i) for i in range(concurrency)))
+    stop.set()
+    await ticker
+    return {"latencies": latencies, "errors": errors}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="checkin/generate p99 per database session mode")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--generate-share", type=float, default=0.3)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="yachaflex-asyncdb-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["LLM_PROVIDERS"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = "100000"
+
+    import database
+    import main as app_module
+    from database import AsyncSessionLocal, SessionLocal, async_engine, get_async_db
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+    from models import User
+    from routers.auth import get_current_user
+
+    with SessionLocal() as db:
+        user = User(email="asyncdb@example.com", nombre="Bench", hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+
+    async def current_user():
+        return user
+
+    async def _inline(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    unpooled = create_engine(database.DATABASE_URL, poolclass=NullPool, connect_args={"check_same_thread": False})
+    event.listen(unpooled, "connect", database._apply_sqlite_pragmas)
+    UnpooledSession = sessionmaker(bind=unpooled, autoflush=False, expire_on_commit=False)
+
+    def session_dependency(mode: str):
+        async def dependency():
+            if mode == "async":
+                session = AsyncSessionLocal()
+            else:
+                session = database._ThreadedAsyncSession(UnpooledSession())
+            async with session as db:
+                yield db
+        return dependency
+
+    app = app_module.app
+    app.dependency_overrides[get_current_user] = current_user
+    threadpool = database.run_in_threadpool
+
+    async def run() -> None:
+        async with app_module.lifespan(app):
+            for mode in ("blocking", "async"):
+                database.run_in_threadpool = _inline if mode == "blocking" else threadpool
+                app.dependency_overrides[get_async_db] = session_dependency(mode)
+                random.seed(1)
+                started = time.perf_counter()
+                result = await _load(app, args.concurrency, args.requests, args.generate_share)
+                elapsed = time.perf_counter() - started
+                for kind, samples in result["latencies"].items():
+                    if samples:
+                        print(f"{mode:8} {kind:8} n={len(samples):5} p50={statistics.median(samples):8.1f}ms "
+                              f"p99={_percentile(samples, 0.99):8.1f}ms")
+                print(f"{mode:8} {elapsed:.1f}s, {result['errors']} errors")
+        database.run_in_threadpool = threadpool
+        if async_engine is not None:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
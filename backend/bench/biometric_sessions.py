@@ -0,0 +1,149 @@
+"""
+Multi-worker check for the biometric session store.
+
+Starts uvicorn with --workers N on a throwaway SQLite database, then for
+every session opens a waiter (alternating SSE and long-poll) and posts the
+biometrics on a separate connection, so the two usually land on different
+worker processes. Reports missed arrivals and wake-up latency.
+
+    python bench/biometric_sessions.py --workers 3 --sessions 200
+    python bench/biometric_sessions.py --store memory   # shows the misses the shared store fixes
+
+Exits with status 1 if any arrival was missed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Fresh connection per request, so the kernel spreads them across workers
+CLOSE = {"Connection": "close"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def _sse_waiter(client: httpx.AsyncClient, session_id: str, headers: dict, timeout: float) -> bool:
+    response = await client.post("/biometrics/events/ticket", params={"session_id": session_id},
+                                 headers={**headers, **CLOSE})
+    response.raise_for_status()
+    params = {"session_id": session_id, "ticket": response.json()["ticket"]}
+    async with client.stream("GET", "/biometrics/events", params=params, headers=CLOSE, timeout=timeout) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data:"):
+                return json.loads(line[5:]).get("received", False)
+    return False
+
+
+async def _long_poll_waiter(client: httpx.AsyncClient, session_id: str, headers: dict, timeout: float) -> bool:
+    response = await client.get(
+        "/biometrics/wait",
+        params={"session_id": session_id, "timeout": timeout},
+        headers={**headers, **CLOSE},
+        timeout=timeout + 5,
+    )
+    return response.json().get("received", False)
+
+
+async def _one_session(client, index: int, token: str, timeout: float) -> tuple[bool, float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    session_id = str(uuid.uuid4())
+    if index % 2:
+        waiter = asyncio.create_task(_long_poll_waiter(client, session_id, headers, timeout))
+    else:
+        waiter = asyncio.create_task(_sse_waiter(client, session_id, headers, timeout))
+    await asyncio.sleep(0.3)  # let the waiter subscribe first
+
+    posted_at = time.perf_counter()
+    response = await client.post(
+        "/biometrics", params={"session_id": session_id},
+        json={"heart_rate": 80, "hrv": 45, "activity": 3000}, headers={**headers, **CLOSE},
+    )
+    response.raise_for_status()
+    try:
+        received = await waiter
+    except httpx.HTTPError:
+        received = False
+    return received, (time.perf_counter() - posted_at) * 1000
+
+
+async def run(url: str, sessions: int, users: int, timeout: float) -> int:
+    await _wait_until_up(url)
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=httpx.Limits(max_connections=sessions * 2 + 8)) as client:
+        tokens = []
+        for i in range(users):
+            response = await client.post("/auth/register", json={
+                "email": f"sessions-{uuid.uuid4().hex[:8]}-{i}@example.com", "nombre": "Bench", "password": "bench-password",
+            })
+            token = response.json()["access_token"]
+            await client.post("/checkin", json={"bienestar": 5, "sueno": 5, "concentracion": 5},
+                              headers={"Authorization": f"Bearer {token}"})
+            tokens.append(token)
+
+        results = await asyncio.gather(*(
+            _one_session(client, i, tokens[i % users], timeout) for i in range(sessions)
+        ))
+
+    missed = sum(1 for received, _ in results if not received)
+    latencies = sorted(ms for received, ms in results if received)
+    print(f"sessions={sessions} delivered={sessions - missed} missed={missed}")
+    if latencies:
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        print(f"post -> waiter woken: p50={statistics.median(latencies):.0f}ms p95={p95:.0f}ms")
+    return missed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="multi-worker biometric session check")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--store", default="database", choices=("database", "memory"))
+    parser.add_argument("--timeout", type=float, default=10, help="seconds a waiter waits before counting a miss")
+    args = parser.parse_args()
+
+    port = _free_port()
+    db_path = os.path.join(tempfile.mkdtemp(prefix="yachaflex-sessions-"), "bench.db")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "BIOMETRIC_SESSION_STORE": args.store}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        missed = asyncio.run(run(f"http://127.0.0.1:{port}", args.sessions, args.users, args.timeout))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    sys.exit(1 if missed else 0)
+
+
+if __name__ == "__main__":
+    main()
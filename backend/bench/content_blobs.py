@@ -0,0 +1,144 @@
+"""
+Storage and latency of generated_content: inline text vs content-addressed blobs.
+
+Simulates --classes classes of --students students. Each class uploads one
+--text-kb KB lecture text, and every student stores a generated_content row
+for it. The LLM result is shared per class and stress level, as with the
+content cache. The same rows are written twice, once the old way with the
+text inline and once through services.blobs. The bench then reports the
+bytes each layout stores and the per-row write and read latency.
+
+    python bench/content_blobs.py --classes 20 --students 100 --text-kb 300
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEVELS = ("low", "medium", "high")
+
+
+def _text(kb: int) -> str:
+    syllables = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ra", "se", "ti", "vo", "ci", "ma", "to"]
+    vocabulary = ["".join(random.choice(syllables) for _ in range(random.randint(2, 4))) for _ in range(3000)]
+    words = []
+    while sum(map(len, words)) + len(words) < kb * 1024:
+        sentence = random.choices(vocabulary, k=random.randint(6, 18))
+        words.extend(sentence[:-1] + [sentence[-1] + "."])
+    return " ".join(words)
+
+
+def _result(level: str) -> dict:
+    return {
+        "summary": f"Resumen ({level}) " + _text(1)[:600],
+        "flashcards": [{"question": _text(1)[:80] + "?", "answer": _text(1)[:160]} for _ in range(8)],
+        "quiz": [{"question": _text(1)[:100] + "?", "options": [_text(1)[:30] for _ in range(4)], "correct_index": 1}
+                 for _ in range(5)],
+    }
+
+
+def _ms(samples: list[float]) -> str:
+    samples = sorted(samples)
+    return f"p50={statistics.median(samples):.2f}ms p95={samples[max(0, int(len(samples) * 0.95) - 1)]:.2f}ms"
+
+
+async def run(classes: int, students: int, text_kb: int) -> None:
+    from sqlalchemy import func, select
+
+    from database import AsyncSessionLocal, async_engine
+    from models import ContentBlob, GeneratedContent, User
+    from services import blobs
+
+    async with AsyncSessionLocal() as db:
+        user = User(email="blobs@example.com", nombre="Bench", hashed_password="x")
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+    work = []
+    for _ in range(classes):
+        text = _text(text_kb)
+        results = {level: _result(level) for level in LEVELS}
+        for _ in range(students):
+            level = random.choice(LEVELS)
+            work.append((text, level, results[level]))
+
+    timings = {"inline": {"write": [], "read": []}, "blob": {"write": [], "read": []}}
+    ids = {"inline": [], "blob": []}
+    async with AsyncSessionLocal() as db:
+        for text, level, result in work:
+            for layout in ("inline", "blob"):
+                started = time.perf_counter()
+                row = GeneratedContent(user_id=user_id, stress_level=level, summary=result["summary"])
+                flashcards, quiz = json.dumps(result["flashcards"]), json.dumps(result["quiz"])
+                if layout == "inline":
+                    row.original_text, row.flashcards, row.quiz = text, flashcards, quiz
+                else:
+                    await blobs.store_content(db, row, text, flashcards, quiz)
+                db.add(row)
+                await db.commit()
+                timings[layout]["write"].append((time.perf_counter() - started) * 1000)
+                ids[layout].append(row.id)
+
+        inline_bytes = await db.scalar(select(func.sum(
+            func.length(GeneratedContent.original_text) + func.length(GeneratedContent.flashcards)
+            + func.length(GeneratedContent.quiz)
+        )).where(GeneratedContent.id.in_(ids["inline"])))
+        blob_bytes = await db.scalar(select(func.sum(func.length(ContentBlob.body))))
+        blob_count = await db.scalar(select(func.count()).select_from(ContentBlob))
+
+    # Reads in fresh sessions, every field, as GET /generate/jobs/{id} does
+    for layout in ("inline", "blob"):
+        sample = random.sample(ids[layout], min(500, len(ids[layout])))
+        for row_id in sample:
+            async with AsyncSessionLocal() as db:
+                started = time.perf_counter()
+                row = await db.get(GeneratedContent, row_id)
+                if layout == "blob":
+                    await blobs.hydrate(db, [row])
+                json.loads(row.flashcards), json.loads(row.quiz), len(row.original_text)
+                timings[layout]["read"].append((time.perf_counter() - started) * 1000)
+    if async_engine is not None:
+        await async_engine.dispose()
+
+    print(f"{len(work)} rows ({classes} classes x {students} students, {text_kb} KB texts), codec {blobs.BLOB_CODEC}")
+    print(f"inline: {inline_bytes / 2**20:8.1f} MiB")
+    print(f"blobs:  {blob_bytes / 2**20:8.1f} MiB in {blob_count} blobs "
+          f"({inline_bytes / blob_bytes:.0f}x smaller, {(inline_bytes - blob_bytes) / 2**20:.1f} MiB saved)")
+    for layout in ("inline", "blob"):
+        print(f"{layout:6} write {_ms(timings[layout]['write'])}   read {_ms(timings[layout]['read'])}")
+    stats = blobs.stats()
+    print(f"blob writes deduplicated: {stats['dedup_hits']}/{stats['writes']} "
+          f"({stats['dedup_bytes'] / 2**20:.1f} MiB not stored again), read cache hits: {stats['cache_hits']}")
+    print(f"bytes saved (compression + dedup): {stats['bytes_saved'] / 2**20:.1f} MiB, "
+          f"compression ratio {stats['compression_ratio']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="inline vs blob storage for generated content")
+    parser.add_argument("--classes", type=int, default=20)
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--text-kb", type=int, default=300)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="yachaflex-blobs-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    import migrations
+    from database import engine
+
+    migrations.migrate(engine)
+    random.seed(11)
+    asyncio.run(run(args.classes, args.students, args.text_kb))
+
+
+if __name__ == "__main__":
+    main()
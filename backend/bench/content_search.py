@@ -0,0 +1,131 @@
+"""
+/content/search latency at scale: FTS5 index vs the LIKE fallback.
+
+Seeds --rows generated_content rows of synthetic study material (summary,
+flashcards and quiz as the app stores them) spread over --users users, one
+target user with --target-rows rows, builds the index, then times searches
+for the target user with both backends.
+
+    python bench/content_search.py --rows 1000000
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TARGET_USER = 1
+
+_INSERT = (
+    "INSERT INTO generated_content (user_id, original_text, stress_level, summary, flashcards, quiz, created_at)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _vocabulary(size: int) -> list[str]:
+    syllables = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ra", "se", "ti", "vo", "ci", "ma", "to"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(random.choice(syllables) for _ in range(random.randint(2, 4))))
+    return sorted(words)
+
+
+def _sentence(vocabulary: list[str], weights: list[float], n: int) -> str:
+    return " ".join(random.choices(vocabulary, cum_weights=weights, k=n))
+
+
+def _row(vocabulary, weights, user_id: int, created_at: datetime) -> tuple:
+    cards = [{"question": _sentence(vocabulary, weights, 8) + "?", "answer": _sentence(vocabulary, weights, 10)}
+             for _ in range(5)]
+    quiz = [{"question": _sentence(vocabulary, weights, 10) + "?", "options": ["a", "b", "c", "d"], "correct_index": 0}
+            for _ in range(5)]
+    return (user_id, "", "medium", _sentence(vocabulary, weights, 60), json.dumps(cards), json.dumps(quiz), created_at)
+
+
+def _seed(conn, rows: int, users: int, target_rows: int, vocabulary, weights) -> None:
+    base = datetime(2024, 1, 1)
+    target_every = max(1, rows // target_rows)
+    batch = []
+    for i in range(rows):
+        user_id = TARGET_USER if i % target_every == 0 else 2 + i % (users - 1)
+        batch.append(_row(vocabulary, weights, user_id, base + timedelta(seconds=i)))
+        if len(batch) == 20_000:
+            conn.exec_driver_sql(_INSERT, batch)
+            batch = []
+            print(f"  seeded {i + 1}", end="\r", flush=True)
+    if batch:
+        conn.exec_driver_sql(_INSERT, batch)
+    print()
+
+
+async def _time_queries(search, queries: list[str], repeat: int) -> tuple[float, float, int]:
+    from database import AsyncSessionLocal, async_engine
+
+    samples, hits = [], 0
+    async with AsyncSessionLocal() as db:
+        for _ in range(repeat):
+            for query in queries:
+                started = time.perf_counter()
+                hits += len(await search.search(db, TARGET_USER, query, 10))
+                samples.append((time.perf_counter() - started) * 1000)
+    if async_engine is not None:
+        await async_engine.dispose()
+    samples.sort()
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)], hits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="content search latency: FTS5 vs LIKE")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--target-rows", type=int, default=2_000, help="rows owned by the searching user")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="yachaflex-search-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    import migrations
+    from database import engine
+    from services import search
+
+    migrations.migrate(engine)
+    random.seed(7)
+    vocabulary = _vocabulary(5_000)
+    # Zipf-like word frequencies, as in real text (cumulative, so each draw is a bisect)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        _seed(conn, args.rows, args.users, args.target_rows, vocabulary, weights)
+    print(f"seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    with engine.begin() as conn:
+        report = search.rebuild(conn)
+    print(f"indexed {report['rows']} rows in {report['seconds']}s "
+          f"({report['rows'] / max(report['seconds'], 1e-9):,.0f} rows/s); "
+          f"database {os.path.getsize(path) / 2**20:,.0f} MiB")
+
+    # Mix of common and rare words, one- and two-word queries, and a prefix
+    queries = [random.choice(vocabulary[:200]) for _ in range(args.queries // 2)]
+    queries += [f"{random.choice(vocabulary[:500])} {random.choice(vocabulary[500:])}" for _ in range(args.queries // 4)]
+    queries += [random.choice(vocabulary[200:])[:4] for _ in range(args.queries - len(queries))]
+
+    for backend, enabled in (("fts5", True), ("like", False)):
+        search._enabled = enabled
+        p50, p95, hits = asyncio.run(_time_queries(search, queries, args.repeat))
+        print(f"{backend:5} p50={p50:.1f}ms p95={p95:.1f}ms ({hits} hits)")
+
+
+if __name__ == "__main__":
+    main()
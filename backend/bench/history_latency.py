@@ -0,0 +1,104 @@
+"""
+Per-user query latency vs total table size.
+
+Seeds stress_records in steps up to --rows (spread over many users, one
+target user with a fixed number of records), and after each step times the
+hot queries: latest record for a user (_resolve_stress_level,
+submit_biometrics) and the user's history page (get_history).
+
+With the (user_id, timestamp) index latency stays flat as the table grows;
+run with --drop-index to see it grow linearly without it.
+
+    python bench/history_latency.py --rows 2000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TARGET_USER = 1
+TARGET_RECORDS = 500
+
+_INSERT = (
+    "INSERT INTO stress_records (user_id, bienestar, sueno, concentracion, checkin_score,"
+    " stress_score, stress_level, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _seed(conn, start: int, stop: int, users: int, base: datetime) -> None:
+    rows = []
+    for i in range(start, stop):
+        user_id = 2 + i % (users - 1)
+        score = random.uniform(0, 100)
+        rows.append((user_id, 5, 5, 5, score, score, "medium", base + timedelta(seconds=i)))
+        if len(rows) == 50_000:
+            conn.exec_driver_sql(_INSERT, rows)
+            rows = []
+    if rows:
+        conn.exec_driver_sql(_INSERT, rows)
+
+
+def _time(conn, sql: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.exec_driver_sql(sql).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="per-user query latency vs table size")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="total rows at the last step")
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--drop-index", action="store_true", help="measure without the composite index")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="yachaflex-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    import migrations
+    from database import engine
+
+    migrations.migrate(engine)
+    base = datetime(2024, 1, 1)
+    latest = (
+        f"SELECT * FROM stress_records WHERE user_id = {TARGET_USER} ORDER BY timestamp DESC LIMIT 1"
+    )
+    history = (
+        f"SELECT * FROM stress_records WHERE user_id = {TARGET_USER} ORDER BY timestamp ASC LIMIT 30"
+    )
+
+    with engine.begin() as conn:
+        if args.drop_index:
+            conn.exec_driver_sql("DROP INDEX ix_stress_records_user_id_timestamp")
+        conn.exec_driver_sql(_INSERT, [
+            (TARGET_USER, 5, 5, 5, 50.0, 50.0, "medium", base + timedelta(hours=i))
+            for i in range(TARGET_RECORDS)
+        ])
+
+    print(f"{'rows':>10}  {'latest ms':>10}  {'history ms':>10}")
+    seeded = 0
+    for step in range(1, args.steps + 1):
+        target = args.rows * step // args.steps
+        with engine.begin() as conn:
+            _seed(conn, seeded, target, args.users, base)
+        seeded = target
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+            print(f"{seeded + TARGET_RECORDS:>10}  "
+                  f"{_time(conn, latest, args.repeat):>10.3f}  "
+                  f"{_time(conn, history, args.repeat):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Recovery rate and cost of parsing damaged model answers.
+
+Builds --answers synthetic answers in the shape the prompt asks for. A share
+of them is damaged the way real outputs are: wrapped in a code fence,
+followed by prose, given trailing commas, or cut off at a random point as
+max_tokens would. Each answer is parsed by the old regex extractor (inlined
+here for reference) and by services.parsing.read(). For each parser the bench
+reports the parse time per answer and how many answers came back without a
+summary, which takes a full retry (the old code served those as empty
+content). For the new parser it also reports how many answers need only a
+targeted repair of one or more sections.
+
+    python bench/llm_parsing.py --answers 20000 --damaged 0.3
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import parsing
+
+
+def _old_extract_json(raw: str) -> dict:
+    """The extractor services.parsing replaced."""
+    raw = raw.strip()
+    raw = re.sub(r"^```(?:json)?\s*", "", raw)
+    raw = re.sub(r"\s*```$", "", raw)
+    raw = raw.strip()
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        pass
+    match = re.search(r'\{.*\}', raw, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group())
+        except json.JSONDecodeError:
+            pass
+    return {}
+
+
+def _answer() -> str:
+    words = "la célula fotosíntesis energía luz cloroplasto agua glucosa oxígeno planta raíz hoja".split()
+
+    def sentence(n: int) -> str:
+        return " ".join(random.choices(words, k=n))
+
+    body = {
+        "summary": "\n".join(sentence(14) + "." for _ in range(10)),
+        "flashcards": [{"question": sentence(7) + "?", "answer": sentence(12)} for _ in range(5)],
+        "quiz": [{"question": sentence(9) + "?", "options": [sentence(2) for _ in range(4)], "correct_index": 1}
+                 for _ in range(4)],
+    }
+    return json.dumps(body, ensure_ascii=False, indent=2)
+
+
+def _damage(raw: str) -> str:
+    kind = random.choice(("fence", "prose", "trailing_comma", "truncate", "truncate"))
+    if kind == "fence":
+        return f"```json\n{raw}\n```"
+    if kind == "prose":
+        return f"Aquí está el contenido:\n{raw}\nEspero que te ayude {{:)}}"
+    if kind == "trailing_comma":
+        return raw.replace("}\n  ]", "},\n  ]")
+    return raw[:random.randint(len(raw) // 3, len(raw) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="old regex extractor vs services.parsing on damaged answers")
+    parser.add_argument("--answers", type=int, default=20_000)
+    parser.add_argument("--damaged", type=float, default=0.3, help="share of damaged answers")
+    args = parser.parse_args()
+    random.seed(3)
+    answers = [_damage(raw) if random.random() < args.damaged else raw
+               for raw in (_answer() for _ in range(args.answers))]
+
+    started = time.perf_counter()
+    old = [_old_extract_json(raw) for raw in answers]
+    old_us = (time.perf_counter() - started) / len(answers) * 1e6
+    started = time.perf_counter()
+    new = [parsing.read(raw) for raw in answers]
+    new_us = (time.perf_counter() - started) / len(answers) * 1e6
+
+    old_full = sum(1 for result in old if not result.get("summary"))
+    new_full = sum(1 for result, _ in new if not result["summary"])
+    new_repair = sum(1 for result, missing in new if result["summary"] and missing)
+    print(f"{len(answers)} answers, {args.damaged:.0%} damaged")
+    print(f"old extractor  {old_us:6.1f}us/answer   no summary {old_full / len(answers):6.2%}")
+    print(f"parsing.read   {new_us:6.1f}us/answer   no summary {new_full / len(answers):6.2%}   "
+          f"section repairs {new_repair / len(answers):6.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Success rate and latency of LLM calls under upstream faults, using fake providers only.
+
+Sends --requests completions, --concurrency at a time, to a primary that
+answers --rate-limit of calls with 429 and --errors with 503. This is run
+three ways:
+  no retry   one provider, no 429 retries (what a single upstream gave before:
+             every fault is a 503 to the student)
+  backoff    one provider, 429s retried with jittered exponential backoff
+  failover   the primary plus a standby (weight 0) that takes over on faults
+             and while the primary's circuit is open
+
+    python bench/llm_providers.py --requests 500 --rate-limit 0.3 --errors 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import providers
+
+MESSAGES = [{
+    "role": "user",
+    "content": (
+        "Adapt the following text for a student with MEDIUM stress level.\n"
+        "exactly 5 flashcards, and exactly 4 quiz questions with 4 options each.\n\n"
+        'Text:\n"""La fotosíntesis convierte la energía luminosa en energía química."""\n\n'
+        'Respond ONLY with this exact JSON structure:\n{"summary": "...", "flashcards": [], "quiz": []}'
+    ),
+}]
+
+
+async def _run(router: providers.Router, requests: int, concurrency: int) -> tuple[int, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one() -> bool:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await router.complete(MESSAGES)
+            except Exception:
+                return False
+            latencies.append((time.perf_counter() - started) * 1000)
+            return True
+
+    ok = sum(await asyncio.gather(*(one() for _ in range(requests))))
+    return ok, sorted(latencies)
+
+
+def _fake(name: str, weight: float, args, faulty: bool) -> providers.FakeProvider:
+    return providers.FakeProvider(
+        name, weight, latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second,
+        error_rate=args.errors if faulty else 0.0, rate_limit_rate=args.rate_limit if faulty else 0.0,
+    )
+
+
+async def main(args) -> None:
+    providers.LLM_MAX_RETRIES = 0
+    await _report("no retry", providers.Router([_fake("primary", 1, args, True)]), args)
+    providers.LLM_MAX_RETRIES = args.retries
+    await _report("backoff", providers.Router([_fake("primary", 1, args, True)]), args)
+    await _report("failover", providers.Router([_fake("primary", 1, args, True), _fake("standby", 0, args, False)]),
+                  args)
+
+
+async def _report(name: str, router: providers.Router, args) -> None:
+    started = time.perf_counter()
+    ok, latencies = await _run(router, args.requests, args.concurrency)
+    elapsed = time.perf_counter() - started
+    p50 = statistics.median(latencies) if latencies else 0.0
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)] if latencies else 0.0
+    calls = {p.name: p.counts["calls"] for p in router.providers}
+    print(f"{name:9} success {ok / args.requests:7.2%}   p50={p50:7.1f}ms p95={p95:7.1f}ms   "
+          f"{elapsed:5.1f}s   failovers {router.failovers:4}   calls {calls}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM routing under injected upstream faults")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rate-limit", type=float, default=0.3, help="share of 429s from the primary")
+    parser.add_argument("--errors", type=float, default=0.05, help="share of 503s from the primary")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""
+Login storm: logins/sec and the latency other endpoints see meanwhile.
+
+Registers --users accounts, measures GET /health and GET /history latency
+at rest, then runs --concurrency login loops for --seconds while probing
+the same endpoints again. With hashing on its own bounded executor, the
+probes should stay close to their baseline.
+
+    uvicorn main:app --port 8000
+    python bench/login_storm.py --url http://127.0.0.1:8000 --concurrency 64 --seconds 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+PASSWORD = "storm-password"
+
+
+async def _register(client: httpx.AsyncClient, index: int) -> tuple[str, str]:
+    email = f"storm-{uuid.uuid4().hex[:8]}-{index}@example.com"
+    response = await client.post("/auth/register", json={"email": email, "nombre": "Storm", "password": PASSWORD})
+    response.raise_for_status()
+    return email, response.json()["access_token"]
+
+
+async def _probe(client: httpx.AsyncClient, token: str, until: float) -> dict:
+    latencies: dict = {"/health": [], "/history": []}
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < until:
+        for path in latencies:
+            started = time.perf_counter()
+            await client.get(path, headers=headers)
+            latencies[path].append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+async def _login_loop(client: httpx.AsyncClient, emails: list, until: float, counts: dict) -> None:
+    i = 0
+    while time.perf_counter() < until:
+        email = emails[i % len(emails)]
+        i += 1
+        response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+def _summary(samples: list) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return f"p50={statistics.median(ordered):.1f}ms p95={p95:.1f}ms n={len(ordered)}"
+
+
+async def run(url: str, users: int, concurrency: int, seconds: float) -> None:
+    limits = httpx.Limits(max_connections=concurrency + 8)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        accounts = [await _register(client, i) for i in range(users)]
+        emails = [email for email, _ in accounts]
+        token = accounts[0][1]
+
+        baseline = await _probe(client, token, time.perf_counter() + 3)
+
+        counts: dict = {}
+        started = time.perf_counter()
+        until = started + seconds
+        storm = asyncio.gather(*(_login_loop(client, emails, until, counts) for _ in range(concurrency)))
+        during = await _probe(client, token, until)
+        await storm
+        elapsed = time.perf_counter() - started
+
+    print(f"logins: {counts.get(200, 0) / elapsed:.1f}/s over {elapsed:.1f}s, status counts {counts}")
+    for path in baseline:
+        print(f"{path:10} at rest  {_summary(baseline[path])}")
+        print(f"{path:10} storm    {_summary(during[path])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="login storm benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=64, help="parallel login loops")
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.users, args.concurrency, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
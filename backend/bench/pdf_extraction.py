@@ -0,0 +1,127 @@
+"""
+Event-loop lag while a large PDF is extracted.
+
+Writes a synthetic PDF of --pages pages (plain Helvetica text, --lines lines
+per page). It is extracted --runs times in two ways while a 10 ms ticker
+measures how late the event loop wakes up:
+  inline  pypdf over the whole upload on the event loop, as generate_from_pdf
+          did before services.pdf
+  pool    services.pdf.extract_text (page ranges in the process pool)
+
+    python bench/pdf_extraction.py --pages 400 --runs 3
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import pdf
+
+
+def _synthetic_pdf(pages: int, lines: int) -> bytes:
+    """A minimal valid PDF: one content stream per page, one shared font, and an xref table."""
+    words = "la célula fotosíntesis energía luz cloroplasto agua glucosa oxígeno planta raíz hoja".split()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for n in range(pages):
+        text = []
+        for i in range(lines):
+            line = " ".join(words[(n + i + k) % len(words)] for k in range(10))
+            text.append(f"({line} {n}.{i}) Tj T*")
+        stream = ("BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(text) + " ET").encode("cp1252")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _extract_inline(path: str) -> str:
+    """The extraction services.pdf replaced."""
+    import pypdf
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    reader = pypdf.PdfReader(io.BytesIO(raw))
+    return "\n".join(page.extract_text() or "" for page in reader.pages).strip()
+
+
+async def _measure(extract, path: str, runs: int) -> tuple[list[float], list[float], int]:
+    lags: list[float] = []
+    seconds: list[float] = []
+    stop = asyncio.Event()
+    interval = 0.01
+
+    async def ticker() -> None:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - started - interval) * 1000)
+
+    task = asyncio.create_task(ticker())
+    chars = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        chars = len(await extract(path))
+        seconds.append(time.perf_counter() - started)
+        await asyncio.sleep(interval * 2)  # let the ticker observe each run separately
+    stop.set()
+    await task
+    return sorted(lags), seconds, chars
+
+
+async def main(args) -> None:
+    pdf.PDF_MAX_PAGES = max(pdf.PDF_MAX_PAGES, args.pages)
+    path = os.path.join(tempfile.mkdtemp(prefix="yachaflex-pdf-"), "bench.pdf")
+    with open(path, "wb") as f:
+        f.write(_synthetic_pdf(args.pages, args.lines))
+    print(f"{args.pages} pages, {os.path.getsize(path) / 1024 / 1024:.1f} MiB, "
+          f"{pdf.PDF_WORKERS} workers x {pdf.PDF_PAGES_PER_TASK} pages per task")
+
+    async def inline(path: str) -> str:
+        return _extract_inline(path)
+
+    try:
+        await pdf.extract_text(path)  # spawn the workers outside the measurement
+        for name, extract in (("inline", inline), ("pool", pdf.extract_text)):
+            lags, seconds, chars = await _measure(extract, path, args.runs)
+            print(f"{name:6} extract {statistics.median(seconds):6.2f}s ({chars} chars)   loop lag "
+                  f"p50={statistics.median(lags):8.1f}ms p99={lags[min(len(lags) - 1, int(len(lags) * 0.99))]:8.1f}ms "
+                  f"max={lags[-1]:8.1f}ms")
+    finally:
+        pdf.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="event-loop lag of inline vs process-pool PDF extraction")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
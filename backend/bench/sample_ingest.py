@@ -0,0 +1,104 @@
+"""
+Raw sample ingestion throughput (samples/sec) for POST /biometrics/samples.
+
+Each batch is a synthetic --hours window from a watch: heart rate every
+--hr-interval seconds, RMSSD every 5 minutes and step counts every minute,
+delta-encoded and gzip-compressed like a client would send it.
+
+    uvicorn main:app --port 8000
+    python bench/sample_ingest.py --url http://127.0.0.1:8000 --batches 40 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import random
+import time
+import uuid
+
+import httpx
+
+
+def _series(kind: str, start_ms: int, count: int, interval_ms: int, value) -> dict:
+    return {
+        "kind": kind,
+        "start": start_ms,
+        "deltas": [0] + [interval_ms] * (count - 1),
+        "values": [round(value(i), 1) for i in range(count)],
+    }
+
+
+def make_batch(hours: float, hr_interval_s: float, start_ms: int) -> dict:
+    hr_count = int(hours * 3600 / hr_interval_s)
+    return {"series": [
+        _series("heart_rate", start_ms, hr_count, int(hr_interval_s * 1000),
+                lambda i: 70 + 12 * math.sin(i / 600) + random.gauss(0, 3)),
+        _series("hrv_rmssd", start_ms, max(1, int(hours * 12)), 300_000,
+                lambda i: 45 - i * 0.05 + random.gauss(0, 4)),
+        _series("steps", start_ms, max(1, int(hours * 60)), 60_000,
+                lambda i: max(0.0, random.gauss(40, 30))),
+    ]}
+
+
+async def run(url: str, batches: int, concurrency: int, hours: float, hr_interval_s: float) -> None:
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        response = await client.post("/auth/register", json={
+            "email": f"ingest-{uuid.uuid4().hex[:8]}@example.com", "nombre": "Ingest", "password": "ingest-password",
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await client.post("/checkin", json={"bienestar": 6, "sueno": 6, "concentracion": 6}, headers=headers)
+
+        start_ms = int(time.time() * 1000) - int(batches * hours * 3_600_000)
+        bodies = []
+        for i in range(batches):
+            batch = make_batch(hours, hr_interval_s, start_ms + int(i * hours * 3_600_000))
+            raw = json.dumps(batch).encode()
+            bodies.append((gzip.compress(raw), sum(len(s["values"]) for s in batch["series"]), len(raw)))
+
+        queue = asyncio.Queue()
+        for body in bodies:
+            queue.put_nowait(body)
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                body, _, _ = queue.get_nowait()
+                response = await client.post(
+                    "/biometrics/samples", content=body,
+                    headers={**headers, "Content-Type": "application/json", "Content-Encoding": "gzip"},
+                )
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        metrics = (await client.get("/metrics")).json().get("biometric_samples", {})
+
+    total = sum(count for _, count, _ in bodies)
+    wire = sum(len(body) for body, _, _ in bodies)
+    raw = sum(size for _, _, size in bodies)
+    print(f"{batches} batches, {total} samples in {elapsed:.2f}s -> {total / elapsed:,.0f} samples/s end to end "
+          f"({errors} errors)")
+    print(f"wire: {wire / 1024:.0f} KiB gzip ({raw / 1024:.0f} KiB JSON), "
+          f"storage compression x{metrics.get('compression_ratio')}, "
+          f"server-side {metrics.get('samples_per_sec'):,} samples/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="raw sample ingestion benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--batches", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--hours", type=float, default=6, help="time window covered by each batch")
+    parser.add_argument("--hr-interval", type=float, default=1.0, help="seconds between heart-rate samples")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.batches, args.concurrency, args.hours, args.hr_interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Serialization cost of the hot responses, without the database or the network.
+
+Renders a GET /history page of --points records and a POST /generate payload
+three ways:
+  before   build pydantic models, let FastAPI validate them against the
+           response_model again (serialize_response) and render with the
+           stdlib-json JSONResponse
+  orjson   the same, rendered with ORJSONResponse (the app's default class)
+  lean     what the endpoints do now: history as plain dicts straight into
+           ORJSONResponse, the generate payload validated once and sent with
+           services.responses.model_response
+
+    python bench/serialization.py --points 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from models import GenerateResponse, HistoryResponse, StressHistoryPoint, StressSummary
+from services.responses import model_response
+
+Row = namedtuple("Row", "id timestamp stress_score stress_level heart_rate")
+
+
+def _rows(points: int) -> list[Row]:
+    base = datetime(2024, 3, 1, 8, 0, 0, 250000)
+    rows = []
+    for i in range(points):
+        score = round(random.uniform(0, 100), 2)
+        level = "low" if score <= 33 else "medium" if score <= 66 else "high"
+        rows.append(Row(i + 1, base + timedelta(minutes=41 * i), score, level, 72.0 if i % 3 else None))
+    return rows
+
+
+def _summary(rows: list[Row]) -> dict:
+    scores = [row.stress_score for row in rows]
+    return {
+        "count": len(rows), "average_score": round(sum(scores) / len(scores), 2),
+        "min_score": min(scores), "max_score": max(scores),
+        "levels": {level: sum(row.stress_level == level for row in rows) for level in ("low", "medium", "high")},
+    }
+
+
+def _llm_result() -> dict:
+    words = "la fotosíntesis convierte energía luminosa en energía química dentro del cloroplasto".split()
+
+    def sentence(n: int) -> str:
+        return " ".join(random.choices(words, k=n))
+
+    return {
+        "summary": " ".join(sentence(12) + "." for _ in range(12)),
+        "flashcards": [{"question": sentence(8) + "?", "answer": sentence(16)} for _ in range(8)],
+        "quiz": [{"question": sentence(10) + "?", "options": [sentence(3) for _ in range(4)], "correct_index": 2}
+                 for _ in range(5)],
+    }
+
+
+# ── Render paths ─────────────────────────────────────────────────────────────
+
+async def _through_fastapi(field, content, response_class) -> bytes:
+    return response_class(await serialize_response(field=field, response_content=content)).body
+
+
+async def history_models(field, rows, summary, response_class) -> bytes:
+    content = HistoryResponse(
+        records=[
+            StressHistoryPoint(timestamp=r.timestamp, stress_score=r.stress_score, stress_level=r.stress_level,
+                               has_biometrics=r.heart_rate is not None)
+            for r in rows
+        ],
+        average_score=summary["average_score"],
+        total_records=summary["count"],
+        summary=StressSummary(**summary),
+    )
+    return await _through_fastapi(field, content, response_class)
+
+
+async def history_lean(field, rows, summary, response_class) -> bytes:
+    return ORJSONResponse({
+        "records": [
+            {"timestamp": r.timestamp, "stress_score": r.stress_score, "stress_level": r.stress_level,
+             "has_biometrics": r.heart_rate is not None}
+            for r in rows
+        ],
+        "average_score": summary["average_score"],
+        "total_records": summary["count"],
+        "next_cursor": None,
+        "summary": summary,
+        "buckets": None,
+        "periods": None,
+    }).body
+
+
+def _generate_model(result: dict) -> GenerateResponse:
+    return GenerateResponse(stress_level="medium", summary=result["summary"], flashcards=result["flashcards"],
+                            quiz=result["quiz"], content_id=42)
+
+
+async def generate_models(field, result, response_class) -> bytes:
+    return await _through_fastapi(field, _generate_model(result), response_class)
+
+
+async def generate_lean(field, result, response_class) -> bytes:
+    return model_response(_generate_model(result)).body
+
+
+async def _time(render, *args, repeat: int) -> float:
+    """Best-of-three mean microseconds per call."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await render(*args)
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best * 1e6
+
+
+async def run(points: int, repeat: int) -> None:
+    rows, result = _rows(points), _llm_result()
+    summary = _summary(rows)
+    history_field = create_model_field("Response_get_history", HistoryResponse, mode="serialization")
+    generate_field = create_model_field("Response_generate", GenerateResponse, mode="serialization")
+
+    before = json.loads(await history_models(history_field, rows, summary, JSONResponse))
+    assert json.loads(await history_lean(history_field, rows, summary, None)) == before
+    before = json.loads(await generate_models(generate_field, result, JSONResponse))
+    assert json.loads(await generate_lean(generate_field, result, None)) == before
+
+    cases = (
+        (f"history, {points} points", history_models, history_lean, (history_field, rows, summary),
+         max(1, repeat // 10)),
+        ("generate payload", generate_models, generate_lean, (generate_field, result), repeat),
+    )
+    for name, models_path, lean_path, args, n in cases:
+        stdlib = await _time(models_path, *args, JSONResponse, repeat=n)
+        orjson_only = await _time(models_path, *args, ORJSONResponse, repeat=n)
+        lean = await _time(lean_path, *args, ORJSONResponse, repeat=n)
+        size = len(await lean_path(*args, ORJSONResponse))
+        print(f"{name:22} before {stdlib:9.1f}us   orjson {orjson_only:9.1f}us   lean {lean:9.1f}us   "
+              f"({stdlib / lean:.1f}x, {size / 1024:.1f} KiB)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="response serialization cost: before vs orjson vs lean")
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    random.seed(5)
+    asyncio.run(run(args.points, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
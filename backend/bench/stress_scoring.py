@@ -0,0 +1,93 @@
+"""
+Scalar vs vectorized stress scoring on synthetic records.
+
+Generates --records synthetic check-ins (about 30% without heart rate and
+30% without activity) in chunks, scores them with calculate_stress_batch,
+and scores the first --scalar-records with calculate_stress one by one,
+checking that both give identical scores and levels.
+
+    python bench/stress_scoring.py --records 10000000 --scalar-records 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.stress import calculate_stress, calculate_stress_batch  # noqa: E402
+
+
+def synthetic(rng: np.random.Generator, n: int) -> dict:
+    heart_rate = rng.uniform(45, 140, n).round(1)
+    heart_rate[rng.random(n) < 0.3] = np.nan
+    activity = rng.integers(0, 15_000, n).astype(np.float64)
+    activity[rng.random(n) < 0.3] = np.nan
+    return {
+        "bienestar": rng.integers(1, 11, n).astype(np.float64),
+        "sueno": rng.uniform(1, 10, n).round(1),
+        "concentracion": rng.integers(1, 11, n).astype(np.float64),
+        "heart_rate": heart_rate,
+        "activity": activity,
+    }
+
+
+def _optional(value: float):
+    return None if np.isnan(value) else float(value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="scalar vs vectorized stress scoring")
+    parser.add_argument("--records", type=int, default=10_000_000)
+    parser.add_argument("--scalar-records", type=int, default=1_000_000,
+                        help="records scored one by one (and compared); the scalar rate is extrapolated")
+    parser.add_argument("--chunk", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vector_seconds = scalar_seconds = 0.0
+    scalar_done = mismatches = 0
+
+    for begin in range(0, args.records, args.chunk):
+        n = min(args.chunk, args.records - begin)
+        data = synthetic(rng, n)
+
+        started = time.perf_counter()
+        scores, levels = calculate_stress_batch(**data)
+        vector_seconds += time.perf_counter() - started
+
+        take = min(n, args.scalar_records - scalar_done)
+        if take > 0:
+            bienestar, sueno, concentracion = (data[k].tolist() for k in ("bienestar", "sueno", "concentracion"))
+            heart_rate, activity = data["heart_rate"], data["activity"]
+            started = time.perf_counter()
+            expected = [
+                calculate_stress(
+                    bienestar[i], sueno[i], concentracion[i],
+                    heart_rate=_optional(heart_rate[i]), activity=_optional(activity[i]),
+                )
+                for i in range(take)
+            ]
+            scalar_seconds += time.perf_counter() - started
+            mismatches += sum(
+                1 for i, (score, level) in enumerate(expected)
+                if score != scores[i] or level != levels[i]
+            )
+            scalar_done += take
+
+    vector_rate = args.records / vector_seconds
+    scalar_rate = scalar_done / scalar_seconds if scalar_seconds else 0.0
+    print(f"vectorized: {args.records:,} records in {vector_seconds:.2f}s ({vector_rate:,.0f}/s)")
+    if scalar_done:
+        print(f"scalar:     {scalar_done:,} records in {scalar_seconds:.2f}s ({scalar_rate:,.0f}/s), "
+              f"~{args.records / scalar_rate:.1f}s for {args.records:,}")
+        print(f"speed-up:   x{vector_rate / scalar_rate:.0f}; mismatches in {scalar_done:,} compared: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
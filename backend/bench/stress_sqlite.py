@@ -0,0 +1,97 @@
+"""
+Concurrency stress test for the SQLite profile in database.py.
+
+Registers a few users, then hammers POST /checkin and GET /history in
+parallel against a running server and reports throughput, latency and
+"database is locked" failures (which surface as HTTP 500).
+
+    uvicorn main:app --workers 2 --port 8000
+    python bench/stress_sqlite.py --url http://127.0.0.1:8000 --clients 32 --rounds 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+async def _register(client: httpx.AsyncClient, index: int) -> str:
+    response = await client.post("/auth/register", json={
+        "email": f"stress-{uuid.uuid4().hex[:8]}-{index}@example.com",
+        "nombre": "Stress",
+        "password": "stress-password",
+    })
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def _client_loop(client: httpx.AsyncClient, token: str, rounds: int, results: dict) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(rounds):
+        for method, path, body in (
+            ("POST", "/checkin", {"bienestar": 6, "sueno": 5, "concentracion": 7}),
+            ("GET", "/history", None),
+        ):
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats = results.setdefault(path, {"ok": 0, "errors": 0, "latencies": []})
+            stats["latencies"].append(elapsed_ms)
+            if status == 200:
+                stats["ok"] += 1
+            else:
+                stats["errors"] += 1
+
+
+async def run(url: str, clients: int, users: int, rounds: int) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        tokens = [await _register(client, i) for i in range(users)]
+        results: dict = {}
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _client_loop(client, tokens[i % users], rounds, results) for i in range(clients)
+        ))
+        elapsed = time.perf_counter() - started
+
+    report = {"elapsed_s": round(elapsed, 2)}
+    total = 0
+    for path, stats in results.items():
+        latencies = sorted(stats["latencies"])
+        total += stats["ok"]
+        report[path] = {
+            "ok": stats["ok"],
+            "errors": stats["errors"],
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+            "max_ms": round(latencies[-1], 1),
+        }
+    report["throughput_rps"] = round(total / elapsed, 1)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent request loops")
+    parser.add_argument("--users", type=int, default=4, help="distinct accounts shared by the clients")
+    parser.add_argument("--rounds", type=int, default=50, help="checkin + history pairs per client")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.clients, args.users, args.rounds))
+    for path in ("/checkin", "/history"):
+        stats = report[path]
+        print(f"{path:10} ok={stats['ok']:<6} errors={stats['errors']:<4} "
+              f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms max={stats['max_ms']}ms")
+    print(f"throughput: {report['throughput_rps']} req/s over {report['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 import os
 from dotenv import load_dotenv
 
@@ -8,10 +12,96 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./yachaflex.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": True} if "sqlitecloud" not in DATABASE_URL else {}
-)
+# Async engine connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+
+# Local SQLite profile: WAL lets readers proceed while a commit is in progress,
+# busy_timeout makes writers wait for the lock instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # durable with WAL, far fewer fsyncs than FULL
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))  # per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# SQLite allows one writer at a time: a few connections per process keep reads concurrent,
+# more only make writers starve each other in the busy handler.
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _async_url(url: str) -> Optional[str]:
+    """ASYNC_DATABASE_URL if set, else DATABASE_URL with its async driver; None if there is none."""
+    explicit = os.getenv("ASYNC_DATABASE_URL")
+    if explicit:
+        return explicit
+    scheme, _, rest = url.partition("://")
+    driver = _ASYNC_DRIVERS.get(scheme.split("+")[0])
+    return f"{driver}://{rest}" if driver else None
+
+
+def _is_local_sqlite(url: str) -> bool:
+    """True for sqlite:// and sqlite+driver:// URLs (not sqlitecloud)."""
+    return url.partition("://")[0].split("+")[0] == "sqlite"
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_local_sqlite(url) and (":memory:" in url or url.endswith("://"))
+
+
+def _pool_args(url: str) -> dict:
+    """Pool sizing; in-memory SQLite keeps SQLAlchemy's single-connection pool."""
+    if _is_memory_sqlite(url):
+        return {}
+    if _is_local_sqlite(url):
+        return {
+            "pool_size": SQLITE_POOL_SIZE,
+            "max_overflow": 0,
+            "pool_recycle": DB_POOL_RECYCLE,
+        }
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _async_engine_args(url: str) -> dict:
+    args = _pool_args(url)
+    if args and _is_local_sqlite(url):
+        args["poolclass"] = AsyncAdaptedQueuePool  # aiosqlite defaults to NullPool: a new connection per session
+    return args
+
+
+def _sync_engine_args(url: str) -> dict:
+    if not _is_local_sqlite(url):
+        return {}
+    # Sync dependencies run in FastAPI's threadpool, so a pooled connection is
+    # routinely used by a different thread than the one that opened it.
+    return {"connect_args": {"check_same_thread": False}, **_pool_args(url)}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+engine = create_engine(DATABASE_URL, **_sync_engine_args(DATABASE_URL))
+if _is_local_sqlite(DATABASE_URL):
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -24,3 +114,84 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ── Async sessions ─────────────────────────────────────────────────────────
+# Async handlers use these so queries never block the event loop.
+
+ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+
+
+class _ThreadedAsyncSession:
+    """
+    AsyncSession-compatible wrapper for drivers without an async dialect (e.g. sqlitecloud):
+    each database round trip of a regular Session runs in the threadpool.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def merge(self, instance, **kwargs):
+        return await run_in_threadpool(self.sync_session.merge, instance, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, *args, **kwargs) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, *args, **kwargs)
+
+    def get_bind(self, *args, **kwargs):
+        return self.sync_session.get_bind(*args, **kwargs)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+if ASYNC_DATABASE_URL:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_async_engine_args(ASYNC_DATABASE_URL))
+    if _is_local_sqlite(ASYNC_DATABASE_URL):
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+else:
+    async_engine = None
+
+    def AsyncSessionLocal() -> _ThreadedAsyncSession:
+        return _ThreadedAsyncSession(SessionLocal(expire_on_commit=False))
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,15 +1,36 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, checkin, biometrics, generate, history
+from fastapi.responses import ORJSONResponse
+import migrations
+from database import async_engine, engine
+from routers import auth, checkin, biometrics, content, generate, history
+from services import blobs, cache, jobs, ollama, parsing, passwords, pdf, samples, search, streaming, stress
+
+# Create missing tables and apply pending schema migrations
+migrations.migrate(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ollama.start_client()
+    await jobs.queue.start(generate.process_job)
+    yield
+    await jobs.queue.stop()
+    await ollama.close_client()
+    pdf.shutdown()
+    passwords.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()  # pooled aiosqlite threads would otherwise keep the process alive
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="YachaFlex API",
     description="Stress detection & adaptive educational content platform",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # routes without their own response class render with orjson
 )
 
 # CORS – allow Vercel frontend + localhost dev
@@ -27,6 +48,7 @@ app.include_router(checkin.router)
 app.include_router(biometrics.router)
 app.include_router(generate.router)
 app.include_router(history.router)
+app.include_router(content.router)
 
 
 @app.get("/")
@@ -34,6 +56,27 @@ def root():
     return {"status": "ok", "message": "YachaFlex API running"}
 
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "content_cache": cache.stats(),
+        "pregeneration": cache.pregeneration_report(),
+        "llm_pool": ollama.pool_stats(),
+        "llm_providers": ollama.provider_stats(),
+        "chunked_generation": ollama.chunked_stats(),
+        "llm_output": parsing.stats(),
+        "generate_stream": streaming.stats(),
+        "generate_jobs": jobs.queue.stats(),
+        "user_cache": auth.user_cache_stats(),
+        "password_hashing": passwords.stats(),
+        "biometrics_waits": biometrics.wait_stats(),
+        "biometric_samples": samples.stats(),
+        "stress_model": stress.model_info(),
+        "content_search": search.stats(),
+        "content_blobs": blobs.stats(),
+    }
+
+
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from database import get_db
@@ -0,0 +1,116 @@
+"""
+Maintenance commands, run from the backend directory:
+
+    python manage.py migrate          apply pending schema migrations
+    python manage.py migrate --status list migrations and whether they are applied
+    python manage.py rescore          re-score every stress record with the active stress model
+    python manage.py rebuild-rollups  recreate the per-user day/week stress rollups from raw records
+    python manage.py reindex-content  rebuild the full-text search index over generated content
+    python manage.py compact-content  move inline generated content into compressed, deduplicated blobs
+"""
+
+import argparse
+import logging
+
+import migrations
+from database import engine
+
+
+def cmd_migrate(args: argparse.Namespace) -> None:
+    if args.status:
+        for version, description, applied in migrations.status(engine):
+            print(f"{'x' if applied else ' '} {version:3}  {description}")
+        return
+    applied = migrations.migrate(engine)
+    print(f"applied {applied}" if applied else "schema is up to date")
+
+
+def cmd_rescore(args: argparse.Namespace) -> None:
+    from services.rescore import rescore_records
+    from services.stress import current_model, get_model
+
+    def progress(report: dict) -> None:
+        print(f"  scanned {report['scanned']}, changed {report['changed']}", end="\r", flush=True)
+
+    model = get_model(args.model) if args.model else current_model()
+    if args.model and model.version != args.model:
+        raise SystemExit(f"unknown stress model {args.model!r}")
+    report = rescore_records(engine, chunk_size=args.chunk_size, dry_run=args.dry_run, progress=progress, model=model)
+    print()
+    verb = "would change" if args.dry_run else "changed"
+    print(f"model {report['model']}: scanned {report['scanned']} records in {report['seconds']}s, {verb} {report['changed']} "
+          f"({report['level_changed']} with a different level)")
+    if report["changed"] and not args.dry_run:
+        cmd_rebuild_rollups(args)
+
+
+def cmd_rebuild_rollups(args: argparse.Namespace) -> None:
+    from services import rollups
+
+    with engine.begin() as conn:
+        report = rollups.rebuild(conn)
+    print(f"rebuilt {report['rows']} rollup rows from {report['records']} records in {report['seconds']}s")
+
+
+def cmd_reindex_content(args: argparse.Namespace) -> None:
+    from services import search
+
+    with engine.begin() as conn:
+        report = search.rebuild(conn)
+    if not report["enabled"]:
+        print("full-text search is not available on this database; /content/search uses its LIKE fallback")
+        return
+    print(f"indexed {report['rows']} content rows in {report['seconds']}s")
+
+
+def cmd_compact_content(args: argparse.Namespace) -> None:
+    from services import blobs
+
+    def progress(report: dict) -> None:
+        print(f"  moved {report['rows']} rows", end="\r", flush=True)
+
+    with engine.connect() as conn:
+        report = blobs.compact(conn, chunk_size=args.chunk_size, progress=progress)
+    print()
+    saved = report["inline_bytes"] - report["blob_bytes"]
+    print(f"moved {report['rows']} rows in {report['seconds']}s: {report['inline_bytes'] / 2**20:.1f} MiB inline "
+          f"-> {report['blob_bytes'] / 2**20:.1f} MiB of new blobs ({blobs.BLOB_CODEC}), "
+          f"{saved / 2**20:.1f} MiB saved")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")  # hand the freed pages back to the filesystem
+        print("vacuumed")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="YachaFlex maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="apply pending schema migrations")
+    migrate.add_argument("--status", action="store_true", help="only list migrations")
+    migrate.set_defaults(handler=cmd_migrate)
+
+    rescore = commands.add_parser("rescore", help="re-score stored stress records in chunks")
+    rescore.add_argument("--chunk-size", type=int, default=10_000)
+    rescore.add_argument("--dry-run", action="store_true", help="count changes without writing them")
+    rescore.add_argument("--model", help="stress model version to score with (default: the active one)")
+    rescore.set_defaults(handler=cmd_rescore)
+
+    rebuild_rollups = commands.add_parser("rebuild-rollups", help="recreate stress rollups from stress records")
+    rebuild_rollups.set_defaults(handler=cmd_rebuild_rollups)
+
+    reindex_content = commands.add_parser("reindex-content", help="rebuild the generated content search index")
+    reindex_content.set_defaults(handler=cmd_reindex_content)
+
+    compact_content = commands.add_parser("compact-content", help="move inline generated content into blobs")
+    compact_content.add_argument("--chunk-size", type=int, default=500)
+    compact_content.add_argument("--vacuum", action="store_true", help="shrink the SQLite file afterwards")
+    compact_content.set_defaults(handler=cmd_compact_content)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Versioned schema migrations.
+
+Base.metadata.create_all only creates missing tables; it never adds a
+column or an index to a table that already exists. Each entry in
+MIGRATIONS is applied once, in order, and recorded in schema_version.
+
+Migrations must be idempotent (check before altering): a fresh database
+gets every table from the baseline in its final shape, and later steps
+then find their columns and indexes already there.
+
+migrate() runs under a database-wide lock, so several uvicorn workers
+starting together apply each step exactly once:
+  - SQLite: BEGIN IMMEDIATE (one writer at a time)
+  - PostgreSQL: transaction-scoped advisory lock
+
+    python manage.py migrate
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+from database import Base
+import models
+
+logger = logging.getLogger(__name__)
+
+_ADVISORY_LOCK_ID = 0x59414348  # "YACH"
+
+_version_table = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# ── Helpers ──────────────────────────────────────────────────────────────────
+
+def _add_column(conn: Connection, table: Table, name: str) -> None:
+    """Adds table.c[name] to an existing table if it is not there yet."""
+    if name in {col["name"] for col in inspect(conn).get_columns(table.name)}:
+        return
+    column = table.c[name]
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT '{default}'" if isinstance(default, str) else f" DEFAULT {default}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    conn.exec_driver_sql(ddl)
+
+
+def _create_index(conn: Connection, table: Table, name: str) -> None:
+    """Creates the index declared on the model as `name` (no-op if it exists)."""
+    index = next(ix for ix in table.indexes if ix.name == name)
+    index.create(conn, checkfirst=True)
+
+
+# ── Migrations ───────────────────────────────────────────────────────────────
+
+def _baseline(conn: Connection) -> None:
+    Base.metadata.create_all(conn)
+
+
+def _content_cache_usage(conn: Connection) -> None:
+    table = models.ContentCacheEntry.__table__
+    for name in ("origin", "total_tokens", "latency_ms"):
+        _add_column(conn, table, name)
+
+
+def _per_user_time_indexes(conn: Connection) -> None:
+    _create_index(conn, models.StressRecord.__table__, "ix_stress_records_user_id_timestamp")
+    _create_index(conn, models.GeneratedContent.__table__, "ix_generated_content_user_id_created_at")
+
+
+def _biometric_sessions(conn: Connection) -> None:
+    models.BiometricSession.__table__.create(conn, checkfirst=True)
+
+
+def _biometric_sample_blocks(conn: Connection) -> None:
+    models.BiometricSampleBlock.__table__.create(conn, checkfirst=True)
+
+
+def _stress_model_version(conn: Connection) -> None:
+    _add_column(conn, models.StressRecord.__table__, "model_version")
+
+
+def _stress_rollups(conn: Connection) -> None:
+    models.StressRollup.__table__.create(conn, checkfirst=True)
+    # Existing records are aggregated by `python manage.py rebuild-rollups`, or here on
+    # first startup when the table starts empty
+    from services import rollups
+    rollups.rebuild(conn)
+
+
+def _content_search(conn: Connection) -> None:
+    # FTS5 index over generated content (SQLite only; elsewhere search uses its LIKE fallback)
+    from services import search
+    search.rebuild(conn)
+
+
+def _content_blobs(conn: Connection) -> None:
+    # Schema only; existing rows are moved to blobs by `python manage.py compact-content`
+    models.ContentBlob.__table__.create(conn, checkfirst=True)
+    for name in ("original_text_blob", "flashcards_blob", "quiz_blob"):
+        _add_column(conn, models.GeneratedContent.__table__, name)
+
+
+# (version, description, step). Append only; never renumber or edit an applied step.
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline tables", _baseline),
+    (2, "content_cache usage columns", _content_cache_usage),
+    (3, "per-user (user_id, time) indexes", _per_user_time_indexes),
+    (4, "biometric_sessions table", _biometric_sessions),
+    (5, "biometric_sample_blocks table", _biometric_sample_blocks),
+    (6, "stress_records.model_version column", _stress_model_version),
+    (7, "stress_rollups table", _stress_rollups),
+    (8, "content_search full-text index", _content_search),
+    (9, "content_blobs table and generated_content blob columns", _content_blobs),
+]
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+
+def _lock(conn: Connection) -> None:
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif dialect == "postgresql":
+        conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({_ADVISORY_LOCK_ID})")
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(_version_table.name):
+        return set()
+    return set(conn.scalars(select(_version_table.c.version)))
+
+
+def migrate(engine: Engine) -> list[int]:
+    """Applies pending migrations in order. Returns the versions applied by this call."""
+    applied_now = []
+    with engine.connect() as conn:
+        _lock(conn)
+        _version_table.create(conn, checkfirst=True)
+        done = applied_versions(conn)
+        for version, description, step in MIGRATIONS:
+            if version in done:
+                continue
+            logger.info("applying migration %d: %s", version, description)
+            step(conn)
+            conn.execute(_version_table.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow(),
+            ))
+            applied_now.append(version)
+        conn.commit()
+    return applied_now
+
+
+def status(engine: Engine) -> list[tuple[int, str, bool]]:
+    """(version, description, applied) for every known migration."""
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    return [(version, description, version in done) for version, description, _ in MIGRATIONS]
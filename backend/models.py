@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, LargeBinary, Text, Enum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -45,11 +45,15 @@ class StressRecord(Base):
     # Final computed stress
     stress_score = Column(Float, nullable=False)  # 0-100
     stress_level = Column(String, nullable=False)  # low/medium/high
+    model_version = Column(String, nullable=True)  # StressModel that scored it; NULL = before versioning (v1)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="stress_records")
     generated_content = relationship("GeneratedContent", back_populates="stress_record")
 
+    # Every hot query is "this user's records, newest first"
+    __table_args__ = (Index("ix_stress_records_user_id_timestamp", "user_id", "timestamp"),)
+
 
 class GeneratedContent(Base):
     __tablename__ = "generated_content"
@@ -57,16 +61,109 @@ class GeneratedContent(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     stress_record_id = Column(Integer, ForeignKey("stress_records.id"), nullable=True)
-    original_text = Column(Text, nullable=False)
+    original_text = Column(Text, nullable=False)  # "" when original_text_blob is set
     stress_level = Column(String, nullable=False)
     summary = Column(Text, nullable=True)
-    flashcards = Column(Text, nullable=True)   # JSON string
-    quiz = Column(Text, nullable=True)         # JSON string
+    flashcards = Column(Text, nullable=True)   # JSON string (NULL when flashcards_blob is set)
+    quiz = Column(Text, nullable=True)         # JSON string (NULL when quiz_blob is set)
+    # Content-addressed storage of the fields above (see services.blobs)
+    original_text_blob = Column(String(64), ForeignKey("content_blobs.hash"), nullable=True)
+    flashcards_blob = Column(String(64), ForeignKey("content_blobs.hash"), nullable=True)
+    quiz_blob = Column(String(64), ForeignKey("content_blobs.hash"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="generated_content")
     stress_record = relationship("StressRecord", back_populates="generated_content")
 
+    __table_args__ = (Index("ix_generated_content_user_id_created_at", "user_id", "created_at"),)
+
+
+class ContentBlob(Base):
+    """One distinct text body, compressed, keyed by the SHA-256 of its UTF-8 bytes."""
+    __tablename__ = "content_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String(8), nullable=False)    # zstd / zlib / raw
+    size = Column(Integer, nullable=False)       # uncompressed bytes
+    body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GenerationJob(Base):
+    """Queued /generate/jobs request. Persisted so pending work survives a restart."""
+    __tablename__ = "generation_jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    stress_record_id = Column(Integer, ForeignKey("stress_records.id"), nullable=True)
+    stress_level = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued/running/done/failed
+    content_id = Column(Integer, ForeignKey("generated_content.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ContentCacheEntry(Base):
+    """Shared LLM output keyed by a hash of (text, stress level, model, prompt version)."""
+    __tablename__ = "content_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 hex
+    stress_level = Column(String, nullable=False)
+    summary = Column(Text, nullable=True)
+    flashcards = Column(Text, nullable=True)   # JSON string
+    quiz = Column(Text, nullable=True)         # JSON string
+    origin = Column(String, default="on_demand", nullable=False)  # on_demand / pregenerated
+    total_tokens = Column(Integer, nullable=True)  # cost of producing this entry
+    latency_ms = Column(Float, nullable=True)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class BiometricSession(Base):
+    """Biometrics posted for a QR session_id, shared by all workers (BIOMETRIC_SESSION_STORE=database)."""
+    __tablename__ = "biometric_sessions"
+
+    session_id = Column(String(64), primary_key=True)
+    payload = Column(Text, nullable=False)  # JSON string
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class BiometricSampleBlock(Base):
+    """Up to BIOMETRIC_BLOCK_MAX_SAMPLES raw samples of one kind, packed (see services.samples)."""
+    __tablename__ = "biometric_sample_blocks"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    stress_record_id = Column(Integer, ForeignKey("stress_records.id"), nullable=True)
+    kind = Column(String, nullable=False)  # heart_rate / hrv_rmssd / steps
+    start_at = Column(DateTime, nullable=False)
+    end_at = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    deltas = Column(LargeBinary, nullable=False)  # zlib(int32 ms since previous sample)
+    values = Column(LargeBinary, nullable=False)  # zlib(float32)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_biometric_sample_blocks_user_id_start_at", "user_id", "start_at"),)
+
+
+class StressRollup(Base):
+    """Per-user stress aggregates for one day or week (UTC), kept in step with stress_records (see services.rollups)."""
+    __tablename__ = "stress_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String(4), primary_key=True)          # day / week
+    period_start = Column(DateTime, primary_key=True)     # midnight; Monday for weeks
+    count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_min = Column(Float, nullable=True)
+    score_max = Column(Float, nullable=True)
+    low = Column(Integer, nullable=False, default=0)      # records per stress level
+    medium = Column(Integer, nullable=False, default=0)
+    high = Column(Integer, nullable=False, default=0)
+
 
 # ── Pydantic schemas ───────────────────────────────────────────────────────
 
@@ -97,6 +194,11 @@ class Token(BaseModel):
     user: UserResponse
 
 
+class SseTicket(BaseModel):
+    ticket: str
+    expires_in: int  # seconds
+
+
 class CheckinRequest(BaseModel):
     bienestar: float       # 1-10
     sueno: float           # 1-10
@@ -124,9 +226,32 @@ class BiometricsResponse(BaseModel):
     message: str
 
 
+class SampleSeries(BaseModel):
+    kind: str            # heart_rate (bpm) / hrv_rmssd (ms) / steps
+    start: int           # epoch milliseconds
+    deltas: list[int]    # ms since the previous sample; the first is relative to start
+    values: list[float]
+
+
+class SampleBatchRequest(BaseModel):
+    series: list[SampleSeries]
+    session_id: Optional[str] = None        # UUID from QR code, used to detect arrival
+    stress_record_id: Optional[int] = None  # defaults to the latest check-in
+
+
+class SampleBatchResponse(BaseModel):
+    samples: int
+    blocks: int
+    features: dict
+    stress_score: Optional[float] = None  # None when there is no check-in to score
+    stress_level: Optional[str] = None
+    record_id: Optional[int] = None
+
+
 class GenerateRequest(BaseModel):
     text: str
     stress_record_id: Optional[int] = None
+    all_levels: bool = False  # also pre-generate the other stress levels in the background
 
 
 class FlashCard(BaseModel):
@@ -148,6 +273,28 @@ class GenerateResponse(BaseModel):
     content_id: int
 
 
+class ContentSearchHit(BaseModel):
+    content_id: int
+    rank: float              # bm25 relevance, higher is better (0 on the LIKE fallback)
+    snippet: str             # matched terms wrapped in <mark>...</mark>
+    stress_level: str
+    created_at: datetime
+
+
+class ContentSearchResponse(BaseModel):
+    query: str
+    results: list[ContentSearchHit]
+    next_offset: Optional[int] = None   # pass as ?offset= for the next page
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str                     # queued / running / done / failed
+    position: Optional[int] = None  # place in the user's own queue while queued
+    result: Optional[GenerateResponse] = None
+    error: Optional[str] = None
+
+
 class StressHistoryPoint(BaseModel):
     timestamp: datetime
     stress_score: float
@@ -158,7 +305,36 @@ class StressHistoryPoint(BaseModel):
         from_attributes = True
 
 
-class HistoryResponse(BaseModel):
-    records: list[StressHistoryPoint]
+class StressHistoryBucket(BaseModel):
+    timestamp: datetime   # bucket start
+    stress_score: float   # mean of the records in the bucket
+    min_score: float
+    max_score: float
+    count: int
+
+
+class StressSummary(BaseModel):
+    count: int
+    average_score: float
+    min_score: Optional[float] = None
+    max_score: Optional[float] = None
+    levels: dict[str, int]   # low / medium / high -> record count
+
+
+class StressPeriod(BaseModel):
+    period_start: datetime
+    count: int
     average_score: float
-    total_records: int
+    min_score: Optional[float] = None
+    max_score: Optional[float] = None
+    levels: dict[str, int]
+
+
+class HistoryResponse(BaseModel):
+    records: list[StressHistoryPoint]       # one page, oldest first
+    average_score: float                    # over the whole requested range
+    total_records: int                      # records in the whole requested range
+    next_cursor: Optional[str] = None       # pass as ?cursor= for the next (older) page
+    summary: StressSummary
+    buckets: Optional[list[StressHistoryBucket]] = None  # only when ?points= is given
+    periods: Optional[list[StressPeriod]] = None         # only when ?period=day|week is given
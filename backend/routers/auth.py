@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-import bcrypt
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from database import get_db
+from database import AsyncSessionLocal, get_async_db
 from models import User, UserCreate, UserResponse, LoginRequest, Token
+from services import passwords
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,18 +20,16 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 SECRET_KEY = os.getenv("SECRET_KEY", "change-me")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+# EventSource cannot set headers, so SSE streams authenticate with a ticket in the URL
+# instead of the access token: valid for one session's stream, for this many seconds.
+SSE_TICKET_EXPIRE_SECONDS = int(os.getenv("SSE_TICKET_EXPIRE_SECONDS", "60"))
+SSE_TICKET_SCOPE = "biometrics:events"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
-
-
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -35,7 +37,82 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def create_sse_ticket(user_id: int, session_id: str) -> str:
+    """Short-lived token that only opens the biometrics event stream of one session."""
+    return jwt.encode({
+        "sub": str(user_id),
+        "scope": SSE_TICKET_SCOPE,
+        "sid": session_id,
+        "exp": datetime.utcnow() + timedelta(seconds=SSE_TICKET_EXPIRE_SECONDS),
+    }, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# ── Authenticated user cache ───────────────────────────────────────────────
+# Polling endpoints (e.g. /biometrics/status) authenticate several times a
+# second per open tab; identity is served from memory instead of a DB lookup.
+# Entries are detached copies (column attributes only, no relationships).
+# Changes made through the ORM in this process invalidate the entry at once;
+# other workers see them after at most USER_CACHE_TTL_SECONDS.
+
+# user_id -> (expires_at monotonic seconds, detached User)
+_user_cache: "OrderedDict[int, tuple[float, User]]" = OrderedDict()
+_user_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _detached_copy(user: User) -> User:
+    return User(
+        id=user.id,
+        email=user.email,
+        nombre=user.nombre,
+        hashed_password=user.hashed_password,
+        created_at=user.created_at,
+    )
+
+
+def _cached_user(user_id: int) -> Optional[User]:
+    entry = _user_cache.get(user_id)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if time.monotonic() > expires_at:
+        _user_cache.pop(user_id, None)
+        return None
+    _user_cache.move_to_end(user_id)
+    return user
+
+
+def _cache_user(user: User) -> User:
+    copy = _detached_copy(user)
+    _user_cache[user.id] = (time.monotonic() + USER_CACHE_TTL_SECONDS, copy)
+    _user_cache.move_to_end(user.id)
+    while len(_user_cache) > USER_CACHE_MAX_ENTRIES:
+        _user_cache.popitem(last=False)
+    return copy
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drops the cached identity; call after changing a user outside the ORM (bulk UPDATE, raw SQL)."""
+    if _user_cache.pop(user_id, None) is not None:
+        _user_cache_stats["invalidations"] += 1
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
+
+def user_cache_stats() -> dict:
+    lookups = _user_cache_stats["hits"] + _user_cache_stats["misses"]
+    return {
+        **_user_cache_stats,
+        "hit_rate": round(_user_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": len(_user_cache),
+    }
+
+
+async def _user_from_token(token: str, scope: Optional[str] = None, session_id: Optional[str] = None) -> User:
+    """Access tokens carry no scope; an SSE ticket is only accepted where its scope and session are expected."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,31 +121,61 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("scope") != scope or payload.get("sid") != session_id:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = _cached_user(int(user_id))
+    if user is not None:
+        _user_cache_stats["hits"] += 1
+        return user
+
+    _user_cache_stats["misses"] += 1
+    # Own short session: the request's session (and its pooled connection) is not
+    # opened just for identity, which matters for long-lived waits and streams.
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, int(user_id))
     if user is None:
         raise credentials_exception
-    return user
+    return _cache_user(user)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    return await _user_from_token(token)
+
+
+async def get_current_user_from_ticket(
+    session_id: str = Query(..., description="UUID embedded in the QR code"),
+    ticket: str = Query(..., description="SSE ticket, for clients that cannot set headers (EventSource)"),
+) -> User:
+    return await _user_from_token(ticket, scope=SSE_TICKET_SCOPE, session_id=session_id)
+
+
+def _hashing_busy(exc: passwords.HashingBusyError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "2"})
 
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(data: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == data.email).first()
+async def register(data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User).where(User.email == data.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
+    await db.commit()  # end the read so the pooled connection is not held while hashing
+
+    try:
+        hashed_password = await passwords.hash_password(data.password)
+    except passwords.HashingBusyError as exc:
+        raise _hashing_busy(exc)
 
     user = User(
         email=data.email,
         nombre=data.nombre,
-        hashed_password=hash_password(data.password),
+        hashed_password=hashed_password,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     token = create_access_token({"sub": str(user.id)})
     return Token(
@@ -79,10 +186,20 @@ def register(data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    if not user or not verify_password(data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Incorrect email or password")
+async def login(data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == data.email))
+    await db.commit()  # end the read so the pooled connection is not held while hashing
+    try:
+        if not user or not await passwords.verify_password(data.password, user.hashed_password):
+            raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+        # Cost changed since this hash was made: upgrade it while we have the plain password
+        new_hash = await passwords.upgraded_hash(data.password, user.hashed_password)
+    except passwords.HashingBusyError as exc:
+        raise _hashing_busy(exc)
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
 
     token = create_access_token({"sub": str(user.id)})
     return Token(
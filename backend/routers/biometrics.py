@@ -3,50 +3,240 @@ Endpoint para recibir datos biométricos del smartwatch (Health Connect Android)
 Actualiza el último StressRecord del usuario con datos biométricos y recalcula el estrés.
 
 Session tracking: each QR code embeds a unique session_id (UUID).
-The Android app forwards it in the POST body. We store received data in an
-in-memory dict keyed by session_id so the frontend can poll without false positives
-from stale records.
+The Android app forwards it in the POST body. We store received data keyed by
+session_id (services.sessions: in-process, or a table shared by all workers)
+so the frontend sees no false positives from stale records.
+
+Instead of polling /status, the frontend subscribes to GET /biometrics/events
+(SSE) or long-polls GET /biometrics/wait; submit_biometrics wakes both the
+moment data lands for that session. EventSource cannot send the Authorization
+header, so the stream takes a short-lived ticket from POST /biometrics/events/ticket
+in its URL instead of the access token.
+
+POST /biometrics/samples ingests raw HR / RMSSD / step series in batches
+(services.samples) and scores the check-in from features of that window.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from typing import Optional
-from sqlalchemy.orm import Session
-from database import get_db
-from models import BiometricsRequest, BiometricsResponse, StressRecord, User
-from services.stress import calculate_stress
-from routers.auth import get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import (
+    BiometricSampleBlock, BiometricsRequest, BiometricsResponse, SampleBatchRequest, SampleBatchResponse,
+    SseTicket, StressRecord, User,
+)
+from services import rollups, samples, sessions
+from services.stress import calculate_stress, current_model
+from routers.auth import SSE_TICKET_EXPIRE_SECONDS, create_sse_ticket, get_current_user, get_current_user_from_ticket
 
 router = APIRouter(prefix="/biometrics", tags=["biometrics"])
 
-# In-memory map: session_id -> biometric payload
-# Cleared on server restart; fine for demo purposes.
-_biometric_sessions: dict = {}
+logger = logging.getLogger(__name__)
+
+BIOMETRICS_SSE_HEARTBEAT_SECONDS = float(os.getenv("BIOMETRICS_SSE_HEARTBEAT_SECONDS", "15"))
+BIOMETRICS_WAIT_MAX_SECONDS = float(os.getenv("BIOMETRICS_WAIT_MAX_SECONDS", "600"))
+BIOMETRICS_LONG_POLL_MAX_SECONDS = float(os.getenv("BIOMETRICS_LONG_POLL_MAX_SECONDS", "55"))
+# Shared store only: how often a worker checks for arrivals posted to another worker
+BIOMETRICS_SHARED_POLL_SECONDS = float(os.getenv("BIOMETRICS_SHARED_POLL_SECONDS", "0.5"))
+
+
+# ── Arrival notifications ─────────────────────────────────────────────────
+# One Event per session being waited on, shared by all its waiters (a QR card
+# open in two tabs costs one Event), dropped when the last waiter leaves.
+# An idle waiter is a suspended coroutine: no thread, no DB connection.
+# With a shared store, a single watcher task per worker looks up every waited-on
+# session (500 ids per query) each BIOMETRICS_SHARED_POLL_SECONDS, so arrivals
+# posted to another worker are picked up too.
+
+# session_id -> [Event, number of waiters]
+_arrivals: dict = {}
+_wait_stats = {"delivered": 0}
+_watcher: Optional[asyncio.Task] = None
+
+
+def _notify(session_id: str) -> None:
+    entry = _arrivals.get(session_id)
+    if entry is not None:
+        entry[0].set()
+
+
+async def _watch_shared_store() -> None:
+    while _arrivals:
+        await asyncio.sleep(BIOMETRICS_SHARED_POLL_SECONDS)
+        try:
+            arrived = await sessions.store.get_many(list(_arrivals))
+        except Exception:
+            logger.exception("biometric session lookup failed")
+            continue
+        for session_id in arrived:
+            _notify(session_id)
+
+
+def _ensure_watcher() -> None:
+    global _watcher
+    if sessions.store.shared and (_watcher is None or _watcher.done()):
+        _watcher = asyncio.create_task(_watch_shared_store())
+
+
+async def _wait_for_biometrics(session_id: str, timeout: float) -> Optional[dict]:
+    """The session's payload as soon as it arrives, or None after timeout seconds."""
+    data = await sessions.store.get(session_id)
+    if data is not None:
+        return data
+
+    entry = _arrivals.get(session_id)
+    if entry is None:
+        entry = _arrivals[session_id] = [asyncio.Event(), 0]
+    entry[1] += 1
+    _ensure_watcher()
+    try:
+        await asyncio.wait_for(entry[0].wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and _arrivals.get(session_id) is entry:
+            del _arrivals[session_id]
+
+    data = await sessions.store.get(session_id)
+    if data is not None:
+        _wait_stats["delivered"] += 1
+    return data
+
+
+def wait_stats() -> dict:
+    return {
+        **_wait_stats,
+        "sessions_waiting": len(_arrivals),
+        "waiters": sum(count for _, count in _arrivals.values()),
+        "store": sessions.store.stats(),
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _biometrics_events(session_id: str):
+    yield "retry: 3000\n\n"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + BIOMETRICS_WAIT_MAX_SECONDS
+    while (remaining := deadline - loop.time()) > 0:
+        data = await _wait_for_biometrics(session_id, min(BIOMETRICS_SSE_HEARTBEAT_SECONDS, remaining))
+        if data is not None:
+            yield _sse("biometrics", {"received": True, **data})
+            return
+        yield ": keepalive\n\n"  # comment line: keeps proxies from closing an idle stream
+    yield _sse("timeout", {"received": False})
+
+
+@router.post("/events/ticket", response_model=SseTicket)
+async def biometrics_events_ticket(
+    session_id: str = Query(..., description="UUID embedded in the QR code"),
+    current_user: User = Depends(get_current_user),
+):
+    """Ticket for opening GET /events on this session; expires after SSE_TICKET_EXPIRE_SECONDS."""
+    return SseTicket(ticket=create_sse_ticket(current_user.id, session_id), expires_in=SSE_TICKET_EXPIRE_SECONDS)
+
+
+@router.get("/events")
+async def biometrics_events(
+    session_id: str = Query(..., description="UUID embedded in the QR code"),
+    _: User = Depends(get_current_user_from_ticket),
+):
+    """
+    Server-Sent Events stream that emits one "biometrics" event when the session's data
+    arrives, then ends. Auth is a ticket query param (see /events/ticket) because
+    EventSource cannot set headers.
+    """
+    return StreamingResponse(
+        _biometrics_events(session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/wait")
+async def wait_for_biometrics(
+    session_id: str = Query(..., description="UUID embedded in the QR code"),
+    timeout: float = Query(25, ge=0, description="Seconds to hold the request open"),
+    _: User = Depends(get_current_user),
+):
+    """Long-poll fallback: answers as soon as data arrives, or {"received": false} after timeout."""
+    data = await _wait_for_biometrics(session_id, min(timeout, BIOMETRICS_LONG_POLL_MAX_SECONDS))
+    if data is not None:
+        return {"received": True, **data}
+    return {"received": False}
 
 
 @router.get("/status")
-def get_biometrics_status(
+async def get_biometrics_status(
     session_id: str = Query(..., description="UUID embedded in the QR code"),
     _: User = Depends(get_current_user),
 ):
-    if session_id in _biometric_sessions:
-        return {"received": True, **_biometric_sessions[session_id]}
+    data = await sessions.store.get(session_id)
+    if data is not None:
+        return {"received": True, **data}
     return {"received": False}
 
 
+async def _target_record(db: AsyncSession, user_id: int, record_id: Optional[int] = None) -> Optional[StressRecord]:
+    """The given check-in of this user, or their most recent one."""
+    query = select(StressRecord).where(StressRecord.user_id == user_id)
+    if record_id is not None:
+        return await db.scalar(query.where(StressRecord.id == record_id))
+    return await db.scalar(query.order_by(StressRecord.timestamp.desc()).limit(1))
+
+
+def _apply_biometrics(record: StressRecord, heart_rate, hrv, activity) -> tuple[float, str]:
+    """Stores biometric values on the record and re-scores it."""
+    record.heart_rate = heart_rate
+    record.hrv = hrv
+    record.activity = activity
+
+    model = current_model()
+    stress_score, stress_level = calculate_stress(
+        bienestar=record.bienestar,
+        sueno=record.sueno,
+        concentracion=record.concentracion,
+        heart_rate=heart_rate,
+        hrv=hrv,
+        activity=activity,
+        model=model,
+    )
+    record.stress_score = stress_score
+    record.stress_level = stress_level
+    record.model_version = model.version
+    return stress_score, stress_level
+
+
+async def _announce(session_id: Optional[str], payload: dict) -> None:
+    """Notify the polling/subscription endpoints that this session has data."""
+    if session_id:
+        await sessions.store.put(session_id, payload)
+        _notify(session_id)
+
+
 @router.post("", response_model=BiometricsResponse)
-def submit_biometrics(
+async def submit_biometrics(
     data: BiometricsRequest,
     session_id: Optional[str] = Query(None, description="UUID forwarded via endpoint URL from QR"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     # Get the most recent stress record for this user
-    record = (
-        db.query(StressRecord)
-        .filter(StressRecord.user_id == current_user.id)
-        .order_by(StressRecord.timestamp.desc())
-        .first()
-    )
+    record = await _target_record(db, current_user.id)
 
     if record is None:
         raise HTTPException(
@@ -54,41 +244,122 @@ def submit_biometrics(
             detail="No check-in found. Please complete a check-in first.",
         )
 
-    # Update biometric fields
-    record.heart_rate = data.heart_rate
-    record.hrv = data.hrv
-    record.activity = data.activity
+    # Update biometric fields and recalculate stress with them
+    old_score, old_level = record.stress_score, record.stress_level
+    stress_score, stress_level = _apply_biometrics(record, data.heart_rate, data.hrv, data.activity)
+    await rollups.replace(db, record, old_score, old_level)
+    await db.commit()
 
-    # Recalculate stress with biometrics
-    stress_score, stress_level = calculate_stress(
-        bienestar=record.bienestar,
-        sueno=record.sueno,
-        concentracion=record.concentracion,
-        heart_rate=data.heart_rate,
-        hrv=data.hrv,
-        activity=data.activity,
+    # Prefer query param (embedded in endpoint URL from QR), fall back to body field.
+    await _announce(session_id or data.session_id, {
+        "heart_rate": data.heart_rate,
+        "hrv": data.hrv,
+        "activity": data.activity,
+        "stress_score": stress_score,
+        "stress_level": stress_level,
+    })
+
+    return BiometricsResponse(
+        stress_score=stress_score,
+        stress_level=stress_level,
+        record_id=record.id,
+        message=f"Biometrics received. Stress level updated to: {stress_level}",
     )
 
-    record.stress_score = stress_score
-    record.stress_level = stress_level
-    db.commit()
-    db.refresh(record)
 
-    # Notify the polling endpoint that this session has data.
-    # Prefer query param (embedded in endpoint URL from QR), fall back to body field.
-    sid = session_id or data.session_id
-    if sid:
-        _biometric_sessions[sid] = {
-            "heart_rate": data.heart_rate,
-            "hrv": data.hrv,
-            "activity": data.activity,
+# ── Raw sample series ─────────────────────────────────────────────────────────
+
+def _prepare_batch(raw: bytes, content_encoding: Optional[str]) -> tuple[SampleBatchRequest, int, list[dict], dict]:
+    """Decodes an uploaded batch: (request, sample count, packed blocks, window features)."""
+    batch = SampleBatchRequest.model_validate_json(samples.read_body(raw, content_encoding))
+    series = [samples.decode_series(s.kind, s.start, s.deltas, s.values) for s in batch.series]
+    total = samples.check_batch_size(series)
+    encoded = [block for s in series for block in samples.encode_blocks(s)]
+    return batch, total, encoded, samples.features(samples.merge(series))
+
+
+@router.post("/samples", response_model=SampleBatchResponse)
+async def submit_samples(
+    request: Request,
+    session_id: Optional[str] = Query(None, description="UUID forwarded via endpoint URL from QR"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Bulk ingestion of raw samples (SampleBatchRequest, optionally gzip-encoded).
+    Samples are stored as packed blocks; features of the batch window (mean HR,
+    RMSSD mean and trend, total steps) re-score the target check-in, if there is one.
+    """
+    started = time.perf_counter()
+    try:
+        # CPU-bound (decompress, parse, pack): off the event loop
+        batch, total, encoded, window = await run_in_threadpool(
+            _prepare_batch, await request.body(), request.headers.get("content-encoding"),
+        )
+    except samples.SampleBatchError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+
+    record = await _target_record(db, current_user.id, batch.stress_record_id)
+    if record is None and batch.stress_record_id is not None:
+        raise HTTPException(status_code=404, detail="Stress record not found")
+
+    blocks = [
+        BiometricSampleBlock(user_id=current_user.id, stress_record_id=record.id if record else None, **block)
+        for block in encoded
+    ]
+    db.add_all(blocks)
+
+    inputs = samples.stress_inputs(window)
+    stress_score = stress_level = None
+    if record is not None and any(value is not None for value in inputs.values()):
+        old_score, old_level = record.stress_score, record.stress_level
+        stress_score, stress_level = _apply_biometrics(record, **inputs)
+        await rollups.replace(db, record, old_score, old_level)
+    await db.commit()
+
+    if stress_score is not None:
+        await _announce(session_id or batch.session_id, {
+            **inputs,
             "stress_score": stress_score,
             "stress_level": stress_level,
-        }
+        })
 
-    return BiometricsResponse(
+    samples.record_batch(total, time.perf_counter() - started)
+    return SampleBatchResponse(
+        samples=total,
+        blocks=len(blocks),
+        features=window,
         stress_score=stress_score,
         stress_level=stress_level,
-        record_id=record.id,
-        message=f"Biometrics received. Stress level updated to: {stress_level}",
+        record_id=record.id if record else None,
     )
+
+
+@router.get("/features")
+async def get_window_features(
+    minutes: float = Query(60, gt=0, le=7 * 24 * 60, description="Window length, ending now (or at end)"),
+    end: Optional[datetime] = Query(None, description="Window end (UTC); defaults to now"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Stress features computed from the stored raw samples of a time window."""
+    end = end or datetime.utcnow()
+    start = end - timedelta(minutes=minutes)
+    rows = (await db.execute(
+        select(
+            BiometricSampleBlock.kind,
+            BiometricSampleBlock.start_at,
+            BiometricSampleBlock.deltas,
+            BiometricSampleBlock.values,
+        )
+        .where(
+            BiometricSampleBlock.user_id == current_user.id,
+            BiometricSampleBlock.start_at <= end,
+            BiometricSampleBlock.end_at >= start,
+        )
+    )).all()
+    parts = [samples.decode_block(*row) for row in rows]
+    window = samples.merge(parts, samples.to_ms(start), samples.to_ms(end))
+    return {"start": start, "end": end, "blocks": len(rows), "features": samples.features(window)}
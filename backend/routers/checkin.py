@@ -1,17 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models import CheckinRequest, CheckinResponse, StressRecord, User
-from services.stress import calculate_stress
+from services import rollups
+from services.stress import calculate_stress, current_model
 from routers.auth import get_current_user
 
 router = APIRouter(prefix="/checkin", tags=["checkin"])
 
 
 @router.post("", response_model=CheckinResponse)
-def submit_checkin(
+async def submit_checkin(
     data: CheckinRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     # Validate ranges
@@ -19,8 +20,9 @@ def submit_checkin(
         if not (1 <= value <= 10):
             raise HTTPException(status_code=422, detail=f"{field} must be between 1 and 10")
 
-    checkin_score, _ = calculate_stress(data.bienestar, data.sueno, data.concentracion)
-    stress_score, stress_level = calculate_stress(data.bienestar, data.sueno, data.concentracion)
+    model = current_model()
+    checkin_score, _ = calculate_stress(data.bienestar, data.sueno, data.concentracion, model=model)
+    stress_score, stress_level = calculate_stress(data.bienestar, data.sueno, data.concentracion, model=model)
 
     record = StressRecord(
         user_id=current_user.id,
@@ -30,10 +32,11 @@ def submit_checkin(
         checkin_score=checkin_score,
         stress_score=stress_score,
         stress_level=stress_level,
+        model_version=model.version,
     )
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    await rollups.add(db, record)
+    await db.commit()
 
     messages = {
         "low": "You're doing great! Here's detailed content to help you learn.",
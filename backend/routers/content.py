@@ -0,0 +1,34 @@
+import os
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import ContentSearchResponse, User
+from routers.auth import get_current_user
+from services import search
+
+router = APIRouter(prefix="/content", tags=["content"])
+
+CONTENT_SEARCH_MAX_LIMIT = int(os.getenv("CONTENT_SEARCH_MAX_LIMIT", "50"))
+
+
+@router.get("/search", response_model=ContentSearchResponse)
+async def search_content(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=CONTENT_SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Searches the user's generated summaries, flashcards and quiz questions.
+    Every word must match; the last word also matches as a prefix (search-as-you-type).
+    Hits are already ContentSearchHit-shaped dicts and are rendered without re-validation.
+    """
+    hits = await search.search(db, current_user.id, q, limit + 1, offset)
+    return ORJSONResponse({
+        "query": q,
+        "results": hits[:limit],
+        "next_offset": offset + limit if len(hits) > limit else None,
+    })
@@ -1,35 +1,54 @@
-import io
+import asyncio
 import json
+import logging
+import time
+import uuid
+from datetime import datetime
 from typing import Optional
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
-from models import GenerateRequest, GenerateResponse, GeneratedContent, StressRecord, User
+from database import AsyncSessionLocal, get_async_db
+from models import (
+    GenerateRequest, GenerateResponse, GeneratedContent, GenerationJob, JobResponse, StressRecord, User,
+)
 from routers.auth import get_current_user
-from services.ollama import generate_content
+from services import blobs, cache, jobs, parsing, pdf, search, streaming
+from services.responses import model_response
+from services.ollama import generate_content, needs_chunking, repair, stream_content
 
 router = APIRouter(prefix="/generate", tags=["generate"])
 
+logger = logging.getLogger(__name__)
 
-async def _resolve_stress_level(db: Session, current_user: User, record_id: Optional[int]):
+STRESS_LEVELS = ("low", "medium", "high")
+
+# Strong references to fire-and-forget pre-generation tasks
+_background: set = set()
+
+
+async def _resolve_stress_level(db: AsyncSession, current_user: User, record_id: Optional[int]):
     """Returns (stress_level, resolved_record_id)."""
     stress_level = "medium"
 
     if record_id:
-        record = db.query(StressRecord).filter(
-            StressRecord.id == record_id,
-            StressRecord.user_id == current_user.id,
-        ).first()
+        record = await db.scalar(
+            select(StressRecord).where(
+                StressRecord.id == record_id,
+                StressRecord.user_id == current_user.id,
+            )
+        )
         if record:
             stress_level = record.stress_level
     else:
-        latest = (
-            db.query(StressRecord)
-            .filter(StressRecord.user_id == current_user.id)
+        latest = await db.scalar(
+            select(StressRecord)
+            .where(StressRecord.user_id == current_user.id)
             .order_by(StressRecord.timestamp.desc())
-            .first()
+            .limit(1)
         )
         if latest:
             stress_level = latest.stress_level
@@ -38,29 +57,86 @@ async def _resolve_stress_level(db: Session, current_user: User, record_id: Opti
     return stress_level, record_id
 
 
+async def _persist(db: AsyncSession, user_id: int, text: str, stress_level: str,
+                   record_id: Optional[int], result: dict) -> GeneratedContent:
+    """Stores one per-user GeneratedContent row, adds it to the search index and commits."""
+    content_row = GeneratedContent(
+        user_id=user_id,
+        stress_record_id=record_id,
+        stress_level=stress_level,
+        summary=result.get("summary", ""),
+    )
+    await blobs.store_content(
+        db, content_row, text, json.dumps(result.get("flashcards", []), ensure_ascii=False),
+        json.dumps(result.get("quiz", []), ensure_ascii=False),
+    )
+    db.add(content_row)
+    await search.index(db, content_row, result)
+    await db.commit()
+    return content_row
+
+
+async def _cached_generate(db: AsyncSession, text: str, stress_level: str) -> dict:
+    """
+    Serves from the content cache, or calls Ollama and caches the result. LLM errors propagate.
+    Concurrent misses for the same content share one upstream call.
+    """
+    key = cache.content_key(text, stress_level)
+    result = await cache.get(db, key)
+    if result is None:
+        await db.commit()  # hand the pooled connection back for the duration of the LLM call
+        result, leader = await cache.coalesce(key, lambda: generate_content(text, stress_level))
+        if leader:
+            await cache.put(db, key, stress_level, result)
+    return result
+
+
+async def _pregenerate_variants(text: str, done_level: str) -> None:
+    """
+    Produces the stress levels other than done_level concurrently and stores them in the
+    content cache, so a later request at another level is a database read instead of an LLM call.
+    """
+    async def one(stress_level: str) -> None:
+        async with AsyncSessionLocal() as db:
+            try:
+                key = cache.content_key(text, stress_level)
+                if await cache.get(db, key) is not None:
+                    await db.commit()
+                    return
+                result, leader = await cache.coalesce(key, lambda: generate_content(text, stress_level))
+                if leader:
+                    await cache.put(db, key, stress_level, result, origin="pregenerated")
+                    await db.commit()
+            except Exception:
+                logger.exception("pre-generation of %s variant failed", stress_level)
+
+    await asyncio.gather(*(one(level) for level in STRESS_LEVELS if level != done_level))
+
+
+def _schedule_pregeneration(text: str, done_level: str) -> None:
+    task = asyncio.create_task(_pregenerate_variants(text, done_level))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
 async def _run_generate(text: str, stress_level: str, record_id: Optional[int],
-                        current_user: User, db: Session) -> GenerateResponse:
-    """Shared logic: call Ollama, persist, return response."""
+                        current_user: User, db: AsyncSession, all_levels: bool = False) -> GenerateResponse:
+    """
+    Shared logic: serve from cache or call Ollama, persist, return response.
+    The LLM output is validated here, once; callers send it with model_response().
+    """
+    if all_levels:
+        _schedule_pregeneration(text, stress_level)
+
     try:
-        result = await generate_content(text, stress_level)
+        result = await _cached_generate(db, text, stress_level)
     except Exception as e:
         raise HTTPException(
             status_code=503,
             detail=f"AI service unavailable. Make sure Ollama is running. Error: {str(e)}",
         )
 
-    content_row = GeneratedContent(
-        user_id=current_user.id,
-        stress_record_id=record_id,
-        original_text=text,
-        stress_level=stress_level,
-        summary=result.get("summary", ""),
-        flashcards=json.dumps(result.get("flashcards", [])),
-        quiz=json.dumps(result.get("quiz", [])),
-    )
-    db.add(content_row)
-    db.commit()
-    db.refresh(content_row)
+    content_row = await _persist(db, current_user.id, text, stress_level, record_id, result)
 
     return GenerateResponse(
         stress_level=stress_level,
@@ -74,32 +150,162 @@ async def _run_generate(text: str, stress_level: str, record_id: Optional[int],
 @router.post("", response_model=GenerateResponse)
 async def generate(
     data: GenerateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not data.text.strip():
+        raise HTTPException(status_code=422, detail="Text cannot be empty")
+
+    stress_level, record_id = await _resolve_stress_level(db, current_user, data.stress_record_id)
+    return model_response(await _run_generate(data.text, stress_level, record_id, current_user, db, data.all_levels))
+
+
+def _ndjson(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def _stream_generate(text: str, stress_level: str, record_id: Optional[int], user_id: int,
+                           all_levels: bool = False):
+    """
+    Yields NDJSON events: meta, summary deltas, flashcards, quiz, then done (or error).
+    Uses its own DB session because the request-scoped one is closed once streaming starts.
+    """
+    started = time.perf_counter()
+    ttfb_ms = None
+
+    def first_byte():
+        nonlocal ttfb_ms
+        if ttfb_ms is None:
+            ttfb_ms = round((time.perf_counter() - started) * 1000, 1)
+            streaming.record_ttfb(ttfb_ms)
+
+    yield _ndjson({"event": "meta", "stress_level": stress_level})
+    if all_levels:
+        _schedule_pregeneration(text, stress_level)
+
+    async with AsyncSessionLocal() as db:
+        key = cache.content_key(text, stress_level)
+        result = await cache.get(db, key)
+        cached = result is not None
+
+        if not cached:
+            await db.commit()  # hand the pooled connection back for the duration of the LLM call
+            try:
+                # The same content is already being generated (streamed or not): wait for it and
+                # send it whole, rather than spend a second LLM call on an identical answer
+                result = await cache.follow(key)
+            except Exception:
+                result = None  # that call failed or its client left; generate it here instead
+
+        if result is None and needs_chunking(text):
+            # Map-reduce cannot stream a single answer; send the merged result in one go
+            try:
+                result, leader = await cache.coalesce(key, lambda: generate_content(text, stress_level))
+            except Exception as e:
+                yield _ndjson({
+                    "event": "error",
+                    "detail": f"AI service unavailable. Make sure Ollama is running. Error: {str(e)}",
+                })
+                return
+            if leader:
+                await cache.put(db, key, stress_level, result)
+
+        if result is not None:
+            first_byte()
+            yield _ndjson({"event": "summary", "delta": result["summary"]})
+            yield _ndjson({"event": "flashcards", "items": result["flashcards"]})
+            yield _ndjson({"event": "quiz", "items": result["quiz"]})
+        else:
+            leading = cache.lead(key)
+            try:
+                parser = streaming.SectionParser()
+                try:
+                    async for delta in stream_content(text, stress_level):
+                        for event in parser.feed(delta):
+                            first_byte()
+                            yield _ndjson(event)
+                except Exception as e:
+                    leading.set_exception(e)
+                    yield _ndjson({
+                        "event": "error",
+                        "detail": f"AI service unavailable. Make sure Ollama is running. Error: {str(e)}",
+                    })
+                    return
+
+                result, missing = parsing.read(parser.buffer)
+                if parser.summary and "summary" in missing:
+                    # Already streamed to the client; keep what arrived rather than swap it for another
+                    missing.remove("summary")
+                    result["summary"] = result["summary"] or parser.summary.strip()
+                try:
+                    await repair(text, stress_level, result, missing)
+                except Exception as e:
+                    leading.set_exception(e)
+                    yield _ndjson({"event": "error", "detail": f"The AI answer could not be read. Error: {str(e)}"})
+                    return
+                leading.set_result(result)
+            finally:
+                if not leading.done():
+                    # Client went away mid-stream: release the requests waiting on this one
+                    leading.set_exception(RuntimeError("the generation this request joined was interrupted"))
+            if "summary" in missing:
+                yield _ndjson({"event": "summary", "delta": result["summary"]})
+            # Sections the incremental parser could not split out, or that validation or repair changed,
+            # are sent whole (the client replaces the items it has)
+            for name in ("flashcards", "quiz"):
+                if parser.sections.get(name) != result[name]:
+                    yield _ndjson({"event": name, "items": result[name]})
+            await cache.put(db, key, stress_level, result)
+
+        try:
+            content_row = await _persist(db, user_id, text, stress_level, record_id, result)
+        except Exception as e:
+            # The content has already been streamed; tell the client it was not saved instead of cutting the stream
+            logger.exception("streamed content could not be saved")
+            await db.rollback()
+            yield _ndjson({"event": "error", "detail": f"The generated content could not be saved. Error: {str(e)}"})
+            return
+        yield _ndjson({
+            "event": "done",
+            "content_id": content_row.id,
+            "cached": cached,
+            "ttfb_ms": ttfb_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+
+@router.post("/stream")
+async def generate_stream(
+    data: GenerateRequest,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
+    """Streaming variant of POST /generate (application/x-ndjson, one event per line)."""
     if not data.text.strip():
         raise HTTPException(status_code=422, detail="Text cannot be empty")
 
     stress_level, record_id = await _resolve_stress_level(db, current_user, data.stress_record_id)
-    return await _run_generate(data.text, stress_level, record_id, current_user, db)
+    return StreamingResponse(
+        _stream_generate(data.text, stress_level, record_id, current_user.id, data.all_levels),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.post("/pdf", response_model=GenerateResponse)
 async def generate_from_pdf(
     file: UploadFile = File(...),
     stress_record_id: Optional[int] = Form(None),
-    db: Session = Depends(get_db),
+    all_levels: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=422, detail="El archivo debe ser un PDF")
 
     try:
-        import pypdf
-
-        raw = await file.read()
-        reader = pypdf.PdfReader(io.BytesIO(raw))
-        text = "\n".join(page.extract_text() or "" for page in reader.pages).strip()
+        text = await pdf.extract_upload(file)
+    except pdf.PdfLimitError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"No se pudo leer el PDF: {str(e)}")
 
@@ -110,4 +316,104 @@ async def generate_from_pdf(
         )
 
     stress_level, record_id = await _resolve_stress_level(db, current_user, stress_record_id)
-    return await _run_generate(text, stress_level, record_id, current_user, db)
+    return model_response(await _run_generate(text, stress_level, record_id, current_user, db, all_levels))
+
+
+# ── Async jobs: submit, then poll ────────────────────────────────────────────
+
+async def process_job(job_id: str) -> None:
+    """Job queue handler: runs one queued generation and records the outcome on the job row."""
+    async with AsyncSessionLocal() as db:
+        # Claim it: another process may have enqueued the same job on its own startup
+        claimed = await db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.status == "queued")
+            .values(status="running", updated_at=datetime.utcnow())
+        )
+        await db.commit()
+        if claimed.rowcount != 1:
+            return
+        job = await db.get(GenerationJob, job_id)
+
+        try:
+            result = await _cached_generate(db, job.text, job.stress_level)
+        except Exception as e:
+            await db.rollback()
+            job.status = "failed"
+            job.error = f"AI service unavailable. Error: {str(e)}"
+            await db.commit()
+            return
+
+        try:
+            content_row = await _persist(db, job.user_id, job.text, job.stress_level, job.stress_record_id, result)
+            job.status = "done"
+            job.content_id = content_row.id
+            await db.commit()
+        except Exception as e:
+            # Without this the row would stay "running" and the client would poll it forever
+            logger.exception("generation job %s could not be saved", job_id)
+            await db.rollback()
+            job.status = "failed"
+            job.error = f"The generated content could not be saved. Error: {str(e)}"
+            await db.commit()
+
+
+async def _job_response(db: AsyncSession, job: GenerationJob) -> JobResponse:
+    response = JobResponse(job_id=job.id, status=job.status, error=job.error)
+    if job.status == "queued":
+        response.position = jobs.queue.position(job.id, job.user_id)
+    elif job.status == "done" and job.content_id is not None:
+        row = await db.get(GeneratedContent, job.content_id)
+        await blobs.hydrate(db, [row])
+        response.result = GenerateResponse(
+            stress_level=row.stress_level,
+            summary=row.summary or "",
+            flashcards=json.loads(row.flashcards or "[]"),
+            quiz=json.loads(row.quiz or "[]"),
+            content_id=row.id,
+        )
+    return response
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_generate_job(
+    data: GenerateRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Queues a generation and returns its job id immediately. Poll GET /generate/jobs/{job_id}."""
+    if not data.text.strip():
+        raise HTTPException(status_code=422, detail="Text cannot be empty")
+
+    stress_level, record_id = await _resolve_stress_level(db, current_user, data.stress_record_id)
+    job = GenerationJob(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        stress_record_id=record_id,
+        stress_level=stress_level,
+        text=data.text,
+        status="queued",
+    )
+    db.add(job)
+    await db.commit()
+
+    try:
+        jobs.queue.submit(job.id, current_user.id)
+    except jobs.QueueFullError as e:
+        await db.delete(job)
+        await db.commit()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+    return model_response(await _job_response(db, job), status_code=202)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_generate_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    job = await db.get(GenerationJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return model_response(await _job_response(db, job))
@@ -1,40 +1,201 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
-from models import HistoryResponse, StressHistoryPoint, StressRecord, User
+import base64
+import binascii
+import math
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Integer, and_, cast, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import HistoryResponse, StressRecord, User
 from routers.auth import get_current_user
+from services import rollups
 
 router = APIRouter(prefix="/history", tags=["history"])
 
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "500"))
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "1000"))
+
+# ── Cursors ──────────────────────────────────────────────────────────────────
+
+def _encode_cursor(record) -> str:
+    raw = f"{record.timestamp.isoformat()}|{record.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, record_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert aware query parameters to match."""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# ── Queries ──────────────────────────────────────────────────────────────────
+
+def _in_range(user_id: int, start: Optional[datetime], end: Optional[datetime]) -> list:
+    conditions = [StressRecord.user_id == user_id]
+    if start is not None:
+        conditions.append(StressRecord.timestamp >= start)
+    if end is not None:
+        conditions.append(StressRecord.timestamp < end)
+    return conditions
+
+
+async def _page(db: AsyncSession, conditions: list, cursor: Optional[str], limit: int):
+    """Newest-first keyset page on (timestamp, id). Returns (rows oldest first, next cursor)."""
+    query = select(
+        StressRecord.id, StressRecord.timestamp, StressRecord.stress_score, StressRecord.stress_level,
+        StressRecord.heart_rate,
+    ).where(*conditions)
+    if cursor:
+        timestamp, record_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            StressRecord.timestamp < timestamp,
+            and_(StressRecord.timestamp == timestamp, StressRecord.id < record_id),
+        ))
+    records = (await db.execute(
+        query.order_by(StressRecord.timestamp.desc(), StressRecord.id.desc()).limit(limit + 1)
+    )).all()
+    next_cursor = _encode_cursor(records[limit - 1]) if len(records) > limit else None
+    return list(reversed(records[:limit])), next_cursor
+
+
+def _stress_summary(total: dict) -> dict:
+    """StressSummary as a plain dict."""
+    return {
+        "count": total["count"],
+        "average_score": round(total["score_sum"] / total["count"], 2) if total["count"] else 0.0,
+        "min_score": total["score_min"],
+        "max_score": total["score_max"],
+        "levels": {level: total[level] for level in rollups.LEVELS},
+    }
+
+
+async def _time_span(db: AsyncSession, conditions: list) -> tuple[Optional[datetime], Optional[datetime]]:
+    """First and last timestamps in the range (two index lookups)."""
+    return (await db.execute(
+        select(func.min(StressRecord.timestamp), func.max(StressRecord.timestamp)).where(*conditions)
+    )).one()
+
+
+def _bucket_index(db: AsyncSession, start_epoch: int, width: int):
+    """floor((epoch(timestamp) - start_epoch) / width) as SQL."""
+    if db.get_bind().dialect.name == "sqlite":
+        return (cast(func.strftime("%s", StressRecord.timestamp), Integer) - start_epoch) // width
+    return func.floor((func.extract("epoch", StressRecord.timestamp) - start_epoch) / width)
+
+
+async def _buckets(db: AsyncSession, conditions: list, start: datetime, end: datetime, points: int):
+    """
+    Downsamples the range to at most `points` fixed-width time buckets (min / mean / max each),
+    grouped in the database so only the buckets cross the wire. StressHistoryBucket dicts.
+    """
+    start_epoch = int(start.replace(tzinfo=timezone.utc).timestamp())
+    span = math.ceil((end - start).total_seconds()) + 1  # seconds covered, both ends included
+    width = max(1, math.ceil(span / points))
+    bucket = _bucket_index(db, start_epoch, width).label("bucket")
+
+    rows = (await db.execute(
+        select(
+            bucket,
+            func.avg(StressRecord.stress_score),
+            func.min(StressRecord.stress_score),
+            func.max(StressRecord.stress_score),
+            func.count(),
+        )
+        .where(*conditions)
+        .group_by(bucket)
+        .order_by(bucket)
+    )).all()
+    return [
+        {
+            "timestamp": datetime.fromtimestamp(start_epoch + int(index) * width, timezone.utc).replace(tzinfo=None),
+            "stress_score": round(mean, 2),
+            "min_score": low,
+            "max_score": high,
+            "count": count,
+        }
+        for index, mean, low, high, count in rows
+    ]
+
+
+# ── Endpoint ─────────────────────────────────────────────────────────────────
 
 @router.get("", response_model=HistoryResponse)
-def get_history(
-    limit: int = 30,
-    db: Session = Depends(get_db),
+async def get_history(
+    limit: int = Query(30, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: Optional[int] = Query(None, ge=2, le=HISTORY_MAX_POINTS),
+    period: Optional[str] = Query(None, pattern="^(day|week)$"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    records = (
-        db.query(StressRecord)
-        .filter(StressRecord.user_id == current_user.id)
-        .order_by(StressRecord.timestamp.asc())
-        .limit(limit)
-        .all()
-    )
-
-    points = [
-        StressHistoryPoint(
-            timestamp=r.timestamp,
-            stress_score=r.stress_score,
-            stress_level=r.stress_level,
-            has_biometrics=r.heart_rate is not None,
-        )
-        for r in records
-    ]
+    """
+    The most recent `limit` records in [start, end) (returned oldest first), with a cursor
+    for the page before them. summary covers the whole range and is served from the
+    day/week rollups. ?points=N adds a chart series downsampled to at most N buckets;
+    ?period=day|week adds the rollup of every day or week overlapping the range.
+
+    The payload is built as plain dicts from the rows and rendered by orjson directly
+    (see services.responses); HistoryResponse documents its shape.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    conditions = _in_range(current_user.id, start, end)
+
+    records, next_cursor = await _page(db, conditions, cursor, limit)
+    summary = _stress_summary(await rollups.range_summary(db, current_user.id, start, end))
+
+    buckets = None
+    if points is not None:
+        buckets = []
+        if summary["count"]:
+            first, last = await _time_span(db, conditions)
+            buckets = await _buckets(db, conditions, start or first, end or last, points)
 
-    avg = round(sum(p.stress_score for p in points) / len(points), 2) if points else 0.0
+    periods = None
+    if period is not None:
+        periods = [
+            {
+                "period_start": row.period_start,
+                "count": row.count,
+                "average_score": round(row.score_sum / row.count, 2),
+                "min_score": row.score_min,
+                "max_score": row.score_max,
+                "levels": {level: getattr(row, level) for level in rollups.LEVELS},
+            }
+            for row in await rollups.periods(db, current_user.id, period, start, end)
+        ]
 
-    return HistoryResponse(
-        records=points,
-        average_score=avg,
-        total_records=len(points),
-    )
+    return ORJSONResponse({
+        "records": [
+            {
+                "timestamp": r.timestamp,
+                "stress_score": r.stress_score,
+                "stress_level": r.stress_level,
+                "has_biometrics": r.heart_rate is not None,
+            }
+            for r in records
+        ],
+        "average_score": summary["average_score"],
+        "total_records": summary["count"],
+        "next_cursor": next_cursor,
+        "summary": summary,
+        "buckets": buckets,
+        "periods": periods,
+    })
@@ -0,0 +1,260 @@
+"""
+Content-addressed, compressed storage for large generated_content fields.
+
+original_text, flashcards and quiz are stored once per distinct body in
+content_blobs, keyed by the SHA-256 of the UTF-8 text, and compressed with
+zstd (if the optional `zstandard` package is installed) or zlib. A whole
+class uploading the same lecture PDF shares one blob for the text, and
+cached LLM results share one blob for their flashcards and quiz.
+
+Rows point at their blobs through the *_blob columns. hydrate() fills the
+text attributes back in after a query, so readers keep using
+row.original_text / row.flashcards / row.quiz. Rows written before the
+blob columns existed keep their inline text until moved with:
+
+    python manage.py compact-content
+"""
+
+import hashlib
+import os
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import ContentBlob, GeneratedContent
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+BLOB_CODEC = os.getenv("BLOB_CODEC", "zstd" if zstandard is not None else "zlib")
+BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", "9"))
+BLOB_ZLIB_LEVEL = int(os.getenv("BLOB_ZLIB_LEVEL", "6"))
+BLOB_CACHE_MAX_ENTRIES = int(os.getenv("BLOB_CACHE_MAX_ENTRIES", "128"))  # decoded texts per worker
+
+if BLOB_CODEC == "zstd" and zstandard is None:
+    raise RuntimeError("BLOB_CODEC=zstd needs the zstandard package (pip install zstandard)")
+
+# Field name -> blob reference column on GeneratedContent
+FIELDS = {"original_text": "original_text_blob", "flashcards": "flashcards_blob", "quiz": "quiz_blob"}
+
+_texts: OrderedDict[str, str] = OrderedDict()  # hash -> decoded text (LRU)
+_known: OrderedDict[str, None] = OrderedDict()  # hashes already stored, so repeat writes skip compression
+_stats = {
+    "writes": 0, "dedup_hits": 0, "dedup_bytes": 0, "raw_bytes": 0, "stored_bytes": 0, "write_seconds": 0.0,
+    "reads": 0, "cache_hits": 0, "read_seconds": 0.0,
+}
+
+
+# ── Codec ────────────────────────────────────────────────────────────────────
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(data: bytes) -> tuple[str, bytes]:
+    """(codec, body); small bodies that do not shrink are stored raw."""
+    if BLOB_CODEC == "zstd":
+        body, codec = zstandard.ZstdCompressor(level=BLOB_ZSTD_LEVEL).compress(data), "zstd"
+    else:
+        body, codec = zlib.compress(data, BLOB_ZLIB_LEVEL), "zlib"
+    return (codec, body) if len(body) < len(data) else ("raw", data)
+
+
+def decompress(codec: str, body: bytes) -> bytes:
+    if codec == "raw":
+        return body
+    if codec == "zlib":
+        return zlib.decompress(body)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("content blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"unknown blob codec {codec!r}")
+
+
+def _remember(cache: OrderedDict, key: str, value) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > BLOB_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+
+
+def _row(key: str, text: str) -> dict:
+    data = text.encode("utf-8")
+    codec, body = compress(data)
+    _stats["raw_bytes"] += len(data)
+    _stats["stored_bytes"] += len(body)
+    return {"hash": key, "codec": codec, "size": len(data), "body": body}
+
+
+def _insert_if_absent(dialect, values: dict):
+    """INSERT ... ON CONFLICT DO NOTHING where the dialect has it, else None."""
+    if isinstance(dialect, (sqlite.base.SQLiteDialect, postgresql.base.PGDialect)):
+        insert = sqlite.insert if isinstance(dialect, sqlite.base.SQLiteDialect) else postgresql.insert
+        return insert(ContentBlob).values(**values).on_conflict_do_nothing(index_elements=["hash"])
+    return None
+
+
+# ── Writes ───────────────────────────────────────────────────────────────────
+
+async def put(db: AsyncSession, text: str) -> str:
+    """Stores text (once per distinct body) in the caller's transaction and returns its hash."""
+    started = time.perf_counter()
+    key = digest(text)
+    _stats["writes"] += 1
+    if key in _known or await db.scalar(select(ContentBlob.hash).where(ContentBlob.hash == key)):
+        _stats["dedup_hits"] += 1
+        _stats["dedup_bytes"] += len(text.encode("utf-8"))  # a body not stored again
+        _remember(_known, key, None)  # only hashes seen in the table, never ones this transaction may roll back
+    else:
+        values = _row(key, text)
+        stmt = _insert_if_absent(db.get_bind().dialect, values)
+        if stmt is not None:
+            await db.execute(stmt)
+        else:
+            await db.merge(ContentBlob(**values))
+    _stats["write_seconds"] += time.perf_counter() - started
+    return key
+
+
+def put_sync(conn: Connection, text: str) -> tuple[str, int]:
+    """put() on a plain connection (compact-content). Returns (hash, stored bytes added)."""
+    key = digest(text)
+    if conn.scalar(select(ContentBlob.hash).where(ContentBlob.hash == key)):
+        return key, 0
+    values = _row(key, text)
+    stmt = _insert_if_absent(conn.dialect, values)
+    conn.execute(stmt if stmt is not None else ContentBlob.__table__.insert().values(**values))
+    return key, len(values["body"])
+
+
+async def store_content(db: AsyncSession, row: GeneratedContent, original_text: str,
+                        flashcards: str, quiz: str) -> None:
+    """Points a new row's large fields at blobs, keeping the text readable on the instance."""
+    for field, text in (("original_text", original_text), ("flashcards", flashcards), ("quiz", quiz)):
+        setattr(row, FIELDS[field], await put(db, text))
+    row.original_text = ""  # NOT NULL column; the text lives in the blob
+    row.flashcards = row.quiz = None
+
+
+# ── Reads ────────────────────────────────────────────────────────────────────
+
+def _decode(rows) -> dict[str, str]:
+    texts = {}
+    for key, codec, body in rows:
+        text = decompress(codec, body).decode("utf-8")
+        texts[key] = text
+        _remember(_texts, key, text)
+    return texts
+
+
+async def get_texts(db: AsyncSession, keys: Iterable[str]) -> dict[str, str]:
+    """hash -> text for every hash, in one query for those not in the worker cache."""
+    started = time.perf_counter()
+    texts, missing = {}, set()
+    for key in set(keys):
+        if key in _texts:
+            texts[key] = _texts[key]
+            _texts.move_to_end(key)
+            _stats["cache_hits"] += 1
+        else:
+            missing.add(key)
+    if missing:
+        texts.update(_decode((await db.execute(
+            select(ContentBlob.hash, ContentBlob.codec, ContentBlob.body).where(ContentBlob.hash.in_(missing))
+        )).all()))
+    _stats["reads"] += len(texts)
+    _stats["read_seconds"] += time.perf_counter() - started
+    return texts
+
+
+def get_texts_sync(conn: Connection, keys: Iterable[str]) -> dict[str, str]:
+    keys = set(keys)
+    if not keys:
+        return {}
+    return _decode(conn.execute(
+        select(ContentBlob.hash, ContentBlob.codec, ContentBlob.body).where(ContentBlob.hash.in_(keys))
+    ).all())
+
+
+async def hydrate(db: AsyncSession, rows: Iterable[Optional[GeneratedContent]],
+                  fields: Iterable[str] = tuple(FIELDS)) -> None:
+    """
+    Loads the blob-backed fields of rows onto the instances (without marking them changed),
+    so callers read row.original_text / row.flashcards / row.quiz as before.
+    """
+    rows = [row for row in rows if row is not None]
+    columns = {field: FIELDS[field] for field in fields}
+    keys = [getattr(row, column) for row in rows for column in columns.values() if getattr(row, column)]
+    if not keys:
+        return
+    texts = await get_texts(db, keys)
+    for row in rows:
+        for field, column in columns.items():
+            key = getattr(row, column)
+            if key and key in texts:
+                set_committed_value(row, field, texts[key])
+
+
+# ── Compaction ───────────────────────────────────────────────────────────────
+
+def compact(conn: Connection, chunk_size: int = 500, progress=None) -> dict:
+    """
+    Moves inline original_text / flashcards / quiz of older rows into blobs, committing per chunk.
+    Returns rows moved, inline bytes before, blob bytes added, and seconds.
+    """
+    table = GeneratedContent.__table__
+    report = {"rows": 0, "inline_bytes": 0, "blob_bytes": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.original_text, table.c.flashcards, table.c.quiz)
+            .where(table.c.id > last_id, table.c.original_text_blob.is_(None))
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for row_id, original_text, flashcards, quiz in rows:
+            values = {"original_text": "", "flashcards": None, "quiz": None}
+            for field, text in (("original_text", original_text), ("flashcards", flashcards or "[]"),
+                                ("quiz", quiz or "[]")):
+                values[FIELDS[field]], added = put_sync(conn, text)
+                report["inline_bytes"] += len(text.encode("utf-8"))
+                report["blob_bytes"] += added
+            conn.execute(table.update().where(table.c.id == row_id).values(**values))
+        conn.commit()
+        report["rows"] += len(rows)
+        if progress is not None:
+            progress(report)
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def stats() -> dict:
+    return {
+        "codec": BLOB_CODEC,
+        "writes": _stats["writes"],
+        "dedup_hits": _stats["dedup_hits"],
+        "dedup_bytes": _stats["dedup_bytes"],
+        "bytes_saved": _stats["raw_bytes"] - _stats["stored_bytes"] + _stats["dedup_bytes"],
+        "compression_ratio": round(_stats["raw_bytes"] / _stats["stored_bytes"], 2) if _stats["stored_bytes"] else 0.0,
+        "avg_write_ms": round(_stats["write_seconds"] / _stats["writes"] * 1000, 3) if _stats["writes"] else 0.0,
+        "reads": _stats["reads"],
+        "cache_hits": _stats["cache_hits"],
+        "avg_read_ms": round(_stats["read_seconds"] / _stats["reads"] * 1000, 3) if _stats["reads"] else 0.0,
+    }
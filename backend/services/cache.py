@@ -0,0 +1,321 @@
+"""
+Content-addressed cache for generated study material.
+
+The same lecture PDF is often uploaded by a whole class within the hour, so
+LLM results are keyed by a hash of (normalized text, stress level, model,
+prompt version) and reused across users.
+
+Two tiers:
+  - in-process LRU (fast, per worker, bounded by CONTENT_CACHE_MAX_MEMORY)
+  - content_cache table (shared, survives restarts, bounded by CONTENT_CACHE_MAX_ROWS)
+
+Both tiers expire entries after CONTENT_CACHE_TTL_SECONDS. The table is
+counted exactly only every CONTENT_CACHE_COUNT_EVERY stores, or when the
+running estimate passes the limit; it may briefly hold a few rows more.
+
+Misses for the same key that overlap in time are coalesced (single-flight):
+the first caller runs the LLM call, the others await its result. A streamed
+generation registers itself with lead(), so identical requests, streamed or
+not, wait for it too.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ContentCacheEntry
+from services import providers
+from services.ollama import PROMPT_VERSION
+
+load_dotenv()
+
+CONTENT_CACHE_TTL_SECONDS = int(os.getenv("CONTENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CONTENT_CACHE_MAX_MEMORY = int(os.getenv("CONTENT_CACHE_MAX_MEMORY", "256"))
+CONTENT_CACHE_MAX_ROWS = int(os.getenv("CONTENT_CACHE_MAX_ROWS", "10000"))
+CONTENT_CACHE_COUNT_EVERY = int(os.getenv("CONTENT_CACHE_COUNT_EVERY", "100"))
+
+_WHITESPACE = re.compile(r"\s+")
+_MODEL_KEY = providers.model_key()
+
+# key -> (stored_at monotonic seconds, result dict, origin)
+_memory: "OrderedDict[str, tuple[float, dict, str]]" = OrderedDict()
+
+# key -> task running the upstream call for that key (or a future a streaming leader resolves)
+_inflight: "dict[str, asyncio.Future]" = {}
+
+# content_cache rows as of the last exact count, plus this worker's stores since
+_row_estimate: Optional[int] = None
+_stores_since_count = 0
+
+_stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+    "row_counts": 0,
+    "coalesced": 0,
+    # Pre-generated variants (GenerateRequest.all_levels): what they cost vs what they saved
+    "pregenerated_stores": 0,
+    "pregenerated_tokens": 0,
+    "pregenerated_ms": 0.0,
+    "pregenerated_hits": 0,
+    "pregenerated_tokens_saved": 0,
+    "pregenerated_ms_saved": 0.0,
+}
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-extracted copies of the same document hash equally."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def content_key(text: str, stress_level: str) -> str:
+    payload = "\0".join([PROMPT_VERSION, _MODEL_KEY, stress_level, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, result: dict, origin: str) -> None:
+    _memory[key] = (time.monotonic(), result, origin)
+    _memory.move_to_end(key)
+    while len(_memory) > CONTENT_CACHE_MAX_MEMORY:
+        _memory.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def _from_row(row: ContentCacheEntry) -> dict:
+    return {
+        "summary": row.summary or "",
+        "flashcards": json.loads(row.flashcards or "[]"),
+        "quiz": json.loads(row.quiz or "[]"),
+        "usage": {"total_tokens": row.total_tokens or 0, "latency_ms": row.latency_ms or 0.0},
+    }
+
+
+async def _served(db: AsyncSession, key: str, result: dict, origin: str) -> None:
+    """
+    Credits a pregenerated entry with the tokens and latency it saved on its first serve only, and
+    reclassifies it as on_demand: later serves are ones the ordinary cache would have made anyway.
+    The conditional UPDATE counts that first serve once across workers.
+    """
+    if origin != "pregenerated":
+        return
+    entry = _memory.get(key)
+    if entry is not None:
+        _memory[key] = (entry[0], entry[1], "on_demand")
+    claimed = (await db.execute(
+        update(ContentCacheEntry)
+        .where(ContentCacheEntry.key == key, ContentCacheEntry.origin == "pregenerated")
+        .values(origin="on_demand")
+        .execution_options(synchronize_session=False)
+    )).rowcount
+    if claimed != 1:
+        return
+    usage = result.get("usage", {})
+    _stats["pregenerated_hits"] += 1
+    _stats["pregenerated_tokens_saved"] += usage.get("total_tokens", 0)
+    _stats["pregenerated_ms_saved"] += usage.get("latency_ms", 0.0)
+
+
+async def get(db: AsyncSession, key: str) -> Optional[dict]:
+    """Returns the cached result for key, or None on a miss."""
+    entry = _memory.get(key)
+    if entry is not None:
+        stored_at, result, origin = entry
+        if time.monotonic() - stored_at <= CONTENT_CACHE_TTL_SECONDS:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            await _served(db, key, result, origin)
+            return result
+        del _memory[key]
+
+    row = await db.get(ContentCacheEntry, key)
+    if row is not None:
+        if row.created_at >= datetime.utcnow() - timedelta(seconds=CONTENT_CACHE_TTL_SECONDS):
+            row.hits += 1
+            row.last_used_at = datetime.utcnow()
+            result = _from_row(row)
+            _remember(key, result, row.origin)
+            _stats["db_hits"] += 1
+            await _served(db, key, result, row.origin)
+            return result
+        await db.delete(row)
+
+    _stats["misses"] += 1
+    return None
+
+
+async def put(db: AsyncSession, key: str, stress_level: str, result: dict, origin: str = "on_demand") -> None:
+    """
+    Stores a fresh result in both tiers. Empty (unparseable) results are not cached.
+    origin="pregenerated" marks variants nobody asked for yet, so their payoff can be tracked.
+    """
+    if not result.get("summary"):
+        return
+
+    _remember(key, result, origin)
+
+    usage = result.get("usage", {})
+    now = datetime.utcnow()
+    values = {
+        "key": key,
+        "stress_level": stress_level,
+        "summary": result.get("summary", ""),
+        "flashcards": json.dumps(result.get("flashcards", []), ensure_ascii=False),
+        "quiz": json.dumps(result.get("quiz", []), ensure_ascii=False),
+        "origin": origin,
+        "total_tokens": usage.get("total_tokens"),
+        "latency_ms": usage.get("latency_ms"),
+        "hits": 0,
+        "created_at": now,
+        "last_used_at": now,
+    }
+    # Upsert: another worker may store the same key between our miss and this write
+    dialect = db.get_bind().dialect
+    if isinstance(dialect, (sqlite.base.SQLiteDialect, postgresql.base.PGDialect)):
+        insert = sqlite.insert if isinstance(dialect, sqlite.base.SQLiteDialect) else postgresql.insert
+        stmt = insert(ContentCacheEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={name: stmt.excluded[name] for name in values if name != "key"},
+        )
+        await db.execute(stmt)
+    else:
+        await db.merge(ContentCacheEntry(**values))
+    _stats["stores"] += 1
+    if origin == "pregenerated":
+        _stats["pregenerated_stores"] += 1
+        _stats["pregenerated_tokens"] += usage.get("total_tokens", 0)
+        _stats["pregenerated_ms"] += usage.get("latency_ms", 0.0)
+
+    await _evict(db)
+
+
+async def _evict(db: AsyncSession) -> None:
+    """
+    Drops expired rows, then, once the table holds more than CONTENT_CACHE_MAX_ROWS, the least
+    recently used ones down to 95% of it, so a full cache is not counted again on the next store.
+    """
+    global _row_estimate, _stores_since_count
+    cutoff = datetime.utcnow() - timedelta(seconds=CONTENT_CACHE_TTL_SECONDS)
+    expired = (await db.execute(
+        delete(ContentCacheEntry)
+        .where(ContentCacheEntry.created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )).rowcount
+
+    _stats["evictions"] += expired
+
+    # An upsert of an existing key over-counts, which only brings the next exact count forward;
+    # the periodic count also picks up rows stored by other workers
+    _stores_since_count += 1
+    if _row_estimate is not None:
+        _row_estimate += 1 - expired
+        if _row_estimate <= CONTENT_CACHE_MAX_ROWS and _stores_since_count < CONTENT_CACHE_COUNT_EVERY:
+            return
+
+    rows = await db.scalar(select(func.count()).select_from(ContentCacheEntry))
+    _stats["row_counts"] += 1
+    _stores_since_count = 0
+    if rows > CONTENT_CACHE_MAX_ROWS:
+        stale_keys = (await db.scalars(
+            select(ContentCacheEntry.key)
+            .order_by(ContentCacheEntry.last_used_at.asc())
+            .limit(rows - CONTENT_CACHE_MAX_ROWS * 19 // 20)
+        )).all()
+        await db.execute(
+            delete(ContentCacheEntry)
+            .where(ContentCacheEntry.key.in_(stale_keys))
+            .execution_options(synchronize_session=False)
+        )
+        rows -= len(stale_keys)
+        _stats["evictions"] += len(stale_keys)
+    _row_estimate = rows
+
+
+async def coalesce(key: str, factory: Callable[[], Awaitable[dict]]) -> tuple[dict, bool]:
+    """
+    Runs factory() once for all concurrent callers with the same key.
+    Returns (result, leader); only the leader should store the result.
+    The call runs in its own task, so a leader whose client disconnects does not cancel it for the others.
+    """
+    task = _inflight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+        return await asyncio.shield(task), False
+
+    task = asyncio.ensure_future(factory())
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task), True
+
+
+async def follow(key: str) -> Optional[dict]:
+    """The result of a call already in flight for key (see coalesce and lead), or None if there is none."""
+    task = _inflight.get(key)
+    if task is None:
+        return None
+    _stats["coalesced"] += 1
+    return await asyncio.shield(task)
+
+
+def _settled(key: str, future: asyncio.Future) -> None:
+    _inflight.pop(key, None)
+    if not future.cancelled():
+        future.exception()  # followers, if any, have seen it; do not log it as never retrieved
+
+
+def lead(key: str) -> asyncio.Future:
+    """
+    Registers the caller as the one producing key's result outside coalesce (the streaming path),
+    so concurrent misses await it instead of calling the LLM again. The caller must resolve the
+    future with set_result or set_exception, or cancel it, on every path.
+    """
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    future.add_done_callback(lambda done: _settled(key, done))
+    return future
+
+
+def pregeneration_report() -> dict:
+    """
+    Cost/latency trade-off of all_levels pre-generation in this worker:
+    tokens spent producing variants vs tokens (and waiting time) saved when they were later served.
+    net_tokens < 0 means pre-generation has so far cost more quota than it saved.
+    """
+    generated = _stats["pregenerated_stores"]
+    return {
+        "variants_generated": generated,
+        "variants_served": _stats["pregenerated_hits"],
+        "tokens_spent": _stats["pregenerated_tokens"],
+        "tokens_saved": _stats["pregenerated_tokens_saved"],
+        "net_tokens": _stats["pregenerated_tokens_saved"] - _stats["pregenerated_tokens"],
+        "background_generation_ms": round(_stats["pregenerated_ms"], 1),
+        "user_latency_saved_ms": round(_stats["pregenerated_ms_saved"], 1),
+        "avg_latency_saved_ms": (
+            round(_stats["pregenerated_ms_saved"] / _stats["pregenerated_hits"], 1)
+            if _stats["pregenerated_hits"] else 0.0
+        ),
+    }
+
+
+def stats() -> dict:
+    lookups = _stats["memory_hits"] + _stats["db_hits"] + _stats["misses"]
+    hits = _stats["memory_hits"] + _stats["db_hits"]
+    return {
+        **{name: value for name, value in _stats.items() if not name.startswith("pregenerated")},
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "memory_entries": len(_memory),
+        "in_flight": len(_inflight),
+    }
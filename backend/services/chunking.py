@@ -0,0 +1,63 @@
+"""
+Token-aware splitting of long documents for map-reduce generation.
+
+Token counts are estimated (~4 characters per token for Spanish/English
+text with Llama tokenizers), which is close enough to keep every chunk
+well inside the model context without shipping a tokenizer.
+"""
+
+import re
+
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(piece: str, max_chars: int) -> list[str]:
+    """Breaks a paragraph longer than max_chars on lines, then on words."""
+    if len(piece) <= max_chars:
+        return [piece]
+
+    parts, current = [], ""
+    for unit in re.split(r"(?<=\n)|(?<= )", piece):
+        if len(unit) > max_chars:  # a single unbroken run (e.g. extracted table): hard cut
+            if current:
+                parts.append(current)
+                current = ""
+            parts.extend(unit[i:i + max_chars] for i in range(0, len(unit), max_chars))
+        elif len(current) + len(unit) > max_chars:
+            parts.append(current)
+            current = unit
+        else:
+            current += unit
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_text(text: str, max_tokens: int) -> list[str]:
+    """
+    Greedily packs paragraphs into chunks of at most max_tokens (estimated).
+    Order is preserved, so chunk i always covers an earlier part of the text than chunk i+1.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks, current = [], ""
+
+    for paragraph in _PARAGRAPHS.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in _split_oversized(paragraph, max_chars):
+            if current and len(current) + 2 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,143 @@
+"""
+In-process job queue for content generation.
+
+POST /generate/jobs stores a GenerationJob row and enqueues its id here;
+a fixed pool of asyncio workers drains the queue through a handler
+registered at startup (routers.generate.process_job).
+
+  - Backpressure: submit() raises QueueFullError once GENERATE_JOB_QUEUE_MAX
+    jobs are waiting, or when one user already has GENERATE_JOB_MAX_PER_USER.
+  - Fairness: each user has their own FIFO and workers take from users in
+    round-robin order, so one student uploading ten PDFs cannot starve others.
+  - Restarts: start() re-enqueues the jobs still marked queued. A job left
+    "running" for over GENERATE_JOB_STALE_SECONDS lost its worker and is
+    marked failed. Newer ones may belong to another live process. The
+    handler claims a job with a conditional UPDATE (queued -> running), so a
+    job enqueued by two processes still runs once.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+
+from database import AsyncSessionLocal
+from models import GenerationJob
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GENERATE_JOB_WORKERS = int(os.getenv("GENERATE_JOB_WORKERS", "4"))
+GENERATE_JOB_QUEUE_MAX = int(os.getenv("GENERATE_JOB_QUEUE_MAX", "100"))
+GENERATE_JOB_MAX_PER_USER = int(os.getenv("GENERATE_JOB_MAX_PER_USER", "3"))
+GENERATE_JOB_STALE_SECONDS = int(os.getenv("GENERATE_JOB_STALE_SECONDS", "900"))
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, workers: int, max_size: int, max_per_user: int):
+        self.workers = workers
+        self.max_size = max_size
+        self.max_per_user = max_per_user
+        self._pending: dict[int, deque] = {}  # user_id -> job ids, oldest first
+        self._turns: deque = deque()          # users with pending jobs, round-robin order
+        self._size = 0
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._tasks: list[asyncio.Task] = []
+        self._handler: Optional[Callable[[str], Awaitable[None]]] = None
+
+    def submit(self, job_id: str, user_id: int, force: bool = False) -> None:
+        """Enqueues a job. force skips the limits (used when recovering after a restart)."""
+        user_queue = self._pending.get(user_id)
+        if not force:
+            if self._size >= self.max_size:
+                raise QueueFullError("Generation queue is full, try again shortly")
+            if user_queue is not None and len(user_queue) >= self.max_per_user:
+                raise QueueFullError(f"You already have {self.max_per_user} generations queued")
+
+        if user_queue is None:
+            user_queue = self._pending[user_id] = deque()
+            self._turns.append(user_id)
+        user_queue.append(job_id)
+        self._size += 1
+        if self._ready is not None:
+            self._ready.release()
+
+    def position(self, job_id: str, user_id: int) -> Optional[int]:
+        user_queue = self._pending.get(user_id)
+        if user_queue is None or job_id not in user_queue:
+            return None
+        return list(user_queue).index(job_id) + 1
+
+    def _take(self) -> str:
+        user_id = self._turns.popleft()
+        user_queue = self._pending[user_id]
+        job_id = user_queue.popleft()
+        if user_queue:
+            self._turns.append(user_id)
+        else:
+            del self._pending[user_id]
+        self._size -= 1
+        return job_id
+
+    async def _worker(self) -> None:
+        while True:
+            await self._ready.acquire()
+            job_id = self._take()
+            try:
+                await self._handler(job_id)
+            except Exception:
+                logger.exception("generation job %s crashed", job_id)
+
+    async def start(self, handler: Callable[[str], Awaitable[None]]) -> None:
+        self._handler = handler
+        self._ready = asyncio.Semaphore(self._size)
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _recover(self) -> None:
+        async with AsyncSessionLocal() as db:
+            stale = (await db.execute(
+                update(GenerationJob)
+                .where(
+                    GenerationJob.status == "running",
+                    GenerationJob.updated_at < datetime.utcnow() - timedelta(seconds=GENERATE_JOB_STALE_SECONDS),
+                )
+                .values(status="failed", error="Generation was interrupted by a server restart, please retry")
+            )).rowcount
+            queued = (await db.scalars(
+                select(GenerationJob)
+                .where(GenerationJob.status == "queued")
+                .order_by(GenerationJob.created_at.asc())
+            )).all()
+            await db.commit()
+        for job in queued:
+            self.submit(job.id, job.user_id, force=True)
+        if queued or stale:
+            logger.info("re-enqueued %d queued generation jobs, failed %d stale running ones", len(queued), stale)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._size,
+            "users_waiting": len(self._pending),
+            "workers": len(self._tasks),
+            "max_size": self.max_size,
+        }
+
+
+queue = JobQueue(GENERATE_JOB_WORKERS, GENERATE_JOB_QUEUE_MAX, GENERATE_JOB_MAX_PER_USER)
@@ -1,51 +1,185 @@
 """
-Groq API client for generating adaptive educational content.
-Uses the free Groq API — no local installation needed.
-Groq is OpenAI-compatible and extremely fast.
+LLM client for generating adaptive educational content.
+By default it uses the free Groq API, so no local installation is needed.
+Groq is OpenAI-compatible and extremely fast. Other providers (a local
+Ollama, any OpenAI-compatible endpoint, an offline fake) and failover
+between them are configured with LLM_PROVIDERS (see services.providers).
 
 Sign up at: https://console.groq.com
 Free tier: ~14,400 requests/day with llama-3.1-8b-instant
 """
 
+import asyncio
 import httpx
-import json
-import re
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 from dotenv import load_dotenv
 
+from services import parsing, providers
+from services.chunking import chunk_text, estimate_tokens
+
 load_dotenv()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+logger = logging.getLogger(__name__)
 
+# HTTP client pool (shared for the whole app lifespan, see main.py)
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", "10"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+GROQ_HTTP2 = os.getenv("GROQ_HTTP2", "true").lower() in ("1", "true", "yes")
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+GROQ_WRITE_TIMEOUT = float(os.getenv("GROQ_WRITE_TIMEOUT", "10"))
+GROQ_POOL_TIMEOUT = float(os.getenv("GROQ_POOL_TIMEOUT", "10"))
 
-def _build_messages(text: str, stress_level: str) -> list:
-    if stress_level == "low":
-        instructions = (
-            "The student is calm and focused. Write a DETAILED summary (500-700 words), "
-            "exactly 10 flashcards, and exactly 7 quiz questions with 5 options each."
-        )
-    elif stress_level == "medium":
-        instructions = (
-            "The student has moderate stress. Write a SIMPLIFIED summary (200-350 words), "
-            "exactly 5 flashcards, and exactly 4 quiz questions with 4 options each."
-        )
-    else:  # high
+# Map-reduce for long documents: texts above GROQ_CHUNK_TOKENS (estimated) are split,
+# each chunk is processed with at most GROQ_CHUNK_CONCURRENCY calls in flight.
+GROQ_CHUNK_TOKENS = int(os.getenv("GROQ_CHUNK_TOKENS", "4000"))
+GROQ_CHUNK_CONCURRENCY = int(os.getenv("GROQ_CHUNK_CONCURRENCY", "4"))
+
+# Sections missing from an answer (unparseable, cut off, invalid items) are re-prompted
+# on their own instead of regenerating everything; see _repair.
+GROQ_REPAIR_SECTIONS = os.getenv("GROQ_REPAIR_SECTIONS", "true").lower() in ("1", "true", "yes")
+
+# (flashcards, quiz questions, options per question) per stress level
+STRESS_QUOTAS = {"low": (10, 7, 5), "medium": (5, 4, 4), "high": (3, 2, 3)}
+SUMMARY_LENGTHS = {
+    "low": "a DETAILED summary (500-700 words)",
+    "medium": "a SIMPLIFIED summary (200-350 words)",
+    "high": "a VERY SHORT micro-summary (50-80 words)",
+}
+STUDENT_STATES = {
+    "low": "The student is calm and focused.",
+    "medium": "The student has moderate stress.",
+    "high": "The student is highly stressed.",
+}
+
+SYSTEM_PROMPT = (
+    "You are an educational assistant. "
+    "You MUST respond ONLY with a valid JSON object. "
+    "No markdown, no code blocks, no explanation — just the raw JSON."
+)
+
+# Bump whenever the prompts change so cached results from the old prompt are not reused.
+PROMPT_VERSION = "2"
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+_pool_stats = {
+    "requests": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "saturated_requests": 0,  # started while every connection slot was busy
+    "pool_timeouts": 0,
+}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def start_client() -> None:
+    """Creates the shared HTTP client. Called from the app lifespan."""
+    global _client
+    if _client is not None:
+        return
+    _client = httpx.AsyncClient(
+        http2=GROQ_HTTP2 and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=GROQ_CONNECT_TIMEOUT,
+            read=GROQ_READ_TIMEOUT,
+            write=GROQ_WRITE_TIMEOUT,
+            pool=GROQ_POOL_TIMEOUT,
+        ),
+    )
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def get_client() -> httpx.AsyncClient:
+    """Returns the shared client, creating it lazily outside the app lifespan (scripts, tests)."""
+    if _client is None:
+        await start_client()
+    return _client
+
+
+def pool_stats() -> dict:
+    connections = []
+    if _client is not None:
+        pool = getattr(_client._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+    return {
+        **_pool_stats,
+        "max_connections": GROQ_MAX_CONNECTIONS,
+        "http2": bool(_client and GROQ_HTTP2 and _http2_available()),
+        "open_connections": len(connections),
+        "idle_connections": sum(1 for c in connections if c.is_idle()),
+    }
+
+
+@asynccontextmanager
+async def _tracked():
+    """Keeps the pool saturation counters up to date around one upstream call."""
+    _pool_stats["requests"] += 1
+    if _pool_stats["in_flight"] >= GROQ_MAX_CONNECTIONS:
+        _pool_stats["saturated_requests"] += 1
+    _pool_stats["in_flight"] += 1
+    _pool_stats["peak_in_flight"] = max(_pool_stats["peak_in_flight"], _pool_stats["in_flight"])
+    try:
+        yield
+    except httpx.PoolTimeout:
+        _pool_stats["pool_timeouts"] += 1
+        raise
+    finally:
+        _pool_stats["in_flight"] -= 1
+
+
+# Every completion goes through the providers named by LLM_PROVIDERS
+_router = providers.build(get_client, _tracked)
+
+
+def provider_stats() -> dict:
+    return _router.stats()
+
+
+def _build_messages(text: str, stress_level: str, part: Optional[tuple[int, int]] = None) -> list:
+    if stress_level not in STRESS_QUOTAS:
+        stress_level = "high"
+    flashcards, quiz, options = STRESS_QUOTAS[stress_level]
+    instructions = (
+        f"{STUDENT_STATES[stress_level]} Write {SUMMARY_LENGTHS[stress_level]}, "
+        f"exactly {flashcards} flashcards, and exactly {quiz} quiz questions with {options} options each."
+    )
+
+    if part is not None:
+        index, total = part
         instructions = (
-            "The student is highly stressed. Write a VERY SHORT micro-summary (50-80 words), "
-            "exactly 3 simple flashcards, and exactly 2 quiz questions with 3 options each."
+            f"This text is part {index} of {total} of a longer document. "
+            "Summarize ONLY this part in at most 150 words; the partial summaries will be merged later. "
+            f"Write up to {flashcards} flashcards and up to {quiz} quiz questions about this part, "
+            f"with {options} options each."
         )
 
     return [
-        {
-            "role": "system",
-            "content": (
-                "You are an educational assistant. "
-                "You MUST respond ONLY with a valid JSON object. "
-                "No markdown, no code blocks, no explanation — just the raw JSON."
-            ),
-        },
+        {"role": "system", "content": SYSTEM_PROMPT},
         {
             "role": "user",
             "content": (
@@ -71,64 +205,213 @@ def _build_messages(text: str, stress_level: str) -> list:
     ]
 
 
-def _extract_json(raw: str) -> dict:
-    """Extract a valid JSON object from raw model output."""
-    raw = raw.strip()
+def _build_merge_messages(summaries: list[str], stress_level: str) -> list:
+    parts = "\n\n".join(f"Part {i}:\n{summary}" for i, summary in enumerate(summaries, 1))
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                "The following are summaries of consecutive parts of one document, in order.\n"
+                f"Merge them into {SUMMARY_LENGTHS.get(stress_level, SUMMARY_LENGTHS['high'])} "
+                f"for a student with {stress_level.upper()} stress level, keeping the original order of ideas.\n\n"
+                f"{parts}\n\n"
+                'Respond ONLY with this exact JSON structure:\n{"summary": "..."}'
+            ),
+        },
+    ]
 
-    # Remove markdown code blocks if present
-    raw = re.sub(r"^```(?:json)?\s*", "", raw)
-    raw = re.sub(r"\s*```$", "", raw)
-    raw = raw.strip()
 
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        pass
+def _build_repair_messages(text: str, stress_level: str, section: str, have: list) -> list:
+    """Asks for one section only: the summary, or the flashcards / quiz items still missing."""
+    flashcards, quiz, options = STRESS_QUOTAS.get(stress_level, STRESS_QUOTAS["high"])
+    if section == "summary":
+        request = f"Write {SUMMARY_LENGTHS.get(stress_level, SUMMARY_LENGTHS['high'])} of the text."
+        shape = '{"summary": "..."}'
+    elif section == "flashcards":
+        request = f"Write exactly {max(1, flashcards - len(have))} flashcards about the text."
+        shape = '{"flashcards": [{"question": "...", "answer": "..."}]}'
+    else:
+        request = (
+            f"Write exactly {max(1, quiz - len(have))} quiz questions about the text, "
+            f"with {options} options each and the 0-based index of the correct one."
+        )
+        shape = '{"quiz": [{"question": "...", "options": ["A", "B", "C"], "correct_index": 0}]}'
+    if have:
+        request += " Do not repeat these questions:\n" + "\n".join(f"- {item['question']}" for item in have)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                f"Adapt the following text for a student with {stress_level.upper()} stress level.\n"
+                f"{request}\n\n"
+                f"Text:\n\"\"\"{text}\"\"\"\n\n"
+                f"Respond ONLY with this exact JSON structure:\n{shape}"
+            ),
+        },
+    ]
 
-    # Find first { ... } block
-    match = re.search(r'\{.*\}', raw, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group())
-        except json.JSONDecodeError:
-            pass
 
-    return {}
+def needs_chunking(text: str) -> bool:
+    return estimate_tokens(text) > GROQ_CHUNK_TOKENS
 
 
 async def generate_content(text: str, stress_level: str) -> dict:
     """
-    Calls Groq API to generate summary, flashcards and quiz.
-    Returns a dict with keys: summary, flashcards, quiz.
+    Calls the LLM to generate summary, flashcards and quiz.
+    Returns a dict with keys: summary, flashcards, quiz, and usage
+    ({"total_tokens", "latency_ms"}, used for cost accounting).
+    Texts too long for one prompt go through map-reduce (see _generate_chunked).
     """
-    if not GROQ_API_KEY or GROQ_API_KEY.startswith("gsk_XXX"):
-        raise ValueError("GROQ_API_KEY not configured in .env file")
-
-    messages = _build_messages(text, stress_level)
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            GROQ_API_URL,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": GROQ_MODEL,
-                "messages": messages,
-                "temperature": 0.3,
-                "max_tokens": 3000,
-                "response_format": {"type": "json_object"},
-            },
-        )
-        response.raise_for_status()
-        data = response.json()
+    started = time.perf_counter()
+    if needs_chunking(text):
+        result = await _generate_chunked(text, stress_level)
+    else:
+        result = await _generate_single(_build_messages(text, stress_level), stress_level, text)
+    result["usage"]["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _interleave(groups: list[list], limit: int) -> list:
+    """
+    Picks up to limit items spread evenly over the chunks (each chunk's first items first),
+    returned in document order. Repeated questions are skipped.
+    """
+    n = len(groups)
+    if n > limit:
+        preferred = sorted({int((j + 0.5) * n / limit) for j in range(limit)})
+    else:
+        preferred = list(range(n))
+    others = [i for i in range(n) if i not in set(preferred)]
+
+    picked, seen = [], set()
+    for rank in range(max((len(g) for g in groups), default=0)):
+        for i in preferred + others:
+            if len(picked) == limit:
+                break
+            if rank >= len(groups[i]) or not isinstance(groups[i][rank], dict):
+                continue
+            question = str(groups[i][rank].get("question", "")).strip().lower()
+            if question in seen:
+                continue
+            seen.add(question)
+            picked.append((i, rank))
+
+    return [groups[i][rank] for i, rank in sorted(picked)]
+
+
+async def _generate_chunked(text: str, stress_level: str) -> dict:
+    """
+    Map: each chunk gets its own short summary, flashcards and quiz (bounded concurrency).
+    Reduce: partial summaries are merged by one more call; flashcards and quiz items are
+    interleaved across chunks down to the stress-level quotas.
+    """
+    chunks = chunk_text(text, GROQ_CHUNK_TOKENS)
+    semaphore = asyncio.Semaphore(GROQ_CHUNK_CONCURRENCY)
+    latencies: list[float] = [0.0] * len(chunks)
+
+    async def run(index: int, chunk: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            result = await _generate_single(
+                _build_messages(chunk, stress_level, part=(index + 1, len(chunks))), stress_level,
+            )
+            latencies[index] = round((time.perf_counter() - started) * 1000, 1)
+            return result
 
-    raw = data["choices"][0]["message"]["content"]
-    result = _extract_json(raw)
+    # gather keeps results in chunk order regardless of completion order
+    partials = await asyncio.gather(*(run(i, chunk) for i, chunk in enumerate(chunks)))
+
+    summaries = [p["summary"] for p in partials if p["summary"]]
+    if not summaries:
+        parsing.record_failure()
+        raise ValueError("no usable answer for any part of the document")
+    total_tokens = sum(p["usage"]["total_tokens"] for p in partials)
+    started = time.perf_counter()
+    try:
+        raw, merge_tokens = await _post_completion(_build_merge_messages(summaries, stress_level))
+        total_tokens += merge_tokens
+        merged = parsing.parse(raw).fields.get("summary")
+        summary = merged.strip() if isinstance(merged, str) and merged.strip() else "\n\n".join(summaries)
+    except Exception:
+        logger.exception("summary merge failed, falling back to concatenated partial summaries")
+        summary = "\n\n".join(summaries)
+    reduce_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    flashcard_quota, quiz_quota, _ = STRESS_QUOTAS.get(stress_level, STRESS_QUOTAS["high"])
+    logger.info(
+        "chunked generation: %d chunks, per-chunk latency ms=%s, reduce ms=%s",
+        len(chunks), latencies, reduce_ms,
+    )
+    _last_chunked_run.update(chunks=len(chunks), chunk_latency_ms=latencies, reduce_ms=reduce_ms)
 
     return {
-        "summary": result.get("summary", ""),
-        "flashcards": result.get("flashcards", []),
-        "quiz": result.get("quiz", []),
+        "summary": summary,
+        "flashcards": _interleave([p["flashcards"] for p in partials], flashcard_quota),
+        "quiz": _interleave([p["quiz"] for p in partials], quiz_quota),
+        "usage": {"total_tokens": total_tokens},
     }
+
+
+_last_chunked_run: dict = {}
+
+
+def chunked_stats() -> dict:
+    """Per-chunk latency of the most recent map-reduce run."""
+    return dict(_last_chunked_run)
+
+
+async def _post_completion(messages: list) -> tuple[str, int]:
+    """Returns (raw answer text, total tokens billed for the call)."""
+    return await _router.complete(messages)
+
+
+async def repair(text: str, stress_level: str, result: dict, missing: list[str]) -> int:
+    """
+    Re-prompts for each missing section on its own (concurrently) and merges the answers
+    into result. Returns the tokens spent. Raises ValueError if there is still no summary.
+    """
+    async def one(section: str) -> int:
+        try:
+            raw, tokens = await _post_completion(_build_repair_messages(
+                text, stress_level, section, [] if section == "summary" else result[section],
+            ))
+        except Exception:
+            logger.exception("repair of %s failed", section)
+            parsing.record_repair(False)
+            return 0
+        repaired, _ = parsing.validate(parsing.parse(raw))
+        parsing.record_repair(parsing.merge(result, section, repaired))
+        return tokens
+
+    tokens = 0
+    if GROQ_REPAIR_SECTIONS and missing:
+        tokens = sum(await asyncio.gather(*(one(section) for section in missing)))
+    if not all(result[section] for section in parsing.SECTIONS):
+        parsing.record_failure()
+    if not result["summary"]:
+        raise ValueError("the model answer had no usable summary")
+    return tokens
+
+
+async def _generate_single(messages: list, stress_level: str, text: Optional[str] = None) -> dict:
+    """
+    One completion, parsed and validated. With text (a whole document, not a map-reduce
+    part), missing sections are repaired from it.
+    """
+    raw, total_tokens = await _post_completion(messages)
+    result, missing = parsing.read(raw)
+    if text is not None:
+        total_tokens += await repair(text, stress_level, result, missing)
+    result["usage"] = {"total_tokens": total_tokens}
+    return result
+
+
+async def stream_content(text: str, stress_level: str) -> AsyncIterator[str]:
+    """
+    Same prompt as generate_content, but with streaming on.
+    Yields raw content deltas of the JSON answer as the model produces them.
+    """
+    async for delta in _router.stream(_build_messages(text, stress_level)):
+        yield delta
@@ -0,0 +1,217 @@
+"""
+Tolerant parsing and validation of the model's JSON answer.
+
+The model is asked for one object ({"summary": ..., "flashcards": [...],
+"quiz": [...]}) but sometimes wraps it in a code fence, adds prose around it,
+leaves a trailing comma, or is cut off by max_tokens halfway through the quiz.
+parse() decodes the well-formed case with a single json call and otherwise
+walks the object value by value (each value still decoded by the C scanner),
+keeping every complete field and every complete array item before the damage.
+
+validate() checks the items against FlashCard / QuizQuestion in the same pass
+that copies them, drops the invalid ones, and names the sections that are
+missing or were cut short, so the caller can re-prompt for just those
+(see ollama.repair).
+"""
+
+import json
+
+from pydantic import ValidationError
+
+from models import FlashCard, QuizQuestion
+
+SECTIONS = ("summary", "flashcards", "quiz")
+
+_decoder = json.JSONDecoder(strict=False)  # models put raw newlines inside strings
+_WHITESPACE = " \t\n\r"
+
+_stats = {
+    "responses": 0,
+    "complete": 0,        # parsed as-is
+    "recovered": 0,       # damaged, but at least one section survived
+    "unparseable": 0,     # nothing usable
+    "items_dropped": 0,   # flashcards / quiz items that failed validation
+    "repairs": 0,         # targeted re-prompts, one per missing section
+    "repairs_failed": 0,
+    "failures": 0,        # results still missing a section after repair
+}
+
+
+class Parsed:
+    """Fields recovered from one answer; `truncated` names the fields cut off mid-value."""
+
+    __slots__ = ("fields", "truncated", "complete")
+
+    def __init__(self, fields: dict, truncated: set, complete: bool):
+        self.fields = fields
+        self.truncated = truncated
+        self.complete = complete
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+
+def _skip(raw: str, i: int) -> int:
+    while i < len(raw) and raw[i] in _WHITESPACE:
+        i += 1
+    return i
+
+
+def _partial_string(raw: str, i: int) -> str:
+    """The decodable prefix of the string literal opening at raw[i] (cut off before its closing quote)."""
+    body = raw[i + 1:]
+    for end in range(len(body), max(len(body) - 6, -1), -1):  # an escape may be split at the cut
+        try:
+            return _decoder.decode(f'"{body[:end]}"')
+        except json.JSONDecodeError:
+            continue
+    return ""
+
+
+def _partial_array(raw: str, i: int) -> tuple[list, int, bool]:
+    """Complete items of the array opening at raw[i]. Returns (items, index after it, closed)."""
+    items = []
+    i = _skip(raw, i + 1)
+    while i < len(raw):
+        if raw[i] == "]":
+            return items, i + 1, True
+        try:
+            item, i = _decoder.raw_decode(raw, i)
+        except json.JSONDecodeError:
+            break
+        items.append(item)
+        i = _skip(raw, i)
+        if i < len(raw) and raw[i] == ",":
+            i = _skip(raw, i + 1)  # also tolerates a trailing comma before ']'
+        elif i >= len(raw) or raw[i] != "]":
+            break
+    return items, i, False
+
+
+def _walk_object(raw: str, i: int) -> tuple[dict, set]:
+    """Fields of the object opening at raw[i], up to the first one that does not decode."""
+    fields, truncated = {}, set()
+    i = _skip(raw, i + 1)
+    while i < len(raw) and raw[i] != "}":
+        try:
+            key, i = _decoder.raw_decode(raw, i)
+        except json.JSONDecodeError:
+            break
+        i = _skip(raw, i)
+        if not isinstance(key, str) or i >= len(raw) or raw[i] != ":":
+            break
+        i = _skip(raw, i + 1)
+        try:
+            fields[key], i = _decoder.raw_decode(raw, i)
+        except json.JSONDecodeError:
+            if raw.startswith("[", i):
+                fields[key], i, closed = _partial_array(raw, i)
+                if not closed:
+                    truncated.add(key)
+                    break
+            elif raw.startswith('"', i):
+                fields[key] = _partial_string(raw, i)
+                truncated.add(key)
+                break
+            else:
+                break
+        i = _skip(raw, i)
+        if i < len(raw) and raw[i] == ",":
+            i = _skip(raw, i + 1)
+        elif i >= len(raw) or raw[i] != "}":
+            break
+    return fields, truncated
+
+
+def parse(raw: str) -> Parsed:
+    """Recovers the answer object from raw model output (never raises)."""
+    start = raw.find("{")
+    if start < 0:
+        return Parsed({}, set(), False)
+    try:
+        # The usual case: one well-formed object, maybe fenced or followed by prose
+        return Parsed(_decoder.raw_decode(raw, start)[0], set(), True)
+    except json.JSONDecodeError:
+        pass
+    fields, truncated = _walk_object(raw, start)
+    return Parsed(fields, truncated, False)
+
+
+# ── Validation ───────────────────────────────────────────────────────────────
+
+def _valid_items(items, model) -> list[dict]:
+    if not isinstance(items, list):
+        return []
+    valid = []
+    for item in items:
+        try:
+            parsed = model.model_validate(item)
+        except ValidationError:
+            _stats["items_dropped"] += 1
+            continue
+        if model is QuizQuestion and not 0 <= parsed.correct_index < len(parsed.options):
+            _stats["items_dropped"] += 1
+            continue
+        valid.append(parsed.model_dump())
+    return valid
+
+
+def validate(parsed: Parsed) -> tuple[dict, list[str]]:
+    """
+    (result, missing): summary, flashcards and quiz with invalid items dropped, and the
+    sections that are empty or were cut off, in SECTIONS order.
+    """
+    summary = parsed.fields.get("summary")
+    result = {
+        "summary": summary.strip() if isinstance(summary, str) else "",
+        "flashcards": _valid_items(parsed.fields.get("flashcards"), FlashCard),
+        "quiz": _valid_items(parsed.fields.get("quiz"), QuizQuestion),
+    }
+    missing = [name for name in SECTIONS if not result[name] or name in parsed.truncated]
+    return result, missing
+
+
+def read(raw: str) -> tuple[dict, list[str]]:
+    """parse() then validate(), counted in stats()."""
+    parsed = parse(raw)
+    result, missing = validate(parsed)
+    _stats["responses"] += 1
+    if parsed.complete and not parsed.truncated:
+        _stats["complete"] += 1
+    elif len(missing) < len(SECTIONS):
+        _stats["recovered"] += 1
+    else:
+        _stats["unparseable"] += 1
+    return result, missing
+
+
+def merge(result: dict, section: str, repaired: dict) -> bool:
+    """Adds the section of a repair answer to result, skipping repeated questions. Returns whether it added any."""
+    if section == "summary":
+        if repaired["summary"]:
+            result["summary"] = repaired["summary"]
+        return bool(repaired["summary"])
+    seen = {item["question"].strip().lower() for item in result[section]}
+    added = [item for item in repaired[section] if item["question"].strip().lower() not in seen]
+    result[section] = result[section] + added
+    return bool(added)
+
+
+def record_repair(ok: bool) -> None:
+    _stats["repairs"] += 1
+    if not ok:
+        _stats["repairs_failed"] += 1
+
+
+def record_failure() -> None:
+    _stats["failures"] += 1
+
+
+def stats() -> dict:
+    responses = _stats["responses"]
+    return {
+        **_stats,
+        "failure_rate": round(_stats["failures"] / responses, 4) if responses else 0.0,
+        "repair_success_rate": (
+            round(1 - _stats["repairs_failed"] / _stats["repairs"], 4) if _stats["repairs"] else 0.0
+        ),
+    }
@@ -0,0 +1,109 @@
+"""
+Password hashing on a dedicated, bounded executor.
+
+bcrypt is deliberately slow (~250 ms at cost 12) and releases the GIL, so it
+runs in its own small thread pool instead of the shared AnyIO threadpool:
+a login storm then saturates BCRYPT_WORKERS cores and nothing else.
+
+  - BCRYPT_ROUNDS: work factor for new hashes. Existing hashes with another
+    cost are upgraded transparently on the next successful login.
+  - BCRYPT_MAX_PENDING: hashes allowed to wait for a worker; beyond that
+    callers get HashingBusyError (503) instead of queueing unboundedly.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pending = 0
+
+_stats = {"hashes": 0, "verifications": 0, "rehashes": 0, "rejected": 0, "busy_ms": 0.0}
+
+
+class HashingBusyError(Exception):
+    pass
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _verify(plain: str, hashed: str) -> bool:
+    return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending >= BCRYPT_WORKERS + BCRYPT_MAX_PENDING:
+        _stats["rejected"] += 1
+        raise HashingBusyError("Too many sign-ins in progress, try again shortly")
+    _pending += 1
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _pending -= 1
+        _stats["busy_ms"] += (time.perf_counter() - started) * 1000
+
+
+async def hash_password(password: str) -> str:
+    _stats["hashes"] += 1
+    return await _run(_hash, password, BCRYPT_ROUNDS)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    _stats["verifications"] += 1
+    return await _run(_verify, plain, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when the hash was made with a cost other than BCRYPT_ROUNDS ($2b$<cost>$...)."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def upgraded_hash(plain: str, hashed: str) -> Optional[str]:
+    """After a successful verify: a new hash at BCRYPT_ROUNDS if the stored one uses another cost, else None."""
+    if not needs_rehash(hashed):
+        return None
+    _stats["rehashes"] += 1
+    return await _run(_hash, plain, BCRYPT_ROUNDS)
+
+
+def stats() -> dict:
+    operations = _stats["hashes"] + _stats["verifications"]
+    return {
+        **{name: value for name, value in _stats.items() if name != "busy_ms"},
+        "rounds": BCRYPT_ROUNDS,
+        "workers": BCRYPT_WORKERS,
+        "pending": _pending,
+        "avg_ms": round(_stats["busy_ms"] / operations, 1) if operations else 0.0,
+    }
@@ -0,0 +1,150 @@
+"""
+PDF text extraction off the event loop.
+
+Uploads are spooled to a temp file in small chunks (never held as one bytes
+object), then pypdf runs in a bounded process pool over an mmap of that file.
+Large documents are split into page ranges extracted in parallel. An
+extraction that exceeds PDF_EXTRACT_TIMEOUT kills the pool's workers.
+"""
+
+import asyncio
+import mmap
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+load_dotenv()
+
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(25 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "60"))
+
+_UPLOAD_CHUNK = 1024 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class PdfLimitError(ValueError):
+    """Upload rejected by a size, page-count or time limit. status_code is the HTTP status to use."""
+
+    def __init__(self, message: str, status_code: int = 422):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and thread pools is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _kill_pool() -> None:
+    """
+    Drops the pool and kills its workers; the next extraction starts a fresh one. shutdown() alone
+    lets a running task finish, and a worker stuck on a hostile PDF never does.
+    """
+    global _pool
+    pool, _pool = _pool, None
+    if pool is None:
+        return
+    processes = list((pool._processes or {}).values())  # no public API reaches a busy worker
+    pool.shutdown(wait=False, cancel_futures=True)
+    # On Python 3.11 the pool's manager thread may then log an InvalidStateError for an already
+    # cancelled task; the pool is discarded either way
+    for process in processes:
+        process.kill()
+
+
+# ── Worker-side functions (run in the process pool) ─────────────────────────
+
+def _open_reader(mapped: mmap.mmap):
+    import pypdf
+
+    return pypdf.PdfReader(mapped)
+
+
+def _count_pages(path: str) -> int:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return len(_open_reader(mapped).pages)
+
+
+def _extract_range(path: str, start: int, stop: int) -> str:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = _open_reader(mapped)
+        return "\n".join(reader.pages[i].extract_text() or "" for i in range(start, stop))
+
+
+# ── Async API ────────────────────────────────────────────────────────────────
+
+async def spool_upload(file: UploadFile) -> str:
+    """Copies the upload to a temp file chunk by chunk. Returns its path; caller deletes it."""
+    out = tempfile.NamedTemporaryFile(prefix="yachaflex-", suffix=".pdf", delete=False)
+    written = 0
+    try:
+        while chunk := await file.read(_UPLOAD_CHUNK):
+            written += len(chunk)
+            if written > PDF_MAX_BYTES:
+                raise PdfLimitError(
+                    f"El PDF supera el tamaño máximo permitido ({PDF_MAX_BYTES // (1024 * 1024)} MB)",
+                    status_code=413,
+                )
+            await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        out.close()
+        os.unlink(out.name)
+        raise
+    out.close()
+    return out.name
+
+
+async def extract_text(path: str) -> str:
+    """Extracts the text of every page, in order, without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+
+    async def run():
+        pages = await loop.run_in_executor(pool, _count_pages, path)
+        if pages > PDF_MAX_PAGES:
+            raise PdfLimitError(f"El PDF tiene demasiadas páginas ({pages}, máximo {PDF_MAX_PAGES})")
+
+        ranges = [(start, min(start + PDF_PAGES_PER_TASK, pages)) for start in range(0, pages, PDF_PAGES_PER_TASK)]
+        parts = await asyncio.gather(
+            *(loop.run_in_executor(pool, _extract_range, path, start, stop) for start, stop in ranges)
+        )
+        return "\n".join(parts).strip()
+
+    try:
+        return await asyncio.wait_for(run(), timeout=PDF_EXTRACT_TIMEOUT)
+    except asyncio.TimeoutError:
+        # Extractions sharing the pool fail too (BrokenProcessPool), but it no longer stays wedged
+        if _pool is pool:
+            _kill_pool()
+        raise PdfLimitError("La extracción del PDF tardó demasiado", status_code=504)
+
+
+async def extract_upload(file: UploadFile) -> str:
+    path = await spool_upload(file)
+    try:
+        return await extract_text(path)
+    finally:
+        os.unlink(path)
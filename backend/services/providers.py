@@ -0,0 +1,458 @@
+"""
+LLM providers behind one chat-completions interface, with routing and failover.
+
+Providers:
+  - groq: the Groq API (GROQ_API_KEY, GROQ_MODEL)
+  - ollama: a local Ollama through its OpenAI-compatible endpoint (OLLAMA_URL, OLLAMA_MODEL)
+  - openai: any other OpenAI-compatible endpoint (OPENAI_COMPAT_URL, _MODEL, _API_KEY)
+  - fake: deterministic in-process answers in the shape the prompt asks for,
+    after FAKE_LLM_LATENCY_MS plus output tokens at FAKE_LLM_TOKENS_PER_SECOND.
+    For load tests and offline development; never calls out.
+
+LLM_PROVIDERS picks them, with optional routing weights:
+
+    LLM_PROVIDERS=groq                  # default
+    LLM_PROVIDERS=groq:3,ollama:1       # ~75% / 25% of calls, each the other's fallback
+    LLM_PROVIDERS=groq,ollama:0         # ollama only when groq fails (weight 0 = standby)
+    LLM_PROVIDERS=fake                  # load testing
+
+Each call tries the providers in weighted-random order. A 429 is retried on the
+same provider with jittered exponential backoff (honouring Retry-After) only
+when there is nothing to fail over to; any other error, or a 429 with another
+provider left, moves on to the next one. Every provider has a circuit breaker:
+LLM_BREAKER_FAILURES consecutive failures, where calls slower than
+LLM_SLOW_CALL_MS also count as failures, open it for LLM_BREAKER_COOLDOWN_SECONDS.
+Providers with an open circuit are skipped; when every circuit is open a call
+fails at once with ProvidersUnavailableError. After the cooldown the first call
+to reach the provider claims a single trial, which decides whether it closes
+again; until that trial is recorded, everyone else still sees the circuit open.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "groq")
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))               # 429 retries on one provider
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))         # seconds, doubled per retry
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+LLM_SLOW_CALL_MS = float(os.getenv("LLM_SLOW_CALL_MS", "20000"))
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/v1/chat/completions")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+
+OPENAI_COMPAT_URL = os.getenv("OPENAI_COMPAT_URL", "")
+OPENAI_COMPAT_MODEL = os.getenv("OPENAI_COMPAT_MODEL", "")
+OPENAI_COMPAT_API_KEY = os.getenv("OPENAI_COMPAT_API_KEY", "")
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))          # before the first token
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "400"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))            # share of 503s
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))  # share of 429s
+
+
+class ProvidersUnavailableError(Exception):
+    pass
+
+
+def _spec(value: str) -> list[tuple[str, float]]:
+    """"groq:3,ollama:1" -> [("groq", 3.0), ("ollama", 1.0)]"""
+    entries = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = entry.partition(":")
+        entries.append((name.strip().lower(), float(weight) if weight else 1.0))
+    return entries
+
+
+def _status_error(status: int, message: str) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "fake://llm")
+    return httpx.HTTPStatusError(message, request=request, response=httpx.Response(status, request=request))
+
+
+# ── Circuit breaker ──────────────────────────────────────────────────────────
+
+class CircuitBreaker:
+    def __init__(self, failures: int, cooldown: float, slow_ms: float):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.slow_ms = slow_ms
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.trial_started: Optional[float] = None  # half-open trial in flight since
+        self.latency_ms: Optional[float] = None  # moving average of successful calls
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown:
+            return "open"
+        # A trial that never reports back (e.g. a cancelled stream) stops blocking others after a cooldown
+        if self.trial_started is not None and now - self.trial_started < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def available(self) -> bool:
+        return self.state != "open"
+
+    def acquire(self) -> bool:
+        """Whether a call may go ahead now. In half-open, the first caller claims the one trial."""
+        state = self.state
+        if state == "half_open":
+            self.trial_started = time.monotonic()
+        return state != "open"
+
+    def record(self, ok: bool, latency_ms: float) -> None:
+        self.trial_started = None
+        if ok:
+            self.latency_ms = latency_ms if self.latency_ms is None else 0.8 * self.latency_ms + 0.2 * latency_ms
+        if ok and latency_ms <= self.slow_ms:
+            self.consecutive = 0
+            self.opened_at = None
+            return
+        self.consecutive += 1
+        # A failed trial after the cooldown re-opens at once
+        if self.consecutive >= self.failures or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+# ── Providers ────────────────────────────────────────────────────────────────
+
+class Provider(abc.ABC):
+    """One upstream. complete() returns (answer text, total tokens); stream() yields answer deltas."""
+
+    def __init__(self, name: str, model: str, weight: float = 1.0):
+        self.name = name
+        self.model = model
+        self.weight = weight
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_SECONDS, LLM_SLOW_CALL_MS)
+        self.counts = {"calls": 0, "failures": 0, "rate_limited": 0, "retries": 0}
+
+    @abc.abstractmethod
+    async def complete(self, messages: list, **extra) -> tuple[str, int]:
+        ...
+
+    @abc.abstractmethod
+    def stream(self, messages: list, **extra) -> AsyncIterator[str]:
+        ...
+
+    def stats(self) -> dict:
+        latency = self.breaker.latency_ms
+        return {
+            "model": self.model,
+            "weight": self.weight,
+            "state": self.breaker.state,
+            "avg_latency_ms": round(latency, 1) if latency is not None else None,
+            **self.counts,
+        }
+
+
+class OpenAICompatibleProvider(Provider):
+    """Chat completions over HTTP (Groq, Ollama's /v1 endpoint, vLLM, OpenAI...), through the shared pool."""
+
+    def __init__(self, name: str, url: str, model: str, api_key: str,
+                 client: Callable[[], Awaitable[httpx.AsyncClient]], tracked, weight: float = 1.0):
+        super().__init__(name, model, weight)
+        self.url = url
+        self.api_key = api_key
+        self._client = client
+        self._tracked = tracked  # pool saturation accounting around each call
+
+    def _headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.name == "groq" and (not self.api_key or self.api_key.startswith("gsk_XXX")):
+            raise ValueError("GROQ_API_KEY not configured in .env file")
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _payload(self, messages: list, **extra) -> dict:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.3,
+            "max_tokens": 3000,
+            "response_format": {"type": "json_object"},
+            **extra,
+        }
+
+    async def complete(self, messages: list, **extra) -> tuple[str, int]:
+        headers = self._headers()
+        client = await self._client()
+        async with self._tracked():
+            response = await client.post(self.url, headers=headers, json=self._payload(messages, **extra))
+            response.raise_for_status()
+            data = response.json()
+        return data["choices"][0]["message"]["content"] or "", data.get("usage", {}).get("total_tokens", 0)
+
+    async def stream(self, messages: list, **extra) -> AsyncIterator[str]:
+        headers = self._headers()
+        payload = self._payload(messages, stream=True, **extra)
+        client = await self._client()
+        async with self._tracked():
+            async with client.stream("POST", self.url, headers=headers, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+
+
+_WORD = re.compile(r"\w{4,}")
+
+
+class FakeProvider(Provider):
+    """
+    Answers from the prompt alone: the same messages always give the same answer, with the
+    sections and item counts the prompt asks for, built from words of the source text.
+    """
+
+    def __init__(self, name: str = "fake", weight: float = 1.0, latency_ms: float = FAKE_LLM_LATENCY_MS,
+                 tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND, error_rate: float = FAKE_LLM_ERROR_RATE,
+                 rate_limit_rate: float = FAKE_LLM_RATE_LIMIT_RATE):
+        super().__init__(name, "fake", weight)
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._faults = random.Random(0)
+
+    @staticmethod
+    def _count(pattern: str, prompt: str, default: int) -> int:
+        match = re.search(pattern, prompt)
+        return int(match.group(1)) if match else default
+
+    def answer(self, messages: list) -> str:
+        prompt = messages[-1]["content"]
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        source = prompt.split('"""')[1] if prompt.count('"""') >= 2 else prompt
+        words = _WORD.findall(source) or ["contenido", "estudio", "tema"]
+        shape = prompt.rsplit("JSON structure:", 1)[-1]
+
+        def sentence(n: int) -> str:
+            return " ".join(rng.choice(words) for _ in range(n)).capitalize()
+
+        answer = {}
+        if '"summary"' in shape:
+            answer["summary"] = " ".join(sentence(rng.randint(8, 16)) + "." for _ in range(6))
+        if '"flashcards"' in shape:
+            answer["flashcards"] = [
+                {"question": sentence(7) + "?", "answer": sentence(12) + "."}
+                for _ in range(self._count(r"(\d+) flashcards", prompt, 3))
+            ]
+        if '"quiz"' in shape:
+            options = self._count(r"(\d+) options", prompt, 4)
+            answer["quiz"] = [
+                {"question": sentence(9) + "?", "options": [sentence(2) for _ in range(options)],
+                 "correct_index": rng.randrange(options)}
+                for _ in range(self._count(r"(\d+) quiz questions", prompt, 2))
+            ]
+        return json.dumps(answer, ensure_ascii=False)
+
+    def _fault(self) -> None:
+        roll = self._faults.random()
+        if roll < self.rate_limit_rate:
+            raise _status_error(429, "fake provider: rate limited")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise _status_error(503, "fake provider: unavailable")
+
+    def _tokens(self, messages: list, answer: str) -> tuple[int, int]:
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        return prompt_tokens, max(1, len(answer) // 4)
+
+    async def complete(self, messages: list, **extra) -> tuple[str, int]:
+        self._fault()
+        answer = self.answer(messages)
+        prompt_tokens, output_tokens = self._tokens(messages, answer)
+        await asyncio.sleep(self.latency_ms / 1000 + output_tokens / self.tokens_per_second)
+        return answer, prompt_tokens + output_tokens
+
+    async def stream(self, messages: list, **extra) -> AsyncIterator[str]:
+        self._fault()
+        answer = self.answer(messages)
+        await asyncio.sleep(self.latency_ms / 1000)
+        step = 16  # characters per delta, ~4 tokens
+        for start in range(0, len(answer), step):
+            await asyncio.sleep(step / 4 / self.tokens_per_second)
+            yield answer[start:start + step]
+
+
+# ── Routing ──────────────────────────────────────────────────────────────────
+
+def _is_rate_limit(error: Exception) -> bool:
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff; Retry-After (seconds) is a floor when the upstream sends it."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    retry_after = error.response.headers.get("Retry-After") if isinstance(error, httpx.HTTPStatusError) else None
+    try:
+        delay = max(delay, min(LLM_BACKOFF_MAX, float(retry_after)))
+    except (TypeError, ValueError):
+        pass
+    return delay
+
+
+class Router:
+    def __init__(self, providers: list[Provider]):
+        if not providers:
+            raise ValueError("LLM_PROVIDERS names no provider")
+        self.providers = providers
+        self.failovers = 0
+
+    def _order(self) -> Iterator[tuple[Provider, bool]]:
+        """
+        (provider, whether another one may follow) in weighted random order (larger weight, likelier
+        first), skipping providers whose circuit is open. Lazy, so a half-open trial is claimed only
+        by the caller about to make it.
+        """
+        ranked = sorted(
+            self.providers, key=lambda p: random.random() ** (1 / p.weight) if p.weight > 0 else -1.0, reverse=True,
+        )
+        for position, provider in enumerate(ranked):
+            if provider.breaker.acquire():
+                yield provider, any(p.breaker.available() for p in ranked[position + 1:])
+
+    def _unavailable(self, error: Optional[Exception]) -> Exception:
+        """The error to raise once no provider is left: the last failure, if any provider was tried."""
+        if error is not None:
+            return error
+        return ProvidersUnavailableError(
+            "every LLM provider's circuit is open: " + ", ".join(p.name for p in self.providers)
+        )
+
+    async def _retry(self, provider: Provider, error: Exception, attempt: int, has_next: bool,
+                     started: float) -> bool:
+        """Accounts for a failed call. Sleeps and returns True when the same provider should be retried."""
+        if _is_rate_limit(error):
+            provider.counts["rate_limited"] += 1
+            if not has_next and attempt < LLM_MAX_RETRIES:
+                provider.counts["retries"] += 1
+                await asyncio.sleep(_backoff(attempt, error))
+                return True
+        provider.counts["failures"] += 1
+        provider.breaker.record(False, (time.perf_counter() - started) * 1000)
+        if has_next:
+            self.failovers += 1
+            logger.warning("LLM provider %s failed (%r), failing over", provider.name, error)
+        return False
+
+    async def complete(self, messages: list, **extra) -> tuple[str, int]:
+        error: Optional[Exception] = None
+        for provider, has_next in self._order():
+            attempt = 0
+            while True:
+                provider.counts["calls"] += 1
+                started = time.perf_counter()
+                try:
+                    result = await provider.complete(messages, **extra)
+                except Exception as e:
+                    error = e
+                    if await self._retry(provider, e, attempt, has_next, started):
+                        attempt += 1
+                        continue
+                    break
+                provider.breaker.record(True, (time.perf_counter() - started) * 1000)
+                return result
+        raise self._unavailable(error)
+
+    async def stream(self, messages: list, **extra) -> AsyncIterator[str]:
+        """
+        Fails over like complete() until the first delta; after that an error ends the stream.
+        The breaker sees time to first delta, not the length of the answer.
+        """
+        error: Optional[Exception] = None
+        for provider, has_next in self._order():
+            attempt = 0
+            while True:
+                provider.counts["calls"] += 1
+                started = time.perf_counter()
+                first_ms = None
+                try:
+                    async for delta in provider.stream(messages, **extra):
+                        if first_ms is None:
+                            first_ms = (time.perf_counter() - started) * 1000
+                        yield delta
+                except Exception as e:
+                    if first_ms is not None:
+                        provider.counts["failures"] += 1
+                        provider.breaker.record(False, (time.perf_counter() - started) * 1000)
+                        raise
+                    error = e
+                    if await self._retry(provider, e, attempt, has_next, started):
+                        attempt += 1
+                        continue
+                    break
+                provider.breaker.record(True, first_ms if first_ms is not None else 0.0)
+                return
+        raise self._unavailable(error)
+
+    def stats(self) -> dict:
+        return {
+            "failovers": self.failovers,
+            "providers": {provider.name: provider.stats() for provider in self.providers},
+        }
+
+
+def build(client: Callable[[], Awaitable[httpx.AsyncClient]], tracked, spec: str = LLM_PROVIDERS) -> Router:
+    """The Router for LLM_PROVIDERS. HTTP providers share client() and report through tracked()."""
+    providers: list[Provider] = []
+    for name, weight in _spec(spec):
+        if name == "groq":
+            providers.append(OpenAICompatibleProvider(
+                "groq", GROQ_API_URL, GROQ_MODEL, GROQ_API_KEY, client, tracked, weight,
+            ))
+        elif name == "ollama":
+            providers.append(OpenAICompatibleProvider(
+                "ollama", OLLAMA_URL, OLLAMA_MODEL, os.getenv("OLLAMA_API_KEY", ""), client, tracked, weight,
+            ))
+        elif name == "openai":
+            if not OPENAI_COMPAT_URL or not OPENAI_COMPAT_MODEL:
+                raise ValueError("LLM_PROVIDERS=openai needs OPENAI_COMPAT_URL and OPENAI_COMPAT_MODEL")
+            providers.append(OpenAICompatibleProvider(
+                "openai", OPENAI_COMPAT_URL, OPENAI_COMPAT_MODEL, OPENAI_COMPAT_API_KEY, client, tracked, weight,
+            ))
+        elif name == "fake":
+            providers.append(FakeProvider(weight=weight))
+        else:
+            raise ValueError(f"unknown LLM provider {name!r} in LLM_PROVIDERS")
+    return Router(providers)
+
+
+def model_key(spec: str = LLM_PROVIDERS) -> str:
+    """
+    The models behind LLM_PROVIDERS, for content cache keys. Plain "groq" keeps the bare model
+    name, so entries cached before providers existed stay valid.
+    """
+    models = {"groq": GROQ_MODEL, "ollama": OLLAMA_MODEL, "openai": OPENAI_COMPAT_MODEL, "fake": "fake"}
+    names = [name for name, _ in _spec(spec)]
+    if names == ["groq"]:
+        return GROQ_MODEL
+    return "+".join(f"{name}:{models.get(name, name)}" for name in sorted(names))
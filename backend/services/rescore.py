@@ -0,0 +1,114 @@
+"""
+Bulk re-scoring of historical stress records.
+
+After a new StressModel goes live, every stored StressRecord can be scored
+again with it (or with any other configured model version). The table is
+walked in id order with keyset pagination (WHERE id > last id), one chunk
+at a time, so memory stays bounded by the chunk size and each chunk is its
+own short write transaction.
+
+    python manage.py rescore --chunk-size 20000
+    python manage.py rescore --model v2
+"""
+
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Engine
+
+from models import StressRecord
+from services.stress import StressModel, calculate_stress_batch, current_model
+
+_table = StressRecord.__table__
+
+_UPDATE = (
+    update(_table)
+    .where(_table.c.id == bindparam("record_id"))
+    .values(
+        checkin_score=bindparam("new_checkin_score"),
+        stress_score=bindparam("new_stress_score"),
+        stress_level=bindparam("new_stress_level"),
+        model_version=bindparam("new_model_version"),
+    )
+)
+
+
+def _column(rows, index: int) -> np.ndarray:
+    # None (no biometric reading) becomes NaN, which calculate_stress_batch treats as missing
+    return np.array([row[index] for row in rows], dtype=np.float64)
+
+
+def rescore_records(
+    engine: Engine,
+    chunk_size: int = 10_000,
+    dry_run: bool = False,
+    progress: Optional[Callable[[dict], None]] = None,
+    model: Optional[StressModel] = None,
+) -> dict:
+    """
+    Re-scores every StressRecord with model (default: the active one), writing only rows
+    whose score, level or model version changed.
+    Returns counts: scanned, changed, level_changed, seconds, model.
+    """
+    model = model or current_model()
+    report = {"scanned": 0, "changed": 0, "level_changed": 0, "seconds": 0.0, "model": model.version}
+    started = time.perf_counter()
+    last_id = 0
+
+    with engine.connect() as conn:
+        while True:
+            rows = conn.execute(
+                select(
+                    _table.c.id, _table.c.bienestar, _table.c.sueno, _table.c.concentracion,
+                    _table.c.heart_rate, _table.c.hrv, _table.c.activity,
+                    _table.c.checkin_score, _table.c.stress_score, _table.c.stress_level,
+                    _table.c.model_version,
+                )
+                .where(_table.c.id > last_id)
+                .order_by(_table.c.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            bienestar, sueno, concentracion = _column(rows, 1), _column(rows, 2), _column(rows, 3)
+            checkin_scores, _ = calculate_stress_batch(bienestar, sueno, concentracion, model=model)
+            scores, levels = calculate_stress_batch(
+                bienestar, sueno, concentracion,
+                heart_rate=_column(rows, 4), hrv=_column(rows, 5), activity=_column(rows, 6), model=model,
+            )
+
+            old_levels = np.array([row[9] for row in rows])
+            level_changed = levels != old_levels
+            version_changed = np.array([row[10] != model.version for row in rows])
+            changed = np.flatnonzero(
+                (checkin_scores != _column(rows, 7)) | (scores != _column(rows, 8)) | level_changed | version_changed
+            )
+
+            report["scanned"] += len(rows)
+            report["changed"] += len(changed)
+            report["level_changed"] += int(level_changed.sum())
+
+            if len(changed) and not dry_run:
+                conn.execute(_UPDATE, [
+                    {
+                        "record_id": rows[i][0],
+                        "new_checkin_score": float(checkin_scores[i]),
+                        "new_stress_score": float(scores[i]),
+                        "new_stress_level": str(levels[i]),
+                        "new_model_version": model.version,
+                    }
+                    for i in changed
+                ])
+                conn.commit()
+            else:
+                conn.rollback()  # end the read transaction between chunks
+
+            if progress is not None:
+                progress(report)
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
@@ -0,0 +1,21 @@
+"""
+Response rendering for the hot endpoints.
+
+The app renders JSON with orjson (ORJSONResponse is FastAPI's default response
+class in main.py). An endpoint that returns a model or dict still gets validated
+against its response_model and run through jsonable_encoder before rendering,
+so a payload built from pydantic models is validated twice. Endpoints whose
+payload already has the response shape return a Response instead: plain dicts
+from database rows go out through ORJSONResponse, and models that had to be
+validated (LLM output) through model_response(). FastAPI passes a returned
+Response through untouched. response_model stays on the route for the OpenAPI
+schema.
+"""
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """A validated model serialized once by pydantic-core, with no second validation."""
+    return Response(model.model_dump_json(), status_code=status_code, media_type="application/json")
@@ -0,0 +1,267 @@
+"""
+Per-user stress rollups: count, score sum/min/max and a level histogram for
+every UTC day and week (weeks start on Monday) that has records.
+
+The rows are updated incrementally in the same transaction as the record:
+add() when a check-in creates a record, replace() when biometrics re-score
+one. Sums and counts are adjusted in place; min/max are recomputed from the
+period's raw records only when the replaced score was the extreme.
+rebuild() recreates every row from stress_records:
+
+    python manage.py rebuild-rollups
+
+range_summary() answers whole-range statistics from weeks and days, reading
+raw records only for the partial days at the edges of the range.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import StressRecord, StressRollup
+
+LEVELS = ("low", "medium", "high")
+PERIODS = {"day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+_table = StressRollup.__table__
+
+
+def period_start(period: str, moment: datetime) -> datetime:
+    day = datetime(moment.year, moment.month, moment.day)
+    return day - timedelta(days=day.weekday()) if period == "week" else day
+
+
+def _ceil_period(period: str, moment: datetime) -> datetime:
+    start = period_start(period, moment)
+    return start if start == moment else start + PERIODS[period]
+
+
+def _empty() -> dict:
+    return {"count": 0, "score_sum": 0.0, "score_min": None, "score_max": None, **{level: 0 for level in LEVELS}}
+
+
+def _fold(total: dict, part: dict) -> dict:
+    """Adds one aggregate (a rollup row or raw-record aggregate) into total."""
+    if not part["count"]:
+        return total
+    total["count"] += part["count"]
+    total["score_sum"] += part["score_sum"]
+    for name, pick in (("score_min", min), ("score_max", max)):
+        total[name] = part[name] if total[name] is None else pick(total[name], part[name])
+    for level in LEVELS:
+        total[level] += part[level] or 0
+    return total
+
+
+# ── Incremental updates ──────────────────────────────────────────────────────
+
+async def _upsert(db: AsyncSession, key: dict, score: float, level: str) -> None:
+    values = {**key, "count": 1, "score_sum": score, "score_min": score, "score_max": score,
+              **{name: int(name == level) for name in LEVELS}}
+    dialect = db.get_bind().dialect
+    if isinstance(dialect, (sqlite.base.SQLiteDialect, postgresql.base.PGDialect)):
+        upsert = sqlite.insert if isinstance(dialect, sqlite.base.SQLiteDialect) else postgresql.insert
+        stmt = upsert(_table).values(**values).on_conflict_do_update(
+            index_elements=["user_id", "period", "period_start"],
+            set_={
+                "count": _table.c.count + 1,
+                "score_sum": _table.c.score_sum + score,
+                "score_min": case(
+                    (_table.c.score_min.is_(None) | (_table.c.score_min > score), score), else_=_table.c.score_min,
+                ),
+                "score_max": case(
+                    (_table.c.score_max.is_(None) | (_table.c.score_max < score), score), else_=_table.c.score_max,
+                ),
+                level: _table.c[level] + 1,
+            },
+        )
+        await db.execute(stmt)
+        return
+
+    row = await db.get(StressRollup, (key["user_id"], key["period"], key["period_start"]), with_for_update=True)
+    if row is None:
+        db.add(StressRollup(**values))
+        return
+    row.count += 1
+    row.score_sum += score
+    row.score_min = score if row.score_min is None else min(row.score_min, score)
+    row.score_max = score if row.score_max is None else max(row.score_max, score)
+    setattr(row, level, getattr(row, level) + 1)
+
+
+def _keys(record: StressRecord) -> list[dict]:
+    return [
+        {"user_id": record.user_id, "period": period, "period_start": period_start(period, record.timestamp)}
+        for period in PERIODS
+    ]
+
+
+async def add(db: AsyncSession, record: StressRecord) -> None:
+    """Counts a new record. Flushes the session so record.timestamp is set."""
+    await db.flush()
+    for key in _keys(record):
+        await _upsert(db, key, record.stress_score, record.stress_level)
+
+
+async def replace(db: AsyncSession, record: StressRecord, old_score: float, old_level: str) -> None:
+    """Moves a re-scored record from (old_score, old_level) to its current score and level."""
+    if old_score == record.stress_score and old_level == record.stress_level:
+        return
+    await db.flush()
+    for key in _keys(record):
+        where = and_(*(_table.c[name] == value for name, value in key.items()))
+        await db.execute(
+            update(_table).where(where).values({
+                "count": _table.c.count - 1,
+                "score_sum": _table.c.score_sum - old_score,
+                old_level: _table.c[old_level] - 1,
+            })
+        )
+        await _upsert(db, key, record.stress_score, record.stress_level)
+
+        low, high = (await db.execute(select(_table.c.score_min, _table.c.score_max).where(where))).one()
+        if old_score in (low, high):
+            # The old score may have been the period's only min/max; the raw records know the new ones
+            end = key["period_start"] + PERIODS[key["period"]]
+            low, high = (await db.execute(
+                select(func.min(StressRecord.stress_score), func.max(StressRecord.stress_score))
+                .where(StressRecord.user_id == record.user_id)
+                .where(StressRecord.timestamp >= key["period_start"], StressRecord.timestamp < end)
+            )).one()
+            await db.execute(update(_table).where(where).values(score_min=low, score_max=high))
+
+
+# ── Rebuild ──────────────────────────────────────────────────────────────────
+
+def rebuild(conn: Connection, chunk_size: int = 10_000) -> dict:
+    """
+    Recreates every rollup row from stress_records on an open connection (the caller commits).
+    Records are read in (user_id, timestamp, id) order in keyset chunks, so memory holds one
+    user's periods at a time.
+    """
+    started = time.perf_counter()
+    conn.execute(delete(_table))
+    report = {"records": 0, "rows": 0}
+    pending: dict[tuple, dict] = {}
+    current_user = None
+
+    def flush() -> None:
+        if pending:
+            conn.execute(insert(_table), [
+                {"user_id": user_id, "period": period, "period_start": start, **aggregate}
+                for (user_id, period, start), aggregate in pending.items()
+            ])
+            report["rows"] += len(pending)
+            pending.clear()
+
+    columns = (StressRecord.user_id, StressRecord.timestamp, StressRecord.id,
+               StressRecord.stress_score, StressRecord.stress_level)
+    last = None
+    while True:
+        query = select(*columns).where(StressRecord.timestamp.is_not(None))
+        if last is not None:
+            user_id, timestamp, record_id = last
+            query = query.where(
+                (StressRecord.user_id > user_id)
+                | and_(StressRecord.user_id == user_id, StressRecord.timestamp > timestamp)
+                | and_(StressRecord.user_id == user_id, StressRecord.timestamp == timestamp,
+                       StressRecord.id > record_id)
+            )
+        rows = conn.execute(
+            query.order_by(StressRecord.user_id, StressRecord.timestamp, StressRecord.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last = rows[-1][:3]
+
+        for user_id, timestamp, _, score, level in rows:
+            if user_id != current_user:
+                flush()
+                current_user = user_id
+            for period in PERIODS:
+                aggregate = pending.setdefault((user_id, period, period_start(period, timestamp)), _empty())
+                _fold(aggregate, {"count": 1, "score_sum": score, "score_min": score, "score_max": score,
+                                  **{name: int(name == level) for name in LEVELS}})
+        report["records"] += len(rows)
+    flush()
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+# ── Reads ────────────────────────────────────────────────────────────────────
+
+async def _rollup_total(db: AsyncSession, user_id: int, period: str,
+                        start: Optional[datetime], end: Optional[datetime]) -> dict:
+    """Sum of the period rows starting in [start, end)."""
+    query = select(
+        func.coalesce(func.sum(_table.c.count), 0), func.coalesce(func.sum(_table.c.score_sum), 0.0),
+        func.min(_table.c.score_min), func.max(_table.c.score_max),
+        *(func.coalesce(func.sum(_table.c[level]), 0) for level in LEVELS),
+    ).where(_table.c.user_id == user_id, _table.c.period == period)
+    if start is not None:
+        query = query.where(_table.c.period_start >= start)
+    if end is not None:
+        query = query.where(_table.c.period_start < end)
+    row = (await db.execute(query)).one()
+    return dict(zip(("count", "score_sum", "score_min", "score_max", *LEVELS), row))
+
+
+async def _raw_total(db: AsyncSession, user_id: int, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    query = select(
+        func.count(), func.coalesce(func.sum(StressRecord.stress_score), 0.0),
+        func.min(StressRecord.stress_score), func.max(StressRecord.stress_score),
+        *(func.sum(case((StressRecord.stress_level == level, 1), else_=0)) for level in LEVELS),
+    ).where(StressRecord.user_id == user_id)
+    if start is not None:
+        query = query.where(StressRecord.timestamp >= start)
+    if end is not None:
+        query = query.where(StressRecord.timestamp < end)
+    row = (await db.execute(query)).one()
+    return dict(zip(("count", "score_sum", "score_min", "score_max", *LEVELS), row))
+
+
+async def range_summary(db: AsyncSession, user_id: int,
+                        start: Optional[datetime] = None, end: Optional[datetime] = None) -> dict:
+    """
+    Aggregate of the user's records in [start, end) (None = unbounded): whole weeks from week
+    rows, whole days around them from day rows, and raw records only for partial edge days.
+    """
+    total = _empty()
+    first_day = _ceil_period("day", start) if start is not None else None
+    end_day = period_start("day", end) if end is not None else None
+    if first_day is not None and end_day is not None and first_day >= end_day:
+        return _fold(total, await _raw_total(db, user_id, start, end))  # within a single day
+
+    if start is not None and start < first_day:
+        _fold(total, await _raw_total(db, user_id, start, first_day))
+    if end is not None and end_day < end:
+        _fold(total, await _raw_total(db, user_id, end_day, end))
+
+    first_week = _ceil_period("week", first_day) if first_day is not None else None
+    end_week = period_start("week", end_day) if end_day is not None else None
+    if first_week is not None and end_week is not None and first_week >= end_week:
+        return _fold(total, await _rollup_total(db, user_id, "day", first_day, end_day))
+
+    _fold(total, await _rollup_total(db, user_id, "week", first_week, end_week))
+    if first_day is not None and first_day < first_week:
+        _fold(total, await _rollup_total(db, user_id, "day", first_day, first_week))
+    if end_day is not None and end_week < end_day:
+        _fold(total, await _rollup_total(db, user_id, "day", end_week, end_day))
+    return total
+
+
+async def periods(db: AsyncSession, user_id: int, period: str,
+                  start: Optional[datetime] = None, end: Optional[datetime] = None) -> list[StressRollup]:
+    """Rollup rows of the periods overlapping [start, end), oldest first."""
+    query = select(StressRollup).where(StressRollup.user_id == user_id, StressRollup.period == period)
+    if start is not None:
+        query = query.where(StressRollup.period_start >= period_start(period, start))
+    if end is not None:
+        query = query.where(StressRollup.period_start < end)
+    return list((await db.scalars(query.where(StressRollup.count > 0).order_by(StressRollup.period_start))).all())
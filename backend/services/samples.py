@@ -0,0 +1,249 @@
+"""
+Raw biometric time series: decoding uploaded batches, compact block storage
+and window features.
+
+A batch holds one series per kind (heart_rate bpm, hrv_rmssd ms, steps per
+record), each as a start time plus delta-encoded timestamps and values.
+Clients may gzip the request body (Content-Encoding: gzip).
+
+Samples are stored as blocks of up to BIOMETRIC_BLOCK_MAX_SAMPLES: int32
+millisecond deltas and float32 values packed with the array module and
+zlib-compressed, one row per block instead of one row per sample.
+"""
+
+import math
+import operator
+import os
+import statistics
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BIOMETRIC_MAX_BATCH_BYTES = int(os.getenv("BIOMETRIC_MAX_BATCH_BYTES", str(16 * 1024 * 1024)))  # decompressed
+BIOMETRIC_MAX_BATCH_SAMPLES = int(os.getenv("BIOMETRIC_MAX_BATCH_SAMPLES", "500000"))
+BIOMETRIC_BLOCK_MAX_SAMPLES = int(os.getenv("BIOMETRIC_BLOCK_MAX_SAMPLES", "4096"))
+
+KINDS = ("heart_rate", "hrv_rmssd", "steps")
+
+_EPOCH = datetime(1970, 1, 1)
+_MAX_GAP_MS = 2**31 - 1  # stored as int32 deltas
+_MAX_TIMESTAMP_MS = (datetime(9999, 12, 31) - _EPOCH) // timedelta(milliseconds=1)  # datetime's range
+_MAX_VALUE = 3.4e38  # stored as float32
+
+_stats = {"batches": 0, "samples": 0, "blocks": 0, "raw_bytes": 0, "stored_bytes": 0, "ingest_seconds": 0.0}
+
+
+class SampleBatchError(ValueError):
+    """Malformed or oversized batch. status_code is the HTTP status to use."""
+
+    def __init__(self, message: str, status_code: int = 422):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Series:
+    """One kind's samples: absolute timestamps (ms since epoch) and values, in time order."""
+
+    __slots__ = ("kind", "timestamps", "values")
+
+    def __init__(self, kind: str, timestamps: array, values: array):
+        self.kind = kind
+        self.timestamps = timestamps
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+# ── Decoding uploads ─────────────────────────────────────────────────────────
+
+def read_body(raw: bytes, content_encoding: Optional[str]) -> bytes:
+    """Returns the decompressed request body, refusing anything over BIOMETRIC_MAX_BATCH_BYTES."""
+    if content_encoding in (None, "", "identity"):
+        body = raw
+    elif content_encoding == "gzip":
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(raw, BIOMETRIC_MAX_BATCH_BYTES + 1)
+        except zlib.error:
+            raise SampleBatchError("Invalid gzip body", status_code=400)
+    else:
+        raise SampleBatchError(f"Unsupported Content-Encoding {content_encoding!r}", status_code=415)
+
+    if len(body) > BIOMETRIC_MAX_BATCH_BYTES:
+        raise SampleBatchError(
+            f"Batch exceeds {BIOMETRIC_MAX_BATCH_BYTES // (1024 * 1024)} MB uncompressed", status_code=413,
+        )
+    return body
+
+
+def decode_series(kind: str, start: int, deltas: list[int], values: list[float]) -> Series:
+    if kind not in KINDS:
+        raise SampleBatchError(f"Unknown series kind {kind!r} (expected one of {', '.join(KINDS)})")
+    if len(deltas) != len(values):
+        raise SampleBatchError(f"{kind}: {len(deltas)} timestamps but {len(values)} values")
+    if deltas and min(deltas) < 0:
+        raise SampleBatchError(f"{kind}: timestamps must be in ascending order")
+    if len(deltas) > 1 and max(deltas[1:]) > _MAX_GAP_MS:
+        raise SampleBatchError(f"{kind}: gap between samples exceeds {_MAX_GAP_MS // 86_400_000} days")
+    if not 0 <= start <= _MAX_TIMESTAMP_MS or (deltas and start + sum(deltas) > _MAX_TIMESTAMP_MS):
+        raise SampleBatchError(f"{kind}: timestamps must be milliseconds since 1970, before the year 10000")
+    # C-level passes: a NaN or infinity anywhere makes the sum non-finite
+    if values and (not math.isfinite(sum(values)) or max(values) > _MAX_VALUE or min(values) < -_MAX_VALUE):
+        raise SampleBatchError(f"{kind}: values must be finite numbers")
+
+    timestamps = array("q", accumulate(deltas, initial=start))
+    del timestamps[0]
+    return Series(kind, timestamps, array("d", values))
+
+
+def check_batch_size(series: list[Series]) -> int:
+    total = sum(len(s) for s in series)
+    if total > BIOMETRIC_MAX_BATCH_SAMPLES:
+        raise SampleBatchError(f"Batch has {total} samples (maximum {BIOMETRIC_MAX_BATCH_SAMPLES})", status_code=413)
+    return total
+
+
+# ── Block storage ────────────────────────────────────────────────────────────
+
+def to_datetime(ms: int) -> datetime:
+    return _EPOCH + timedelta(milliseconds=ms)
+
+
+def to_ms(moment: datetime) -> int:
+    return (moment - _EPOCH) // timedelta(milliseconds=1)
+
+
+def encode_blocks(series: Series) -> list[dict]:
+    """Splits a series into block column values (for BiometricSampleBlock rows)."""
+    blocks = []
+    for begin in range(0, len(series), BIOMETRIC_BLOCK_MAX_SAMPLES):
+        timestamps = series.timestamps[begin:begin + BIOMETRIC_BLOCK_MAX_SAMPLES]
+        values = array("f", series.values[begin:begin + BIOMETRIC_BLOCK_MAX_SAMPLES])
+        deltas = array("i", [0])
+        deltas.extend(map(operator.sub, timestamps[1:], timestamps[:-1]))
+
+        raw_deltas, raw_values = deltas.tobytes(), values.tobytes()
+        packed_deltas, packed_values = zlib.compress(raw_deltas, 1), zlib.compress(raw_values, 1)
+        _stats["raw_bytes"] += len(raw_deltas) + len(raw_values)
+        _stats["stored_bytes"] += len(packed_deltas) + len(packed_values)
+        blocks.append({
+            "kind": series.kind,
+            "start_at": to_datetime(timestamps[0]),
+            "end_at": to_datetime(timestamps[-1]),
+            "count": len(values),
+            "deltas": packed_deltas,
+            "values": packed_values,
+        })
+    _stats["blocks"] += len(blocks)
+    return blocks
+
+
+def decode_block(kind: str, start_at: datetime, deltas: bytes, values: bytes) -> Series:
+    offsets = array("i")
+    offsets.frombytes(zlib.decompress(deltas))
+    floats = array("f")
+    floats.frombytes(zlib.decompress(values))
+
+    timestamps = array("q", accumulate(offsets, initial=to_ms(start_at)))
+    del timestamps[0]
+    return Series(kind, timestamps, array("d", floats))
+
+
+def merge(parts: list[Series], start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> dict[str, Series]:
+    """Concatenates series per kind in time order, keeping samples within [start_ms, end_ms]."""
+    merged: dict[str, Series] = {}
+    for part in sorted((p for p in parts if len(p)), key=lambda p: p.timestamps[0]):
+        if part.kind not in merged:
+            merged[part.kind] = Series(part.kind, array("q"), array("d"))
+        target = merged[part.kind]
+        if (start_ms is None or part.timestamps[0] >= start_ms) and (end_ms is None or part.timestamps[-1] <= end_ms):
+            target.timestamps.extend(part.timestamps)
+            target.values.extend(part.values)
+            continue
+        for timestamp, value in zip(part.timestamps, part.values):  # block straddles the window edge
+            if (start_ms is None or timestamp >= start_ms) and (end_ms is None or timestamp <= end_ms):
+                target.timestamps.append(timestamp)
+                target.values.append(value)
+    return merged
+
+
+# ── Window features ──────────────────────────────────────────────────────────
+
+def _trend_per_hour(series: Series) -> Optional[float]:
+    """Least-squares slope of the values, in units per hour."""
+    if len(series) < 2 or series.timestamps[0] == series.timestamps[-1]:
+        return None
+    hours = [(t - series.timestamps[0]) / 3_600_000 for t in series.timestamps]
+    return round(statistics.linear_regression(hours, series.values).slope, 3)
+
+
+def features(window: dict[str, Series]) -> dict:
+    """
+    Stress features for a window of samples:
+      heart_rate  mean / min / max / stdev bpm
+      hrv_rmssd   mean RMSSD and its trend (ms per hour; falling RMSSD tracks rising stress)
+      steps       total
+    """
+    result: dict = {}
+
+    heart = window.get("heart_rate")
+    if heart is not None and len(heart):
+        result["heart_rate"] = {
+            "samples": len(heart),
+            "mean": round(sum(heart.values) / len(heart), 2),
+            "min": round(min(heart.values), 2),
+            "max": round(max(heart.values), 2),
+            "stdev": round(statistics.pstdev(heart.values), 2),
+        }
+
+    hrv = window.get("hrv_rmssd")
+    if hrv is not None and len(hrv):
+        result["hrv_rmssd"] = {
+            "samples": len(hrv),
+            "mean": round(sum(hrv.values) / len(hrv), 2),
+            "trend_per_hour": _trend_per_hour(hrv),
+        }
+
+    steps = window.get("steps")
+    if steps is not None and len(steps):
+        result["steps"] = {"samples": len(steps), "total": round(sum(steps.values), 2)}
+
+    timestamps = [s.timestamps for s in window.values() if len(s)]
+    if timestamps:
+        result["window"] = {
+            "start": to_datetime(min(t[0] for t in timestamps)).isoformat(),
+            "end": to_datetime(max(t[-1] for t in timestamps)).isoformat(),
+        }
+    return result
+
+
+def stress_inputs(window_features: dict) -> dict:
+    """Maps window features to calculate_stress's heart_rate / hrv / activity arguments."""
+    return {
+        "heart_rate": window_features.get("heart_rate", {}).get("mean"),
+        "hrv": window_features.get("hrv_rmssd", {}).get("mean"),
+        "activity": window_features.get("steps", {}).get("total"),
+    }
+
+
+# ── Metrics ──────────────────────────────────────────────────────────────────
+
+def record_batch(samples: int, seconds: float) -> None:
+    _stats["batches"] += 1
+    _stats["samples"] += samples
+    _stats["ingest_seconds"] += seconds
+
+
+def stats() -> dict:
+    return {
+        **{name: value for name, value in _stats.items() if name != "ingest_seconds"},
+        "samples_per_sec": round(_stats["samples"] / _stats["ingest_seconds"], 1) if _stats["ingest_seconds"] else 0.0,
+        "compression_ratio": round(_stats["raw_bytes"] / _stats["stored_bytes"], 2) if _stats["stored_bytes"] else 0.0,
+    }
@@ -0,0 +1,271 @@
+"""
+Full-text search over a user's generated study material.
+
+On SQLite the content_search FTS5 table is an inverted index over each
+GeneratedContent row's summary, flashcard questions and answers, and quiz
+questions (rowid = generated_content.id). Every indexed word is prefixed
+with its owner (u42_fotosintesis), so a user's query only reads that user's
+posting lists: cost follows the size of the user's material, not of the
+whole table. bm25 statistics are not per user, though: the table is shared,
+so the row count and average column length it normalises by cover every
+user's rows. The table is contentless (the text already lives in
+generated_content); snippets are cut from the row itself.
+
+Rows are indexed as they are persisted; the table is created and
+back-filled by migration 8 and can be rebuilt with:
+
+    python manage.py reindex-content
+
+Where FTS5 is not available (other databases, SQLite builds without it),
+search falls back to a LIKE scan of the user's rows, newest first. It only
+sees summaries, plus the flashcards and quiz of rows that still store them
+inline (see services.blobs). Their JSON keeps accented letters as written;
+rows stored before that hold \\uXXXX escapes, matched as well.
+"""
+
+import json
+import re
+import time
+import unicodedata
+from typing import Optional
+
+from sqlalchemy import inspect, null, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import GeneratedContent
+from services import blobs
+
+TABLE = "content_search"
+MARK_START, MARK_END = "<mark>", "</mark>"
+SNIPPET_CHARS = 60  # context on each side of the first match
+
+_COLUMNS = ("summary", "flashcards", "quiz")
+_WEIGHTS = "10.0, 5.0, 2.0"  # bm25 weight per column: summary matches count most
+_TERM = re.compile(r"\w+")
+# Spanish accents, so a snippet for "fotosintesis" still marks "fotosíntesis" (the index ignores them)
+_ACCENTS = {"a": "[aáàäâ]", "e": "[eéèëê]", "i": "[iíìïî]", "o": "[oóòöô]", "u": "[uúùüû]", "n": "[nñ]"}
+
+_enabled: Optional[bool] = None
+_stats = {"indexed": 0, "queries": 0, "fallback_queries": 0, "query_seconds": 0.0}
+
+
+# ── Documents ────────────────────────────────────────────────────────────────
+
+def _loads(raw) -> list:
+    if not raw:
+        return []
+    try:
+        items = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        return []
+    return items if isinstance(items, list) else []
+
+
+def document(summary: Optional[str], flashcards, quiz) -> dict:
+    """The searchable text of one row. flashcards/quiz may be lists or their JSON strings."""
+    cards = [card for card in _loads(flashcards) if isinstance(card, dict)]
+    questions = [item for item in _loads(quiz) if isinstance(item, dict)]
+    return {
+        "summary": summary or "",
+        "flashcards": "\n".join(f"{card.get('question', '')} {card.get('answer', '')}" for card in cards),
+        "quiz": "\n".join(str(item.get("question", "")) for item in questions),
+    }
+
+
+def _owned(user_id: int, body: str) -> str:
+    """body as the owner-prefixed words the index stores."""
+    return " ".join(f"u{user_id}_{word}" for word in _TERM.findall(body))
+
+
+def _index_values(row_id: int, user_id: int, doc: dict) -> dict:
+    return {"id": row_id, **{column: _owned(user_id, doc[column]) for column in _COLUMNS}}
+
+
+_INSERT = text(
+    f"INSERT INTO {TABLE} (rowid, summary, flashcards, quiz) VALUES (:id, :summary, :flashcards, :quiz)"
+)
+
+
+# ── Index maintenance ────────────────────────────────────────────────────────
+
+def create(conn: Connection) -> bool:
+    """Creates the FTS5 table on SQLite. Returns False where FTS5 is unavailable."""
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(summary, flashcards, quiz, content='', "
+            "tokenize = \"unicode61 remove_diacritics 2 tokenchars '_'\")"
+        )
+    except Exception:  # sqlite3.OperationalError: no such module: fts5
+        return False
+    return True
+
+
+def rebuild(conn: Connection, chunk_size: int = 5_000) -> dict:
+    """Re-indexes every GeneratedContent row (the caller commits)."""
+    started = time.perf_counter()
+    if not create(conn):
+        return {"rows": 0, "seconds": 0.0, "enabled": False}
+    conn.exec_driver_sql(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('delete-all')")
+    # Migration 8 runs this before migration 9 adds the blob columns
+    columns = {column["name"] for column in inspect(conn).get_columns(GeneratedContent.__tablename__)}
+    blob_columns = (
+        (GeneratedContent.flashcards_blob, GeneratedContent.quiz_blob) if "flashcards_blob" in columns
+        else (null(), null())
+    )
+    rows, last_id = 0, 0
+    while True:
+        chunk = conn.execute(
+            select(GeneratedContent.id, GeneratedContent.user_id, GeneratedContent.summary,
+                   GeneratedContent.flashcards, GeneratedContent.quiz, *blob_columns)
+            .where(GeneratedContent.id > last_id)
+            .order_by(GeneratedContent.id)
+            .limit(chunk_size)
+        ).all()
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        texts = blobs.get_texts_sync(conn, [key for row in chunk for key in row[5:] if key])
+        conn.execute(_INSERT, [
+            _index_values(row_id, user_id, document(
+                summary, texts.get(flashcards_blob, flashcards), texts.get(quiz_blob, quiz),
+            ))
+            for row_id, user_id, summary, flashcards, quiz, flashcards_blob, quiz_blob in chunk
+        ])
+        rows += len(chunk)
+    return {"rows": rows, "seconds": round(time.perf_counter() - started, 2), "enabled": True}
+
+
+async def _fts_enabled(db: AsyncSession) -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = db.get_bind().dialect.name == "sqlite" and bool(await db.scalar(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": TABLE},
+        ))
+    return _enabled
+
+
+async def index(db: AsyncSession, row: GeneratedContent, result: dict) -> None:
+    """Adds a new GeneratedContent row to the index, in the caller's transaction."""
+    if not await _fts_enabled(db):
+        return
+    await db.flush()  # assigns row.id
+    doc = document(result.get("summary", ""), result.get("flashcards", []), result.get("quiz", []))
+    await db.execute(_INSERT, _index_values(row.id, row.user_id, doc))
+    _stats["indexed"] += 1
+
+
+# ── Snippets ─────────────────────────────────────────────────────────────────
+
+def _pattern(words: list[str]) -> re.Pattern:
+    # Whole words, like the index matches them; the last word also as a prefix
+    alternatives = []
+    for position, word in enumerate(words):
+        plain = "".join(c for c in unicodedata.normalize("NFKD", word) if not unicodedata.combining(c))
+        body = "".join(_ACCENTS.get(char, re.escape(char)) for char in plain)
+        alternatives.append(body + (r"\w*" if position == len(words) - 1 else ""))
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+def snippet(doc: dict, words: list[str]) -> str:
+    """Excerpt around the first match (summary first), matched words wrapped in <mark>."""
+    pattern = _pattern(words)
+    for column in _COLUMNS:
+        body = doc[column]
+        found = pattern.search(body)
+        if found is None:
+            continue
+        start, end = max(0, found.start() - SNIPPET_CHARS), min(len(body), found.end() + SNIPPET_CHARS)
+        excerpt = pattern.sub(lambda m: f"{MARK_START}{m.group(0)}{MARK_END}", body[start:end])
+        return ("…" if start else "") + excerpt + ("…" if end < len(body) else "")
+    return doc["summary"][:2 * SNIPPET_CHARS]
+
+
+def _hit(row: GeneratedContent, rank: float, words: list[str]) -> dict:
+    return {
+        "content_id": row.id,
+        "rank": rank,
+        "snippet": snippet(document(row.summary, row.flashcards, row.quiz), words),
+        "stress_level": row.stress_level,
+        "created_at": row.created_at,
+    }
+
+
+# ── Queries ──────────────────────────────────────────────────────────────────
+
+def terms(query: str) -> list[str]:
+    return _TERM.findall(query.lower())
+
+
+def _match_expression(user_id: int, words: list[str]) -> str:
+    # Quoted, so nothing in the user's input is FTS syntax; the last word also matches as a prefix
+    quoted = [f'"u{user_id}_{word}"' for word in words]
+    quoted[-1] += "*"
+    return " AND ".join(quoted)
+
+
+async def _search_fts(db: AsyncSession, user_id: int, words: list[str], limit: int, offset: int) -> list[dict]:
+    ranked = (await db.execute(
+        text(
+            f"SELECT rowid, bm25({TABLE}, {_WEIGHTS}) AS score FROM {TABLE} "
+            f"WHERE {TABLE} MATCH :match ORDER BY score LIMIT :limit OFFSET :offset"
+        ),
+        {"match": _match_expression(user_id, words), "limit": limit, "offset": offset},
+    )).all()
+    if not ranked:
+        return []
+    rows = {row.id: row for row in (await db.scalars(
+        select(GeneratedContent).where(GeneratedContent.id.in_([row_id for row_id, _ in ranked]))
+    )).all()}
+    await blobs.hydrate(db, rows.values(), ("flashcards", "quiz"))
+    # bm25 is negative, lower is better; expose it as higher-is-better
+    return [_hit(rows[row_id], round(-score, 6), words) for row_id, score in ranked if row_id in rows]
+
+
+async def _search_like(db: AsyncSession, user_id: int, words: list[str], limit: int, offset: int) -> list[dict]:
+    query = select(GeneratedContent).where(GeneratedContent.user_id == user_id)
+    for word in words:
+        like = f"%{word}%"
+        matches = [
+            GeneratedContent.summary.ilike(like),
+            GeneratedContent.flashcards.ilike(like),
+            GeneratedContent.quiz.ilike(like),
+        ]
+        escaped = json.dumps(word)[1:-1]  # older rows were stored with ensure_ascii
+        if escaped != word:
+            like = f"%{escaped}%"
+            matches += [GeneratedContent.flashcards.ilike(like), GeneratedContent.quiz.ilike(like)]
+        query = query.where(or_(*matches))
+    rows = (await db.scalars(
+        query.order_by(GeneratedContent.created_at.desc()).limit(limit).offset(offset)
+    )).all()
+    await blobs.hydrate(db, rows, ("flashcards", "quiz"))
+    return [_hit(row, 0.0, words) for row in rows]
+
+
+async def search(db: AsyncSession, user_id: int, query: str, limit: int, offset: int = 0) -> list[dict]:
+    """Ranked hits for the user's material; every word must match. Empty for a query without words."""
+    words = terms(query)
+    if not words:
+        return []
+    started = time.perf_counter()
+    if await _fts_enabled(db):
+        hits = await _search_fts(db, user_id, words, limit, offset)
+    else:
+        hits = await _search_like(db, user_id, words, limit, offset)
+        _stats["fallback_queries"] += 1
+    _stats["queries"] += 1
+    _stats["query_seconds"] += time.perf_counter() - started
+    return hits
+
+
+def stats() -> dict:
+    return {
+        "enabled": _enabled,
+        "indexed": _stats["indexed"],
+        "queries": _stats["queries"],
+        "fallback_queries": _stats["fallback_queries"],
+        "avg_query_ms": round(_stats["query_seconds"] / _stats["queries"] * 1000, 2) if _stats["queries"] else 0.0,
+    }
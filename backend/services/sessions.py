@@ -0,0 +1,163 @@
+"""
+Store for biometric QR sessions: session_id -> payload posted by the Android app.
+
+Two backends behind one interface, chosen with BIOMETRIC_SESSION_STORE:
+  - memory (default): per-process LRU with TTL. Only correct with one worker,
+    since the POST and the waiting browser may land on different processes.
+  - database: the biometric_sessions table, shared by every worker using the
+    same DATABASE_URL (on one host with SQLite, or across hosts with Postgres).
+
+Entries expire after BIOMETRIC_SESSION_TTL_SECONDS in both backends; a QR
+session is only useful for the few minutes the card is on screen.
+"""
+
+import abc
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import AsyncSessionLocal
+from models import BiometricSession
+
+load_dotenv()
+
+BIOMETRIC_SESSION_STORE = os.getenv("BIOMETRIC_SESSION_STORE", "memory")
+BIOMETRIC_SESSION_TTL_SECONDS = float(os.getenv("BIOMETRIC_SESSION_TTL_SECONDS", "3600"))
+BIOMETRIC_SESSION_MAX_ENTRIES = int(os.getenv("BIOMETRIC_SESSION_MAX_ENTRIES", "10000"))
+
+_LOOKUP_CHUNK = 500  # session ids per IN (...) query
+
+
+class SessionStore(abc.ABC):
+    # True when other workers can write to this store, so waiters must also look for
+    # arrivals that did not go through this process
+    shared = False
+
+    @abc.abstractmethod
+    async def get(self, session_id: str) -> Optional[dict]:
+        ...
+
+    async def get_many(self, session_ids: list[str]) -> dict[str, dict]:
+        found = {}
+        for session_id in session_ids:
+            data = await self.get(session_id)
+            if data is not None:
+                found[session_id] = data
+        return found
+
+    @abc.abstractmethod
+    async def put(self, session_id: str, data: dict) -> None:
+        ...
+
+    def stats(self) -> dict:
+        return {"backend": BIOMETRIC_SESSION_STORE}
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # session_id -> (stored_at monotonic seconds, payload)
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._evictions = 0
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        stored_at, data = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[session_id]
+            self._evictions += 1
+            return None
+        return data
+
+    async def put(self, session_id: str, data: dict) -> None:
+        self._entries[session_id] = (time.monotonic(), data)
+        self._entries.move_to_end(session_id)
+        # Oldest first: drop expired entries, then whatever exceeds max_entries
+        now = time.monotonic()
+        while self._entries:
+            oldest_id, (stored_at, _) = next(iter(self._entries.items()))
+            if now - stored_at <= self.ttl_seconds and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[oldest_id]
+            self._evictions += 1
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": len(self._entries), "evictions": self._evictions}
+
+
+class DatabaseSessionStore(SessionStore):
+    shared = True
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._evictions = 0
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        return (await self.get_many([session_id])).get(session_id)
+
+    async def get_many(self, session_ids: list[str]) -> dict[str, dict]:
+        """
+        Every session this worker is waiting on, in one query per _LOOKUP_CHUNK ids
+        (SQLite caps the bound parameters of a statement).
+        """
+        found = {}
+        if not session_ids:
+            return found
+        cutoff = self._cutoff()
+        async with AsyncSessionLocal() as db:
+            for begin in range(0, len(session_ids), _LOOKUP_CHUNK):
+                rows = (await db.execute(
+                    select(BiometricSession.session_id, BiometricSession.payload)
+                    .where(BiometricSession.session_id.in_(session_ids[begin:begin + _LOOKUP_CHUNK]))
+                    .where(BiometricSession.created_at >= cutoff)
+                )).all()
+                found.update((session_id, json.loads(payload)) for session_id, payload in rows)
+        return found
+
+    async def put(self, session_id: str, data: dict) -> None:
+        values = {"session_id": session_id, "payload": json.dumps(data), "created_at": datetime.utcnow()}
+        async with AsyncSessionLocal() as db:
+            dialect = db.get_bind().dialect
+            if isinstance(dialect, (sqlite.base.SQLiteDialect, postgresql.base.PGDialect)):
+                insert = sqlite.insert if isinstance(dialect, sqlite.base.SQLiteDialect) else postgresql.insert
+                stmt = insert(BiometricSession).values(**values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["session_id"],
+                    set_={"payload": stmt.excluded.payload, "created_at": stmt.excluded.created_at},
+                )
+                await db.execute(stmt)
+            else:
+                await db.merge(BiometricSession(**values))
+            self._evictions += (await db.execute(
+                delete(BiometricSession)
+                .where(BiometricSession.created_at < self._cutoff())
+                .execution_options(synchronize_session=False)
+            )).rowcount
+            await db.commit()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "evictions": self._evictions}
+
+
+def _create_store() -> SessionStore:
+    if BIOMETRIC_SESSION_STORE == "memory":
+        return MemorySessionStore(BIOMETRIC_SESSION_TTL_SECONDS, BIOMETRIC_SESSION_MAX_ENTRIES)
+    if BIOMETRIC_SESSION_STORE == "database":
+        return DatabaseSessionStore(BIOMETRIC_SESSION_TTL_SECONDS)
+    raise ValueError(f"Unknown BIOMETRIC_SESSION_STORE {BIOMETRIC_SESSION_STORE!r} (memory or database)")
+
+
+store = _create_store()
@@ -0,0 +1,182 @@
+"""
+Incremental parsing of streamed model output.
+
+The model answers with one JSON object ({"summary": ..., "flashcards": [...],
+"quiz": [...]}) delivered token by token. SectionParser turns that growing
+buffer into events as early as possible:
+  - summary text is forwarded as it arrives, decoded from the JSON string
+  - flashcards / quiz are emitted once their array closes and parses
+"""
+
+import json
+import re
+from collections import deque
+from typing import Optional
+
+_SUMMARY_START = re.compile(r'"summary"\s*:\s*"')
+_HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}")
+_LOW_SURROGATE = re.compile(r"\\u[dD][c-fC-F][0-9a-fA-F]{2}")
+_LONE_SURROGATE = re.compile("[\ud800-\udfff]")
+_ARRAY_STARTS = {
+    "flashcards": re.compile(r'"flashcards"\s*:\s*\['),
+    "quiz": re.compile(r'"quiz"\s*:\s*\['),
+}
+
+
+# A section header can straddle two deltas; re-search this many trailing characters
+_HEADER_LOOKBACK = 64
+
+
+class _ArrayScan:
+    """Bracket matching over a growing buffer, resumed where the previous delta left off."""
+
+    __slots__ = ("start", "pos", "depth", "in_string", "escaped")
+
+    def __init__(self, start: int):
+        self.start = start  # index of the opening '['
+        self.pos = start
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def advance(self, buf: str) -> int:
+        """Returns the index just past the ']' closing the array, or -1 if it has not arrived yet."""
+        i = self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "[{":
+                self.depth += 1
+            elif ch in "]}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.pos = i + 1
+                    return i + 1
+            i += 1
+        self.pos = i
+        return -1
+
+
+class SectionParser:
+    """
+    Every delta is scanned once: section headers are searched for only in the new text,
+    and an open array or the summary string resumes where the previous delta stopped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.summary = ""
+        self.sections: dict = {}
+        self._summary_pos = -1      # index in buffer of the next undecoded summary char
+        self._summary_done = False
+        self._search_from = {"summary": 0, **{name: 0 for name in _ARRAY_STARTS}}
+        self._arrays: dict[str, _ArrayScan] = {}
+
+    def _find(self, name: str, pattern: re.Pattern) -> Optional[re.Match]:
+        match = pattern.search(self.buffer, self._search_from[name])
+        if not match:
+            self._search_from[name] = max(self._search_from[name], len(self.buffer) - _HEADER_LOOKBACK)
+        return match
+
+    def feed(self, delta: str) -> list[dict]:
+        """Appends a chunk of model output and returns the events it completes."""
+        self.buffer += delta
+        events = []
+
+        text = self._advance_summary()
+        if text:
+            events.append({"event": "summary", "delta": text})
+
+        for name, pattern in _ARRAY_STARTS.items():
+            if name in self.sections:
+                continue
+            scan = self._arrays.get(name)
+            if scan is None:
+                match = self._find(name, pattern)
+                if not match:
+                    continue
+                scan = self._arrays[name] = _ArrayScan(match.end() - 1)
+            end = scan.advance(self.buffer)
+            if end < 0:
+                continue
+            try:
+                items = json.loads(self.buffer[scan.start:end])
+            except json.JSONDecodeError:
+                # Not a well-formed array after all (e.g. cut by stray text); look for the next header
+                del self._arrays[name]
+                self._search_from[name] = end
+                continue
+            self.sections[name] = items
+            events.append({"event": name, "items": items})
+
+        return events
+
+    def _advance_summary(self) -> str:
+        if self._summary_done:
+            return ""
+        if self._summary_pos < 0:
+            match = self._find("summary", _SUMMARY_START)
+            if not match:
+                return ""
+            self._summary_pos = match.end()
+
+        buf = self.buffer
+        i = self._summary_pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == "\\":
+                width = 6 if buf[i + 1:i + 2] == "u" else 2
+                if width == 6 and _HIGH_SURROGATE.match(buf, i):
+                    # An emoji escaped as a \ud83d\ude00 pair: decode both halves together
+                    if i + 12 > len(buf):
+                        break
+                    if _LOW_SURROGATE.match(buf, i + 6):
+                        width = 12
+                if i + width > len(buf):
+                    break  # escape sequence split across chunks; wait for more
+                i += width
+            elif ch == '"':
+                self._summary_done = True
+                break
+            else:
+                i += 1
+
+        raw = buf[self._summary_pos:i]
+        self._summary_pos = i + (1 if self._summary_done else 0)
+        if not raw:
+            return ""
+        try:
+            text = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            text = raw
+        text = _LONE_SURROGATE.sub("\ufffd", text)  # unpaired halves cannot be encoded as UTF-8
+        self.summary += text
+        return text
+
+
+# ── Time-to-first-byte tracking ─────────────────────────────────────────────
+
+_ttfb_ms: deque = deque(maxlen=500)
+
+
+def record_ttfb(ms: float) -> None:
+    _ttfb_ms.append(ms)
+
+
+def stats() -> dict:
+    if not _ttfb_ms:
+        return {"streams": 0}
+    ordered = sorted(_ttfb_ms)
+    return {
+        "streams": len(ordered),
+        "ttfb_p50_ms": round(ordered[len(ordered) // 2], 1),
+        "ttfb_p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+    }
@@ -8,67 +8,287 @@ Inputs:
 Output:
   - stress_score: float 0-100  (higher = more stressed)
   - stress_level: "low" | "medium" | "high"
+
+The weights, biometric mappings and level thresholds form a versioned
+StressModel. Models are loaded from STRESS_MODEL_CONFIG (JSON) and the file
+is re-read when it changes, so a new model goes live without a restart.
+Each StressRecord stores the version that scored it.
+
+calculate_stress scores one record; calculate_stress_batch scores NumPy
+arrays of records in one call and returns exactly the same values.
 """
 
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+STRESS_MODEL_CONFIG = os.getenv(
+    "STRESS_MODEL_CONFIG", os.path.join(os.path.dirname(os.path.dirname(__file__)), "stress_models.json"),
+)
+STRESS_MODEL_RELOAD_SECONDS = float(os.getenv("STRESS_MODEL_RELOAD_SECONDS", "5"))
+
+LEVELS = np.array(["low", "medium", "high"])
+
+
+# ── Models ─────────────────────────────────────────────────────────────────
+
+class StressModel:
+    """
+    One immutable, versioned set of scoring parameters.
+
+      final = checkin_weight * check-in + biometrics_weight * mean(biometric scores)
+      heart rate:  hr_min bpm → 0 stress, hr_max bpm and above → 100
+      hrv (RMSSD): hrv_high ms and above → 0 stress, hrv_low ms and below → 100;
+                   only used when both are set
+      activity:    0 steps → activity_max_score stress, activity_steps and above → 0
+      level:       low ≤ low_max < medium ≤ medium_max < high
+
+    score() is compiled once at construction into a closure over plain float
+    locals, so it costs the same as a hand-written function.
+    """
+
+    PARAMS = {
+        "checkin_weight": 0.6,
+        "biometrics_weight": 0.4,
+        "hr_min": 50,
+        "hr_max": 120,
+        "hrv_low": None,
+        "hrv_high": None,
+        "activity_steps": 10000,
+        "activity_max_score": 30,
+        "low_max": 33,
+        "medium_max": 66,
+    }
+
+    def __init__(self, version: str, **params):
+        unknown = set(params) - set(self.PARAMS)
+        if unknown:
+            raise ValueError(f"stress model {version}: unknown parameters {sorted(unknown)}")
+        self.version = version
+        self.params = {**self.PARAMS, **params}
+        p = self.params
+        if p["hr_max"] <= p["hr_min"] or p["activity_steps"] <= 0 or p["low_max"] > p["medium_max"]:
+            raise ValueError(f"stress model {version}: inconsistent parameters")
+        if (p["hrv_low"] is None) != (p["hrv_high"] is None) or (
+            p["hrv_low"] is not None and p["hrv_high"] <= p["hrv_low"]
+        ):
+            raise ValueError(f"stress model {version}: set both hrv_low < hrv_high, or neither")
+        self.uses_hrv = p["hrv_low"] is not None
+        self.score: Callable[..., tuple[float, str]] = self._compile()
+
+    def _compile(self) -> Callable[..., tuple[float, str]]:
+        p = self.params
+        checkin_weight, biometrics_weight = p["checkin_weight"], p["biometrics_weight"]
+        hr_min, hr_span = p["hr_min"], p["hr_max"] - p["hr_min"]
+        uses_hrv = self.uses_hrv
+        hrv_high, hrv_span = (p["hrv_high"], p["hrv_high"] - p["hrv_low"]) if uses_hrv else (0, 1)
+        activity_steps, activity_max = p["activity_steps"], p["activity_max_score"]
+        low_max, medium_max = p["low_max"], p["medium_max"]
+
+        def score(bienestar, sueno, concentracion, heart_rate=None, hrv=None, activity=None) -> tuple[float, str]:
+            # Check-in: 1 (very bad) → 100 (high stress), 10 (very good) → 0 (low stress)
+            avg = (bienestar + sueno + concentracion) / 3
+            final = round((10 - avg) / 9 * 100, 2)
+
+            total, count = 0, 0
+            if heart_rate is not None:
+                total += max(0.0, min(100.0, (heart_rate - hr_min) / hr_span * 100))
+                count += 1
+            if uses_hrv and hrv is not None:
+                # Low RMSSD (less parasympathetic activity) reads as stress
+                total += max(0.0, min(100.0, (hrv_high - hrv) / hrv_span * 100))
+                count += 1
+            if activity is not None:
+                # Very low activity can indicate fatigue/high stress
+                total += max(0.0, min(activity_max, (1 - min(activity, activity_steps) / activity_steps) * activity_max))
+                count += 1
+            if count:
+                final = round(final * checkin_weight + round(total / count, 2) * biometrics_weight, 2)
+
+            if final <= low_max:
+                return final, "low"
+            if final <= medium_max:
+                return final, "medium"
+            return final, "high"
+
+        return score
+
+    def __repr__(self) -> str:
+        return f"StressModel({self.version!r})"
+
+
+# The formula used before models were configurable; also the fallback when no config exists
+DEFAULT_MODEL = StressModel("v1")
+
 
-def _checkin_to_stress(bienestar: float, sueno: float, concentracion: float) -> float:
-    """Convert check-in answers (1-10) to a stress score (0-100)."""
-    avg = (bienestar + sueno + concentracion) / 3  # 1-10
-    # Invert: 1 (very bad) → 100 (high stress), 10 (very good) → 0 (low stress)
-    return round((10 - avg) / 9 * 100, 2)
+class _Registry:
+    """Models from STRESS_MODEL_CONFIG; re-read when the file's mtime changes (checked every few seconds)."""
 
+    def __init__(self, path: str):
+        self.path = path
+        self.models: dict[str, StressModel] = {DEFAULT_MODEL.version: DEFAULT_MODEL}
+        self.active = DEFAULT_MODEL
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
 
-def _biometrics_to_stress(
-    heart_rate: float | None,
-    activity: float | None,
-) -> float | None:
-    """Convert biometric values to a stress score (0-100). Returns None if no data."""
-    scores = []
+    def current(self) -> StressModel:
+        if time.monotonic() - self._checked_at >= STRESS_MODEL_RELOAD_SECONDS:
+            self.reload()
+        return self.active
 
-    if heart_rate is not None:
-        # HR: 50 bpm → 0 stress, 120+ bpm → 100 stress
-        hr_score = max(0.0, min(100.0, (heart_rate - 50) / 70 * 100))
-        scores.append(hr_score)
+    def reload(self, force: bool = False) -> None:
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                return
+            if mtime == self._mtime and not force:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    config = json.load(f)
+                models = {
+                    version: StressModel(version, **params) for version, params in config["models"].items()
+                }
+                models.setdefault(DEFAULT_MODEL.version, DEFAULT_MODEL)
+                active = models[config["active"]]
+            except (OSError, ValueError, KeyError, TypeError) as exc:
+                # Keep scoring with the last good model rather than failing requests
+                logger.error("invalid stress model config %s, keeping %s: %s", self.path, self.active.version, exc)
+                self._mtime = mtime
+                return
+            self.models, self.active, self._mtime = models, active, mtime
+            logger.info("stress model %s active (%d known)", active.version, len(models))
 
-    if activity is not None:
-        # Very low activity can indicate fatigue/high stress
-        # activity_score: 0 steps → 30 stress, 10000+ → 0 stress
-        activity_score = max(0.0, min(30.0, (1 - min(activity, 10000) / 10000) * 30))
-        scores.append(activity_score)
 
-    if not scores:
-        return None
+_registry = _Registry(STRESS_MODEL_CONFIG)
 
-    return round(sum(scores) / len(scores), 2)
 
+def current_model() -> StressModel:
+    return _registry.current()
+
+
+def get_model(version: Optional[str]) -> StressModel:
+    """A known model by version (None means the pre-versioning default)."""
+    _registry.current()
+    return _registry.models.get(version or DEFAULT_MODEL.version, DEFAULT_MODEL)
+
+
+def reload_models() -> None:
+    _registry.reload(force=True)
+
+
+def model_info() -> dict:
+    model = current_model()
+    return {"active": model.version, "params": model.params, "known": sorted(_registry.models)}
+
+
+# ── Scoring ────────────────────────────────────────────────────────────────
 
 def calculate_stress(
     bienestar: float,
     sueno: float,
     concentracion: float,
     heart_rate: float | None = None,
-    hrv: float | None = None,  # accepted for API compatibility, ignored in calculation
+    hrv: float | None = None,  # used only by models with hrv_low/hrv_high
     _hrv: float | None = None,  # backwards compat with internal callers
     activity: float | None = None,
+    model: StressModel | None = None,
 ) -> tuple[float, str]:
     """
-    Returns (stress_score, stress_level).
-    HRV is accepted but not used in the biometrics calculation.
+    Returns (stress_score, stress_level) under model (default: the active model).
+    Callers that persist the result should store model.version alongside it.
+    """
+    model = model or current_model()
+    return model.score(bienestar, sueno, concentracion, heart_rate, hrv, activity)
+
+
+# ── Batch scoring ──────────────────────────────────────────────────────────
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """
+    round(x, 2) for an array, bit-for-bit equal to Python's round().
+    np.round (rint(x * 100) / 100) agrees except when x * 100 lands within float error
+    of a .5; those few elements are re-rounded with Python's correctly rounded round().
     """
-    checkin_score = _checkin_to_stress(bienestar, sueno, concentracion)
-    bio_score = _biometrics_to_stress(heart_rate, activity)
-
-    if bio_score is not None:
-        # 60% check-in, 40% biometrics
-        final_score = round(checkin_score * 0.6 + bio_score * 0.4, 2)
-    else:
-        final_score = checkin_score
-
-    if final_score <= 33:
-        level = "low"
-    elif final_score <= 66:
-        level = "medium"
-    else:
-        level = "high"
-
-    return final_score, level
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def calculate_stress_batch(
+    bienestar: np.ndarray,
+    sueno: np.ndarray,
+    concentracion: np.ndarray,
+    heart_rate: np.ndarray | None = None,
+    hrv: np.ndarray | None = None,
+    activity: np.ndarray | None = None,
+    model: StressModel | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized calculate_stress. Inputs are equal-length 1-D arrays; missing biometric
+    values are NaN (or pass None for a whole column).
+    Returns (stress_score float64 array, stress_level array of "low"/"medium"/"high").
+    Each operation mirrors StressModel.score in the same order, so results are identical.
+    """
+    model = model or current_model()
+    p = model.params
+    bienestar = np.asarray(bienestar, dtype=np.float64)
+    sueno = np.asarray(sueno, dtype=np.float64)
+    concentracion = np.asarray(concentracion, dtype=np.float64)
+    n = bienestar.shape[0]
+
+    def column(values):
+        return np.full(n, np.nan) if values is None else np.asarray(values, dtype=np.float64)
+
+    avg = (bienestar + sueno + concentracion) / 3
+    checkin_score = _round2((10 - avg) / 9 * 100)
+
+    # Running sum over whichever biometric scores exist, in the scalar order (HR, HRV, activity)
+    total = np.zeros(n)
+    count = np.zeros(n, dtype=np.int64)
+
+    heart_rate = column(heart_rate)
+    has = ~np.isnan(heart_rate)
+    hr_span = p["hr_max"] - p["hr_min"]
+    total = np.where(has, total + np.maximum(0.0, np.minimum(100.0, (heart_rate - p["hr_min"]) / hr_span * 100)), total)
+    count += has
+
+    if model.uses_hrv:
+        hrv = column(hrv)
+        has = ~np.isnan(hrv)
+        hrv_span = p["hrv_high"] - p["hrv_low"]
+        total = np.where(has, total + np.maximum(0.0, np.minimum(100.0, (p["hrv_high"] - hrv) / hrv_span * 100)), total)
+        count += has
+
+    activity = column(activity)
+    has = ~np.isnan(activity)
+    steps, activity_max = p["activity_steps"], p["activity_max_score"]
+    activity_score = np.maximum(0.0, np.minimum(activity_max, (1 - np.minimum(activity, steps) / steps) * activity_max))
+    total = np.where(has, total + activity_score, total)
+    count += has
+
+    final = checkin_score.copy()
+    has_bio = count > 0
+    bio_score = _round2(total[has_bio] / count[has_bio])
+    final[has_bio] = _round2(
+        checkin_score[has_bio] * p["checkin_weight"] + bio_score * p["biometrics_weight"]
+    )
+
+    level_index = np.where(final <= p["low_max"], 0, np.where(final <= p["medium_max"], 1, 2))
+    return final, LEVELS[level_index]
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Before any app module imports database: tests never touch the development database
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='yachaflex-tests-'), 'test.db')}"
+os.environ.setdefault("LLM_PROVIDERS", "fake")
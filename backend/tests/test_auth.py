@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import migrations
+from database import AsyncSessionLocal, async_engine, engine
+from models import User
+from routers import auth
+
+migrations.migrate(engine)
+
+
+def test_sse_ticket_opens_only_its_own_session_stream():
+    async def run():
+        async with AsyncSessionLocal() as db:
+            user = User(email="sse-ticket@example.com", nombre="Test", hashed_password="x")
+            db.add(user)
+            await db.commit()
+        ticket = auth.create_sse_ticket(user.id, "session-a")
+        access_token = auth.create_access_token({"sub": str(user.id)})
+
+        accepted = await auth.get_current_user_from_ticket(session_id="session-a", ticket=ticket)
+        rejected = []
+        for attempt in (
+            auth.get_current_user_from_ticket(session_id="session-b", ticket=ticket),
+            auth.get_current_user_from_ticket(session_id="session-a", ticket=access_token),
+            auth.get_current_user(token=ticket),
+        ):
+            with pytest.raises(HTTPException) as excinfo:
+                await attempt
+            rejected.append(excinfo.value.status_code)
+        await async_engine.dispose()
+        return user.id, accepted.id, rejected
+
+    user_id, accepted_id, rejected = asyncio.run(run())
+    assert accepted_id == user_id
+    assert rejected == [401, 401, 401]
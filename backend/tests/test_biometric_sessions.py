@@ -0,0 +1,118 @@
+"""
+The shared (database) biometric session store across two app instances: a browser waiting on one
+process must see biometrics posted to another. Each instance is a separate uvicorn process on the
+same SQLite file, as with uvicorn --workers.
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import migrations
+from database import async_engine, engine
+from services import sessions
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start")
+
+
+@pytest.fixture(scope="module")
+def instances():
+    db_path = os.path.join(tempfile.mkdtemp(prefix="yachaflex-sessions-"), "test.db")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "BIOMETRIC_SESSION_STORE": "database",
+        "BIOMETRICS_SHARED_POLL_SECONDS": "0.2",
+    }
+    urls, servers = [], []
+    try:
+        for _ in range(2):
+            port = _free_port()
+            servers.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env,
+            ))
+            urls.append(f"http://127.0.0.1:{port}")
+            _wait_until_up(urls[-1])  # one at a time: both would otherwise run the migrations at once
+        yield urls
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait(timeout=30)
+
+
+def _register(url: str) -> dict:
+    response = httpx.post(f"{url}/auth/register", json={
+        "email": f"sessions-{uuid.uuid4().hex[:8]}@example.com", "nombre": "Test", "password": "test-password",
+    })
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    httpx.post(f"{url}/checkin", json={"bienestar": 5, "sueno": 5, "concentracion": 5},
+               headers=headers).raise_for_status()
+    return headers
+
+
+def test_waiter_on_one_instance_sees_a_post_to_the_other(instances):
+    waiting_on, posted_to = instances
+    headers = _register(waiting_on)
+    session_id = str(uuid.uuid4())
+
+    with ThreadPoolExecutor(1) as pool:
+        waiter = pool.submit(
+            httpx.get, f"{waiting_on}/biometrics/wait",
+            params={"session_id": session_id, "timeout": 10}, headers=headers, timeout=15,
+        )
+        time.sleep(0.5)  # let the waiter subscribe first
+        posted_at = time.monotonic()
+        httpx.post(
+            f"{posted_to}/biometrics", params={"session_id": session_id},
+            json={"heart_rate": 80, "hrv": 45, "activity": 3000}, headers=headers,
+        ).raise_for_status()
+        response = waiter.result()
+
+    assert response.json().get("received") is True
+    assert time.monotonic() - posted_at < 5
+
+
+def test_get_many_looks_up_more_ids_than_one_statement_can_bind():
+    migrations.migrate(engine)
+    store = sessions.DatabaseSessionStore(ttl_seconds=3600)
+    stored = [str(uuid.uuid4()) for _ in range(3)]
+
+    async def run():
+        for session_id in stored:
+            await store.put(session_id, {"heart_rate": 80})
+        waiting = [str(uuid.uuid4()) for _ in range(40_000)] + stored
+        found = await store.get_many(waiting)
+        await async_engine.dispose()
+        return found
+
+    assert set(asyncio.run(run())) == set(stored)
@@ -0,0 +1,48 @@
+import asyncio
+
+import migrations
+from database import AsyncSessionLocal, async_engine, engine
+from models import ContentCacheEntry
+from services import cache
+
+migrations.migrate(engine)
+
+RESULT = {
+    "summary": "La fotosíntesis convierte la luz en energía química.",
+    "flashcards": [],
+    "quiz": [],
+    "usage": {"total_tokens": 900, "latency_ms": 1200.0},
+}
+
+
+async def _get(key: str):
+    async with AsyncSessionLocal() as db:
+        result = await cache.get(db, key)
+        await db.commit()
+        return result
+
+
+def test_pregenerated_entry_is_credited_on_first_serve_only():
+    async def run():
+        key = cache.content_key("pregenerated accounting", "high")
+        async with AsyncSessionLocal() as db:
+            await cache.put(db, key, "high", RESULT, origin="pregenerated")
+            await db.commit()
+        before = cache.pregeneration_report()
+
+        assert await _get(key) is not None           # first serve, from this worker's memory
+        assert await _get(key) is not None           # repeat: the plain cache would have served it too
+        cache._memory.pop(key)
+        assert await _get(key) is not None           # another worker: read from the table
+        after = cache.pregeneration_report()
+
+        async with AsyncSessionLocal() as db:
+            origin = (await db.get(ContentCacheEntry, key)).origin
+        await async_engine.dispose()
+        return before, after, origin
+
+    before, after, origin = asyncio.run(run())
+    assert after["variants_served"] - before["variants_served"] == 1
+    assert after["tokens_saved"] - before["tokens_saved"] == 900
+    assert after["user_latency_saved_ms"] - before["user_latency_saved_ms"] == 1200.0
+    assert origin == "on_demand"
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services import providers
+
+
+def _open_breaker(breaker: providers.CircuitBreaker) -> None:
+    for _ in range(breaker.failures):
+        breaker.record(False, 0.0)
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = providers.CircuitBreaker(failures=2, cooldown=0.05, slow_ms=1000)
+    _open_breaker(breaker)
+    assert breaker.state == "open"
+    assert not breaker.acquire()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.acquire()
+    assert breaker.state == "open"
+    assert not breaker.acquire()
+
+    breaker.record(True, 10.0)
+    assert breaker.state == "closed"
+    assert breaker.acquire()
+
+
+def test_failed_trial_reopens():
+    breaker = providers.CircuitBreaker(failures=2, cooldown=0.05, slow_ms=1000)
+    _open_breaker(breaker)
+    time.sleep(0.06)
+    assert breaker.acquire()
+    breaker.record(False, 10.0)
+    assert breaker.state == "open"
+
+
+def test_unresolved_trial_expires_after_a_cooldown():
+    breaker = providers.CircuitBreaker(failures=1, cooldown=0.05, slow_ms=1000)
+    _open_breaker(breaker)
+    time.sleep(0.06)
+    assert breaker.acquire()
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+
+
+def test_concurrent_calls_in_half_open_send_one_trial():
+    primary = providers.FakeProvider("primary", 1, latency_ms=50, tokens_per_second=1e6)
+    standby = providers.FakeProvider("standby", 0, latency_ms=1, tokens_per_second=1e6)
+    primary.breaker = providers.CircuitBreaker(failures=1, cooldown=0.05, slow_ms=1000)
+    _open_breaker(primary.breaker)
+    time.sleep(0.06)
+    router = providers.Router([primary, standby])
+    messages = [{"role": "user", "content": "Text:\n\"\"\"La fotosíntesis.\"\"\""}]
+
+    async def run():
+        return await asyncio.gather(*(router.complete(messages) for _ in range(10)))
+
+    assert len(asyncio.run(run())) == 10
+    assert primary.counts["calls"] == 1
+    assert standby.counts["calls"] == 9
+    assert primary.breaker.state == "closed"
+
+
+def test_all_providers_failing():
+    failing = [
+        providers.FakeProvider(name, 1, latency_ms=1, tokens_per_second=1e6, error_rate=1.0)
+        for name in ("primary", "secondary")
+    ]
+    for provider in failing:
+        provider.breaker = providers.CircuitBreaker(failures=2, cooldown=60, slow_ms=1000)
+    router = providers.Router(failing)
+    messages = [{"role": "user", "content": "Text:\n\"\"\"La fotosíntesis.\"\"\""}]
+
+    # Each call tries every provider once and raises the last upstream error
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(router.complete(messages))
+    assert [provider.counts["calls"] for provider in failing] == [2, 2]
+    assert [provider.breaker.state for provider in failing] == ["open", "open"]
+
+    # With every circuit open, calls fail at once instead of reaching a provider
+    async def stream():
+        return [delta async for delta in router.stream(messages)]
+
+    for call in (router.complete(messages), stream()):
+        with pytest.raises(providers.ProvidersUnavailableError):
+            asyncio.run(call)
+    assert [provider.counts["calls"] for provider in failing] == [2, 2]
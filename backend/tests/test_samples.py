@@ -0,0 +1,23 @@
+import pytest
+
+from services import samples
+
+
+@pytest.mark.parametrize("start, deltas, values", [
+    (1_700_000_000_000, [0, 1000], [60.0, float("nan")]),
+    (1_700_000_000_000, [0], [float("inf")]),
+    (1_700_000_000_000, [0], [-float("inf")]),
+    (1_700_000_000_000, [0], [1e39]),
+    (10**30, [0], [60.0]),
+    (-1, [0], [60.0]),
+    (253_402_000_000_000, [0, 2**31 - 1], [60.0, 61.0]),
+])
+def test_decode_series_rejects_out_of_range_input(start, deltas, values):
+    with pytest.raises(samples.SampleBatchError) as raised:
+        samples.decode_series("heart_rate", start, deltas, values)
+    assert raised.value.status_code == 422
+
+
+def test_decode_series_accepts_a_normal_series():
+    series = samples.decode_series("heart_rate", 1_700_000_000_000, [0, 1000, 1000], [60.0, 61.5, 62.0])
+    assert list(series.timestamps) == [1_700_000_000_000, 1_700_000_001_000, 1_700_000_002_000]
@@ -0,0 +1,38 @@
+import asyncio
+import json
+
+import migrations
+from database import AsyncSessionLocal, async_engine, engine
+from models import GeneratedContent, User
+from services import search
+
+migrations.migrate(engine)
+
+
+def test_like_fallback_matches_accented_words_in_flashcards():
+    cards = [{"question": "¿Qué es la fotosíntesis?", "answer": "La conversión de luz en energía."}]
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            user = User(email="search-like@example.com", nombre="Test", hashed_password="x")
+            db.add(user)
+            await db.flush()
+            rows = [
+                GeneratedContent(user_id=user.id, original_text="t", stress_level="low", summary="",
+                                 flashcards=json.dumps(cards, ensure_ascii=ensure_ascii), quiz="[]")
+                for ensure_ascii in (True, False)  # rows stored before and after ensure_ascii=False
+            ]
+            db.add_all(rows)
+            await db.commit()
+
+            enabled, search._enabled = search._enabled, False
+            try:
+                found = {word: {hit["content_id"] for hit in await search.search(db, user.id, word, 10)}
+                         for word in ("fotosíntesis", "energía")}
+            finally:
+                search._enabled = enabled
+        await async_engine.dispose()
+        return {row.id for row in rows}, found
+
+    ids, found = asyncio.run(run())
+    assert found == {"fotosíntesis": ids, "energía": ids}
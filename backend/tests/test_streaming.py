@@ -0,0 +1,45 @@
+import json
+
+from services.streaming import SectionParser
+
+
+def _feed(deltas: list[str]) -> tuple[SectionParser, list[dict]]:
+    parser = SectionParser()
+    events = []
+    for delta in deltas:
+        events += parser.feed(delta)
+    return parser, events
+
+
+def test_surrogate_pair_split_across_deltas():
+    parser, events = _feed(['{"summary": "hola \\ud83d', '\\ude00 fin", "flashcards": []}'])
+    assert parser.summary == "hola \U0001f600 fin"
+    for event in events:
+        json.dumps(event, ensure_ascii=False).encode("utf-8")
+
+
+def test_surrogate_pair_split_inside_low_half():
+    parser, _ = _feed(['{"summary": "a\\ud83d\\ud', 'e00b"}'])
+    assert parser.summary == "a\U0001f600b"
+
+
+def test_lone_surrogate_is_replaced():
+    parser, events = _feed(['{"summary": "a\\ud83d b", "quiz": []}'])
+    assert parser.summary == "a� b"
+    for event in events:
+        json.dumps(event, ensure_ascii=False).encode("utf-8")
+
+
+def test_sections_from_character_deltas():
+    answer = json.dumps({
+        "summary": "Energía \"luz\" y agua",
+        "flashcards": [{"question": "¿Qué? [x]", "answer": "b\\\\"}],
+        "quiz": [{"question": "q", "options": ["a", "b"], "correct_index": 0}],
+    }, ensure_ascii=True)
+    parser, events = _feed(list(answer))
+    assert parser.summary == "Energía \"luz\" y agua"
+    assert parser.sections == {
+        "flashcards": [{"question": "¿Qué? [x]", "answer": "b\\\\"}],
+        "quiz": [{"question": "q", "options": ["a", "b"], "correct_index": 0}],
+    }
+    assert [e["event"] for e in events if e["event"] != "summary"] == ["flashcards", "quiz"]
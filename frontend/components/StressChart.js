@@ -11,7 +11,7 @@ import {
 } from "chart.js";
 import { Line } from "react-chartjs-2";
 import { Box, Text, useColorModeValue } from "@chakra-ui/react";
-import { getStressColor, STRESS_THRESHOLDS } from "../lib/constants";
+import { getStressColor, getStressLevel, STRESS_THRESHOLDS } from "../lib/constants";
 
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend, Filler);
 
@@ -80,6 +80,14 @@ export default function StressChart({ records }) {
         callbacks: {
           label: (ctx) => {
             const r = records[ctx.dataIndex];
+            if (r.count !== undefined) {
+              // Downsampled bucket: mean score with its range
+              return [
+                `Estres medio: ${ctx.parsed.y.toFixed(1)}`,
+                `Nivel: ${getStressLevel(ctx.parsed.y).toUpperCase()}`,
+                `Rango: ${r.min_score.toFixed(1)} - ${r.max_score.toFixed(1)} (${r.count} registros)`,
+              ];
+            }
             return [
               `Estres: ${ctx.parsed.y.toFixed(1)}`,
               `Nivel: ${r.stress_level.toUpperCase()}`,
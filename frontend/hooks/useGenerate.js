@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { generateContent, uploadPdfContent } from "../lib/api";
+import { streamGenerateContent, uploadPdfContent } from "../lib/api";
 
 export function useGenerate() {
   const [content, setContent] = useState(null);
@@ -10,12 +10,28 @@ export function useGenerate() {
     setError("");
     setLoading(true);
     try {
-      const res = await generateContent({
-        text,
-        stress_record_id: recordId ? parseInt(recordId) : undefined,
-      });
-      setContent(res.data);
-      return res.data;
+      // Render the summary while it is still being written instead of waiting for the whole payload
+      let draft = null;
+      await streamGenerateContent(
+        { text, stress_record_id: recordId ? parseInt(recordId) : undefined },
+        (event) => {
+          if (event.event === "meta") {
+            draft = { stress_level: event.stress_level, summary: "", flashcards: [], quiz: [] };
+          } else if (event.event === "summary") {
+            draft = { ...draft, summary: draft.summary + event.delta };
+          } else if (event.event === "flashcards" || event.event === "quiz") {
+            draft = { ...draft, [event.event]: event.items };
+          } else if (event.event === "done") {
+            draft = { ...draft, content_id: event.content_id };
+          } else if (event.event === "error") {
+            const err = new Error(event.detail);
+            err.response = { data: { detail: event.detail } };
+            throw err;
+          }
+          setContent(draft);
+        }
+      );
+      return draft;
     } catch (err) {
       const msg = err.response?.data?.detail || "Error generando contenido. Ollama esta corriendo?";
       setError(msg);
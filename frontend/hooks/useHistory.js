@@ -6,8 +6,9 @@ export function useHistory() {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    getHistory()
-      .then((res) => setRecords(res.data.records))
+    // Downsampled series for the chart: one point per bucket (mean score) over the whole history
+    getHistory({ limit: 1, points: 60 })
+      .then((res) => setRecords(res.data.buckets))
       .catch(() => {})
       .finally(() => setLoading(false));
   }, []);
@@ -24,15 +24,114 @@ export const submitCheckin = (data) => api.post("/checkin", data);
 export const submitBiometrics = (data) => api.post("/biometrics", data);
 export const getBiometricsStatus = (sessionId) => api.get(`/biometrics/status?session_id=${sessionId}`);
 
+// Calls onData once, as soon as this session's biometrics arrive.
+// Uses Server-Sent Events and falls back to long-polling /biometrics/wait.
+// EventSource cannot set headers, so the stream URL carries a short-lived ticket
+// for this session (POST /biometrics/events/ticket), never the access token.
+// Returns a function that cancels the subscription.
+export function subscribeBiometrics(sessionId, onData) {
+  const token = typeof window !== "undefined" ? localStorage.getItem("yachaflex_token") : null;
+  let stopped = false;
+  let source = null;
+
+  const deliver = (data) => {
+    if (stopped) return;
+    stopped = true;
+    if (source) source.close();
+    onData(data);
+  };
+
+  const longPoll = async () => {
+    while (!stopped) {
+      try {
+        const { data } = await api.get(`/biometrics/wait?session_id=${sessionId}&timeout=25`, { timeout: 35000 });
+        if (data.received) deliver(data);
+      } catch (_) {
+        await new Promise((resolve) => setTimeout(resolve, 2000)); // network error: back off, retry
+      }
+    }
+  };
+
+  const listen = async () => {
+    let ticket;
+    try {
+      const { data } = await api.post(`/biometrics/events/ticket?session_id=${encodeURIComponent(sessionId)}`);
+      ticket = data.ticket;
+    } catch (_) {
+      longPoll();
+      return;
+    }
+    if (stopped) return;
+    source = new EventSource(
+      `${BASE_URL}/biometrics/events?session_id=${encodeURIComponent(sessionId)}&ticket=${encodeURIComponent(ticket)}`
+    );
+    source.addEventListener("biometrics", (e) => deliver(JSON.parse(e.data)));
+    source.onerror = () => {
+      // CLOSED: the browser gave up reconnecting (e.g. a proxy that blocks SSE,
+      // or a reconnect after the ticket expired)
+      if (source && source.readyState === EventSource.CLOSED && !stopped) {
+        source = null;
+        longPoll();
+      }
+    };
+  };
+
+  if (typeof EventSource !== "undefined" && token) {
+    listen();
+  } else {
+    longPoll();
+  }
+
+  return () => {
+    stopped = true;
+    if (source) source.close();
+  };
+}
+
 // Generate content
 export const generateContent = (data) => api.post("/generate", data);
+
+// Streaming generation: the server sends one JSON event per line (NDJSON).
+// onEvent is called for each one as soon as it arrives.
+export async function streamGenerateContent(data, onEvent) {
+  const token = typeof window !== "undefined" ? localStorage.getItem("yachaflex_token") : null;
+  const res = await fetch(`${BASE_URL}/generate/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(data),
+  });
+  if (!res.ok) {
+    const body = await res.json().catch(() => ({}));
+    const err = new Error(body.detail || res.statusText);
+    err.response = { data: body };
+    throw err;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline;
+    while ((newline = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+}
 export const uploadPdfContent = (formData) =>
   api.post("/generate/pdf", formData, {
     headers: { "Content-Type": "multipart/form-data" },
   });
 
 // History
-export const getHistory = (limit = 30) => api.get(`/history?limit=${limit}`);
+export const getHistory = (params = { limit: 30 }) => api.get("/history", { params });
 
 // Health
 export const checkHealth = () => api.get("/health");
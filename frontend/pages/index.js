@@ -28,7 +28,7 @@ import SectionHeading from "../components/ui/SectionHeading";
 import { useAuth } from "../hooks/useAuth";
 import { useCheckin } from "../hooks/useCheckin";
 import { getToken } from "../lib/auth";
-import { getBiometricsStatus } from "../lib/api";
+import { subscribeBiometrics } from "../lib/api";
 
 const QRCodeSVG = dynamic(
   () => import("qrcode.react").then((m) => m.QRCodeSVG),
@@ -145,7 +145,8 @@ function BiometricsDisplay({ data }) {
 
 // ─── BiometricQRCard ──────────────────────────────────────────────────────────
 // Each mount generates a fresh UUID → embedded in QR → Android app echoes it
-// back in the POST body → backend stores in _biometric_sessions → polling picks it up.
+// back in the POST body → backend stores it in the session store → the subscription
+// (SSE, or long-poll fallback) is woken with the data.
 function BiometricQRCard() {
   // Stable UUID for this QR session; re-generated only if the component remounts
   const [sessionId] = useState(() =>
@@ -169,23 +170,9 @@ function BiometricQRCard() {
     }
   }, [apiUrl, sessionId]);
 
-  // Poll every 2s until THIS session's biometrics arrive.
-  // clearInterval is called immediately inside the callback (not waiting for re-render)
-  // so no stray GET requests compete with the check-in POST.
-  useEffect(() => {
-    const poll = setInterval(async () => {
-      try {
-        const { data } = await getBiometricsStatus(sessionId);
-        if (data.received) {
-          clearInterval(poll); // stop NOW, before React re-renders
-          setBiometrics(data);
-        }
-      } catch (_) {
-        // ignore network errors during polling
-      }
-    }, 2000);
-    return () => clearInterval(poll);
-  }, [sessionId]);
+  // Wait for THIS session's biometrics: the server pushes them the moment
+  // the Android app posts, so no periodic requests compete with the check-in POST.
+  useEffect(() => subscribeBiometrics(sessionId, setBiometrics), [sessionId]);
 
   if (!qrUrl) return null;
 